@@ -0,0 +1,87 @@
+"""
+QR2Key - Clipboard access for paste injection
+"""
+
+import os
+import subprocess
+from abc import ABC, abstractmethod
+from loguru import logger
+
+class ClipboardError(Exception):
+    """Raised when the clipboard cannot be read or written."""
+
+class Clipboard(ABC):
+    """Interface for the clipboard used by paste injection."""
+
+    name = "base"
+
+    @abstractmethod
+    def get_text(self):
+        """Return the current clipboard text, or None if it holds no text."""
+
+    @abstractmethod
+    def set_text(self, text):
+        """Replace the clipboard contents with text."""
+
+class MemoryClipboard(Clipboard):
+    """In-process clipboard stand-in for tests and headless runs."""
+
+    name = "memory"
+
+    def __init__(self, text=None):
+        """Initialize the clipboard with optional contents."""
+        self.text = text
+        self.writes = 0
+
+    def get_text(self):
+        """Return the stored text."""
+        return self.text
+
+    def set_text(self, text):
+        """Store text."""
+        self.text = text
+        self.writes += 1
+
+class PasteboardClipboard(Clipboard):
+    """macOS general pasteboard accessed through pbcopy and pbpaste.
+
+    Only plain text is saved and restored; other pasteboard contents such
+    as images are lost when a payload is pasted.
+    """
+
+    name = "pasteboard"
+
+    def __init__(self, timeout=1.0):
+        """Initialize the clipboard with a timeout for the helper tools."""
+        self.timeout = timeout
+        self._env = dict(os.environ, LANG="en_US.UTF-8")  # pbcopy/pbpaste use the locale encoding
+
+    def get_text(self):
+        """Return the pasteboard text."""
+        result = self._run(["pbpaste"])
+        return result.stdout.decode("utf-8", errors="replace")
+
+    def set_text(self, text):
+        """Replace the pasteboard contents with text."""
+        self._run(["pbcopy"], text.encode("utf-8"))
+
+    def _run(self, command, data=None):
+        """Run a pasteboard helper, raising ClipboardError on failure."""
+        try:
+            return subprocess.run(command, input=data, capture_output=True,
+                                  env=self._env, timeout=self.timeout, check=True)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.error(f"Clipboard command {command[0]} failed: {e}")
+            raise ClipboardError(str(e)) from e
+
+CLIPBOARDS = {
+    "pasteboard": PasteboardClipboard,
+    "memory": MemoryClipboard,
+}
+
+def create_clipboard(name="pasteboard"):
+    """Create a clipboard by name."""
+    try:
+        return CLIPBOARDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown clipboard: {name}") from None
@@ -3,33 +3,173 @@ QR2Key - Configuration management
 """
 
 import os
+import copy
 import json
 from loguru import logger
 
+from gs1 import GS1_MODES
+from transforms import TransformPipeline
+
 DEFAULT_CONFIG = {
     "serial": {
+        "port": None,
         "baud_rate": 9600,
         "timeout": 1,
-        "auto_detect": False
+        "auto_detect": False,
+        "monitor_ports": True,
+        "max_connections": 16,
+        "trace_dir": "",
+        "reconnect": {
+            "initial_delay": 0.5,
+            "max_delay": 30,
+            "multiplier": 2.0,
+            "jitter": 0.2,
+            "keep_buffer_for": 5.0
+        },
+        "framing": {
+            "mode": "terminator",
+            "terminator": "auto",
+            "idle_timeout": 0.1,
+            "length_bytes": 2,
+            "buffer_size": 8192
+        }
     },
     "keyboard": {
+        "backend": "pynput",
         "type_delay": 0.05,
-        "press_enter_after": False
+        "type_rate": 0,
+        "burst_size": 1,
+        "max_burst": 4,
+        "press_enter_after": False,
+        "paste_threshold": 0,
+        "paste_restore_delay": 0.2,
+        "clipboard": "pasteboard",
+        "queue_size": 256
+    },
+    "gs1": {
+        "mode": "flag",
+        "bare_gtins": False
+    },
+    "transforms": {
+        "rules": []
+    },
+    "output": {
+        "keyboard": True,
+        "sinks": []
+    },
+    "dedup": {
+        "ttl": 1.0,
+        "max_entries": 1024,
+        "scope": "port"
+    },
+    "logging": {
+        "enqueue": True,
+        "payload": "full",
+        "payload_chars": 32,
+        "rate_limits": {
+            "scan": 20,
+            "queue_full": 1,
+            "read_error": 1,
+            "sink_error": 1,
+            "gs1_invalid": 1
+        }
+    },
+    "metrics": {
+        "http_port": 0
+    },
+    "control": {
+        "socket": ""
+    },
+    "journal": {
+        "enabled": True,
+        "directory": "journal",
+        "commit_interval": 0.05,
+        "hash_buckets": 1048576
     },
     "app": {
         "start_minimized": False,
         "auto_start": False,
-        "log_level": "INFO"
+        "log_level": "INFO",
+        "watch_config": True
     }
 }
 
+def changed_keys(old, new):
+    """Return the "section.key" names whose values differ between two configurations."""
+    return [f"{section}.{key}"
+            for section, values in new.items()
+            for key, value in values.items()
+            if old.get(section, {}).get(key) != value]
+
+class ConfigSnapshot:
+    """Immutable, typed view of the settings read on every scan.
+
+    A new snapshot is built whenever the configuration changes and swapped
+    in with a single assignment, so the scan path reads plain attributes
+    without locks or dictionary lookups and never sees a half-applied
+    reload. Take config.snapshot once per scan and read from that.
+    """
+    
+    __slots__ = ("type_rate", "paste_threshold", "paste_restore_delay", "press_enter_after",
+                 "burst_size", "max_burst", "dedup_ttl", "gs1_mode", "gs1_bare_gtins", "transforms", "keyboard_output", "version")
+    
+    def __init__(self, config, version=0):
+        """Compile a snapshot from a full configuration dictionary."""
+        keyboard = config["keyboard"]
+        type_rate = float(keyboard["type_rate"] or 0)
+        type_delay = float(keyboard["type_delay"] or 0)
+        if not type_rate and type_delay > 0:
+            type_rate = 1.0 / type_delay
+        gs1_mode = config["gs1"]["mode"]
+        if gs1_mode not in GS1_MODES:
+            raise ValueError(f"gs1.mode must be one of {', '.join(GS1_MODES)}, got {gs1_mode!r}")
+        
+        values = {
+            "type_rate": type_rate,
+            "paste_threshold": int(keyboard["paste_threshold"] or 0),
+            "paste_restore_delay": float(keyboard["paste_restore_delay"]),
+            "press_enter_after": bool(keyboard["press_enter_after"]),
+            "burst_size": max(1, int(keyboard["burst_size"])),
+            "max_burst": max(1, int(keyboard["max_burst"])),
+            "dedup_ttl": float(config["dedup"]["ttl"] or 0),
+            "gs1_mode": gs1_mode,
+            "gs1_bare_gtins": bool(config["gs1"]["bare_gtins"]),
+            "transforms": TransformPipeline(config["transforms"]["rules"]),
+            "keyboard_output": bool(config["output"]["keyboard"]),
+            "version": version,
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is read-only")
+    
+    def __delattr__(self, name):
+        raise AttributeError("ConfigSnapshot is read-only")
+    
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"ConfigSnapshot({fields})"
+
 class Config:
-    """Configuration manager for QR2Key."""
+    """Configuration manager for QR2Key.
+    
+    The scan path reads the compiled snapshot; everything else can keep
+    using get(). check_reload(), which main calls from its event loop,
+    reloads config.json when it changes on disk, and changed lists the
+    keys the last load changed.
+    Values given with override() (e.g. from the command line) take
+    precedence over the file and survive reloads.
+    """
     
     def __init__(self, config_path="config.json"):
         """Initialize configuration with default values or from file."""
         self.config_path = config_path
-        self.config = DEFAULT_CONFIG.copy()
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.snapshot = ConfigSnapshot(self.config)
+        self.overrides = {}
+        self.changed = []
+        self._file_state = None
         
         if not os.path.exists(config_path):
             logger.info(f"Creating default configuration file at {config_path}")
@@ -38,31 +178,65 @@ class Config:
             self.load_config()
     
     def load_config(self):
-        """Load configuration from file."""
+        """Load configuration from file; returns True if it was applied."""
         try:
+            file_state = self._stat()
             with open(self.config_path, 'r') as f:
                 loaded_config = json.load(f)
-                
+            
+            config = copy.deepcopy(DEFAULT_CONFIG)
             for section in DEFAULT_CONFIG:
                 if section in loaded_config:
                     for key in DEFAULT_CONFIG[section]:
                         if key in loaded_config[section]:
-                            self.config[section][key] = loaded_config[section][key]
-                            
+                            value = loaded_config[section][key]
+                            default = DEFAULT_CONFIG[section][key]
+                            if isinstance(default, dict) and isinstance(value, dict):
+                                value = {**default, **value}
+                            config[section][key] = value
+            self._apply_overrides(config)
+            snapshot = ConfigSnapshot(config, self.snapshot.version + 1)
+            
+            self._file_state = file_state
+            self.changed = changed_keys(self.config, config)
+            self.config = config
+            self.snapshot = snapshot
             logger.info(f"Configuration loaded from {self.config_path}")
+            return True
         except Exception as e:
             logger.error(f"Error loading configuration: {e}")
-            logger.info("Using default configuration")
+            logger.info("Keeping the current configuration")
+            return False
     
     def save_config(self):
         """Save configuration to file."""
         try:
             with open(self.config_path, 'w') as f:
                 json.dump(self.config, f, indent=4)
+            self._file_state = self._stat()
             logger.info(f"Configuration saved to {self.config_path}")
         except Exception as e:
             logger.error(f"Error saving configuration: {e}")
     
+    def check_reload(self):
+        """Reload the file if it changed since it was last read or written."""
+        file_state = self._stat()
+        if file_state is None or file_state == self._file_state:
+            return False
+        logger.info(f"{self.config_path} changed, reloading")
+        if not self.load_config():
+            self._file_state = file_state  # Do not retry until it changes again
+            return False
+        return True
+    
+    def _stat(self):
+        """Return (mtime, size) of the config file, or None if it is missing."""
+        try:
+            st = os.stat(self.config_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    
     def get(self, section, key, default=None):
         """Get a configuration value."""
         try:
@@ -74,12 +248,44 @@ class Config:
     def set(self, section, key, value):
         """Set a configuration value."""
         try:
-            self.config[section][key] = value
+            config = copy.deepcopy(self.config)
+            config[section][key] = value
+            snapshot = ConfigSnapshot(config, self.snapshot.version + 1)
+            self.config = config
+            self.snapshot = snapshot
             logger.debug(f"Configuration updated: {section}.{key} = {value}")
             return True
         except KeyError:
             logger.error(f"Invalid configuration section or key: {section}.{key}")
             return False
+        except (TypeError, ValueError) as e:
+            logger.error(f"Invalid value for {section}.{key}: {value!r} ({e})")
+            return False
+    
+    def override(self, section, key, value):
+        """Set a value that takes precedence over the file until the app exits.
+        
+        A dict value is merged into a dict setting, so only the given
+        nested keys are overridden.
+        """
+        if section not in self.config or key not in self.config[section]:
+            logger.error(f"Invalid configuration section or key: {section}.{key}")
+            return False
+        previous = self.overrides.get((section, key))
+        if isinstance(previous, dict) and isinstance(value, dict):
+            value = {**previous, **value}
+        self.overrides[(section, key)] = value
+        config = copy.deepcopy(self.config)
+        self._apply_overrides(config)
+        return self.set(section, key, config[section][key])
+    
+    def _apply_overrides(self, config):
+        """Apply the overrides to a configuration dictionary."""
+        for (section, key), value in self.overrides.items():
+            current = config[section][key]
+            if isinstance(current, dict) and isinstance(value, dict):
+                value = {**current, **value}
+            config[section][key] = value
     
     def get_all(self):
         """Get the entire configuration."""
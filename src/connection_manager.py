@@ -0,0 +1,488 @@
+"""
+QR2Key - Concurrent serial connections read from a single selector thread or event loop
+"""
+
+import os
+import selectors
+import threading
+import time
+from collections import deque
+
+import serial
+from loguru import logger
+
+from framing import FrameAssembler
+from logger import log_allowed, log_payload, log_suppressed
+from core import EventLoopCore
+from decoder import PortDecoder
+from metrics import MetricsRegistry
+from pipeline import Scan
+from serial_trace import TraceRecorder, trace_path
+from reconnect import CONNECTED, RECONNECTING, PortState, ReconnectPolicy
+
+class PortConnection:
+    """One serial port with its own framing, decoding and connection state.
+
+    serial is None while the port is down and being reconnected.
+    """
+
+    def __init__(self, port, ser, assembler, decoder, state, baud_rate=9600, timeout=1):
+        """Initialize the connection."""
+        self.port = port
+        self.serial = ser
+        self.assembler = assembler
+        self.decoder = decoder
+        self.state = state
+        self.baud_rate = baud_rate
+        self.timeout = timeout
+        self.bytes_read = 0
+        self.scans = 0
+        self.recorder = None
+
+    def fileno(self):
+        """Return the port's file descriptor."""
+        return self.serial.fileno()
+
+class ConnectionManager:
+    """Read any number of serial ports on one thread and merge their scans.
+
+    Every port keeps its own FrameAssembler and PortDecoder. Scans from all
+    ports are passed to on_scan one at a time, in the order they were
+    completed, each tagged with its source port, a monotonic timestamp and
+    a sequence number.
+
+    A port whose read fails is not forgotten: its PortState moves to lost
+    and the manager reopens it with exponential backoff. The framing buffer
+    survives outages shorter than the policy's keep_buffer_for.
+    on_state_change(port, old, new) is called on every state change.
+
+    Read and decode times and byte, scan and error counts are recorded in
+    metrics, a MetricsRegistry shared with the rest of the scan path.
+    When trace_dir is set, the raw bytes read from each port are recorded
+    there for replay with serial_trace.
+    """
+
+    def __init__(self, on_scan, framing=None, max_connections=16, on_state_change=None,
+                 policy=None, open_serial=serial.Serial, metrics=None, trace_dir=None):
+        """Initialize the manager with the callback that receives scans."""
+        self.on_scan = on_scan
+        self.on_state_change = on_state_change
+        self.policy = policy or ReconnectPolicy()
+        self.framing = framing or {}
+        self.max_connections = max_connections
+        self.open_serial = open_serial
+        self.trace_dir = trace_dir
+
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._read_time = self.metrics.histogram("read_seconds", "Time spent in serial reads")
+        self._decode_time = self.metrics.histogram("decode_seconds", "Time spent decoding a scan")
+        self._bytes_read = self.metrics.counter("bytes_read_total", "Bytes read from all ports")
+        self._scans_read = self.metrics.counter("scans_read_total", "Scans framed and decoded")
+        self._read_errors = self.metrics.counter("read_errors_total", "Failed serial reads")
+        self._reconnects = self.metrics.counter("reconnects_total", "Lost ports that were reopened")
+        self.metrics.gauge("connected_ports", "Ports currently connected",
+                           lambda: sum(state == CONNECTED for state in self.port_states().values()))
+
+        self._connections = {}
+        self._decoders = {}  # Learned encodings survive reconnects
+        self._commands = deque()
+        self._lock = threading.Lock()
+        self._open_selector()
+
+        self._thread = None
+        self._running = False
+        self._seq = 0
+
+    @property
+    def ports(self):
+        """Ports being read or reconnected."""
+        with self._lock:
+            return list(self._connections)
+
+    def __len__(self):
+        return len(self._connections)
+
+    def is_connected(self, port):
+        """Whether the given port is being read or reconnected."""
+        return port in self._connections
+
+    def port_states(self):
+        """Return {port: state name} for every managed port."""
+        with self._lock:
+            return {port: conn.state.state for port, conn in self._connections.items()}
+
+    def stats(self):
+        """Return per-port counters and connection state statistics."""
+        with self._lock:
+            connections = list(self._connections.values())
+        return {
+            conn.port: dict(conn.state.stats(), bytes_read=conn.bytes_read, scans=conn.scans)
+            for conn in connections
+        }
+
+    def connect(self, port, baud_rate=9600, timeout=1):
+        """Open a serial port and start reading it; returns the PortConnection or None.
+
+        Connecting a port that is waiting to be reconnected retries it immediately.
+        """
+        conn = self._connections.get(port)
+        if conn:
+            if conn.state.state == RECONNECTING:
+                conn.state.retry_now()
+                self._wake()
+            return conn
+        if len(self._connections) >= self.max_connections:
+            logger.warning(f"Already reading {self.max_connections} ports, not connecting {port}")
+            return None
+
+        try:
+            ser = self.open_serial(port, baud_rate, timeout=timeout)
+        except serial.SerialException as e:
+            logger.error(f"Error connecting to {port}: {e}")
+            return None
+
+        decoder = self._decoders.setdefault(port, PortDecoder(name=port))
+        state = PortState(port, self.policy, self.on_state_change)
+        conn = PortConnection(port, ser, FrameAssembler.from_config(self.framing), decoder,
+                              state, baud_rate, timeout)
+        if self.trace_dir:
+            try:
+                os.makedirs(self.trace_dir, exist_ok=True)
+                conn.recorder = TraceRecorder(trace_path(self.trace_dir, port), port)
+            except OSError as e:
+                logger.error(f"Cannot record {port}: {e}")
+        with self._lock:
+            self._connections[port] = conn
+            self._commands.append(("add", conn))
+        self._wake()
+
+        logger.info(f"Connected to {port} at {baud_rate} baud")
+        return conn
+
+    def disconnect(self, port):
+        """Stop reading a port and close it."""
+        with self._lock:
+            conn = self._connections.pop(port, None)
+            if conn:
+                self._commands.append(("remove", conn))
+        if conn:
+            conn.state.close()
+            self._wake()
+            if not self._running:
+                self._process_commands()
+            logger.info(f"Disconnected from {port}")
+
+    def start(self):
+        """Start the reader thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="serial-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        """Stop the reader thread and close every port."""
+        self._running = False
+        self._wake()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+        for port in self.ports:
+            self.disconnect(port)
+        self._process_commands()
+
+    def join(self):
+        """Wait until the reader thread stops."""
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def run(self):
+        """Run the reader loop on the calling thread until stop() is called."""
+        self._running = True
+        self._loop()
+
+    def _loop(self):
+        """Reader loop: wait on every port at once and frame what arrives."""
+        while self._running:
+            self._process_commands()
+
+            events = self._selector.select(self._next_timeout())
+            now = time.monotonic()
+
+            for key, _ in events:
+                if key.data is None:
+                    self._drain_wakeup()
+                else:
+                    self._read(key.data, now)
+
+            self._poll_idle(now)
+            self._reconnect_due(now)
+            self._flush_traces(now)
+
+    def _read(self, conn, now):
+        """Read what is available on one port and emit completed scans."""
+        if conn.serial is None:
+            return
+        started = time.perf_counter()
+        try:
+            data = conn.serial.read(conn.serial.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            self._read_errors.inc()
+            self._lose(conn, e)
+            return
+        self._read_time.observe(time.perf_counter() - started)
+
+        conn.bytes_read += len(data)
+        self._bytes_read.inc(len(data))
+        if conn.recorder:
+            conn.recorder.record(data, now)
+        self._emit(conn, conn.assembler.feed(data, now), now)
+
+    def _poll_idle(self, now):
+        """Emit scans completed by an idle gap on any port."""
+        for conn in list(self._connections.values()):
+            if conn.assembler.pending and conn.state.state == CONNECTED:
+                self._emit(conn, conn.assembler.poll(now), now)
+
+    def _flush_traces(self, now):
+        """Flush trace files whose buffered reads are due."""
+        for conn in list(self._connections.values()):
+            if conn.recorder and conn.recorder.time_until_flush(now) == 0:
+                conn.recorder.flush()
+
+    def _reconnect_due(self, now):
+        """Try to reopen every lost port whose backoff has expired."""
+        for conn in list(self._connections.values()):
+            if conn.state.due(now):
+                self._reopen(conn)
+
+    def _reopen(self, conn):
+        """Make one reconnect attempt."""
+        try:
+            ser = self.open_serial(conn.port, conn.baud_rate, timeout=conn.timeout)
+        except (serial.SerialException, OSError) as e:
+            conn.state.attempt_failed(e)
+            return
+
+        conn.serial = ser
+        try:
+            self._watch(conn)
+        except (OSError, ValueError) as e:
+            self._close_serial(conn)
+            conn.state.attempt_failed(e)
+            return
+
+        outage = conn.state.reconnected()
+        self._reconnects.inc()
+        if outage > self.policy.keep_buffer_for and conn.assembler.pending:
+            logger.warning(f"{conn.port}: discarding {conn.assembler.pending} bytes of partial scan after {outage:.1f} s outage")
+            conn.assembler.reset()
+
+    def _emit(self, conn, frames, now):
+        """Decode frames and pass them on as tagged scans."""
+        for frame in frames:
+            started = time.perf_counter()
+            text = conn.decoder.decode(frame)
+            self._decode_time.observe(time.perf_counter() - started)
+            self._scans_read.inc()
+            if log_allowed("scan"):
+                skipped = log_suppressed("scan")
+                logger.info("Received from {}: {}{}", conn.port, log_payload(text),
+                            f" ({skipped} more not logged)" if skipped else "")
+
+            scan = Scan(text, port=conn.port, received_at=now, raw=frame)
+            self._seq += 1
+            scan.seq = self._seq
+            conn.scans += 1
+
+            try:
+                self.on_scan(scan)
+            except Exception as e:
+                logger.error(f"Error handling scan from {conn.port}: {e}")
+
+    def _next_timeout(self):
+        """Seconds until the earliest idle, reconnect or trace flush deadline, or None to block."""
+        deadlines = []
+        now = time.monotonic()
+        for conn in list(self._connections.values()):
+            if conn.recorder:
+                remaining = conn.recorder.time_until_flush(now)
+                if remaining is not None:
+                    deadlines.append(remaining)
+            if conn.state.state == CONNECTED:
+                remaining = conn.assembler.time_until_idle(now)
+                if remaining is not None:
+                    deadlines.append(remaining)
+            elif conn.state.next_attempt_at is not None:
+                deadlines.append(max(0.0, conn.state.next_attempt_at - now))
+        return min(deadlines) if deadlines else None
+
+    def _lose(self, conn, error):
+        """Close a port whose read failed and start reconnecting it."""
+        if log_allowed("read_error"):
+            skipped = log_suppressed("read_error")
+            logger.error("Error reading {}: {}{}", conn.port, error,
+                         f" ({skipped} more errors not logged)" if skipped else "")
+        self._unregister(conn)
+        if conn.state.state == CONNECTED:
+            conn.state.lose(error)
+
+    def _process_commands(self):
+        """Apply connects and disconnects requested by other threads."""
+        while True:
+            with self._lock:
+                if not self._commands:
+                    return
+                action, conn = self._commands.popleft()
+
+            if action == "add":
+                try:
+                    self._watch(conn)
+                except (OSError, ValueError) as e:
+                    self._lose(conn, e)
+            else:
+                self._unregister(conn)
+                if conn.recorder:
+                    conn.recorder.close()
+
+    def _unregister(self, conn):
+        """Stop watching a port and close it."""
+        if conn.serial is None:
+            return
+        try:
+            self._unwatch(conn)
+        except (KeyError, OSError, ValueError):
+            pass
+        self._close_serial(conn)
+
+    def _open_selector(self):
+        """Create the selector and the pipe that wakes it up."""
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ, None)
+
+    def _watch(self, conn):
+        """Start waiting for data on a port."""
+        self._selector.register(conn.fileno(), selectors.EVENT_READ, conn)
+
+    def _unwatch(self, conn):
+        """Stop waiting for data on a port."""
+        self._selector.unregister(conn.fileno())
+
+    def _close_serial(self, conn):
+        """Close the port's serial handle, ignoring errors from a vanished device."""
+        try:
+            conn.serial.close()
+        except Exception:
+            pass
+        conn.serial = None
+
+    def _wake(self):
+        """Interrupt a blocking select so queued commands are applied."""
+        try:
+            os.write(self._wakeup_write, b"\0")
+        except BlockingIOError:
+            pass  # A wakeup is already pending
+
+    def _drain_wakeup(self):
+        """Consume pending wakeup bytes."""
+        try:
+            while os.read(self._wakeup_read, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+class AsyncConnectionManager(ConnectionManager):
+    """ConnectionManager driven by an EventLoopCore instead of its own thread.
+
+    Ports are watched with loop.add_reader() and idle flushes, trace flushes
+    and reconnect attempts are one loop timer set to the earliest deadline, so reads,
+    framing, reconnects and the on_scan callback all run on the core's
+    loop thread, in order, alongside whatever else is scheduled there.
+    Without a core the manager creates and owns one.
+    """
+
+    def __init__(self, on_scan, core=None, **kwargs):
+        """Initialize the manager; other arguments are as for ConnectionManager."""
+        super().__init__(on_scan, **kwargs)
+        self.core = core if core is not None else EventLoopCore()
+        self._owns_core = core is None
+        self._timer = None
+
+    def start(self):
+        """Start reading on the core's loop, starting the loop if needed."""
+        self.core.start()
+        self._running = True
+        self.core.call(self._service)
+
+    def stop(self, timeout=2):
+        """Stop reading and close every port."""
+        self._running = False
+        self.core.run(self._close_all, timeout=timeout)
+        if self._owns_core:
+            self.core.stop(timeout)
+
+    def join(self):
+        """Wait until the core's loop stops."""
+        self.core.join()
+
+    def run(self):
+        """Read on the core's loop until it is stopped."""
+        self.start()
+        self.join()
+
+    def _service(self):
+        """Apply queued commands, handle due timers and set the next one."""
+        if not self._running:
+            return
+        self._process_commands()
+        now = time.monotonic()
+        self._poll_idle(now)
+        self._reconnect_due(now)
+        self._flush_traces(now)
+        self._schedule()
+
+    def _schedule(self):
+        """Set the loop timer to the earliest idle, reconnect or trace flush deadline."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        timeout = self._next_timeout()
+        if timeout is not None and self._running:
+            self._timer = self.core.loop.call_later(timeout, self._service)
+
+    def _on_readable(self, conn):
+        """Loop callback for a port with data waiting."""
+        self._read(conn, time.monotonic())
+        self._schedule()
+
+    def _close_all(self):
+        """Disconnect every port and cancel the timer."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for port in self.ports:
+            self.disconnect(port)
+        self._process_commands()
+
+    def _watch(self, conn):
+        """Start waiting for data on a port."""
+        if self.core.loop is None or self.core.loop.is_closed():
+            raise OSError("event loop is not running")
+        self.core.loop.add_reader(conn.fileno(), self._on_readable, conn)
+
+    def _unwatch(self, conn):
+        """Stop waiting for data on a port."""
+        if self.core.loop is not None and not self.core.loop.is_closed():
+            self.core.loop.remove_reader(conn.fileno())
+
+    def _open_selector(self):
+        """Nothing to open; the loop does the waiting."""
+
+    def _wake(self):
+        """Have the loop apply queued commands."""
+        self.core.call(self._service)
@@ -0,0 +1,254 @@
+"""
+QR2Key - Local control socket: pause, resume, status, metrics and bulk submission
+"""
+
+import asyncio
+import json
+import os
+import socket
+import struct
+from loguru import logger
+
+# Every request and reply is a 4-byte big-endian length followed by that many bytes
+LENGTH = struct.Struct(">I")
+MAX_FRAME = 1 << 20
+# Seconds to wait before retrying a SUBMIT while the typing queue is full
+SUBMIT_RETRY_DELAY = 0.005
+
+def encode_frame(body):
+    """Length-prefix a reply or request body (str or bytes)."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return LENGTH.pack(len(body)) + body
+
+class _ControlProtocol(asyncio.Protocol):
+    """One client connection; runs on the event loop."""
+
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = bytearray()
+        self.waiting = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.server._connections.add(self)
+
+    def connection_lost(self, exc):
+        self.server._connections.discard(self)
+
+    def data_received(self, data):
+        self.buffer += data
+        if not self.waiting:
+            self.process()
+
+    def process(self):
+        """Handle every complete request in the buffer and write the replies in one go.
+
+        A SUBMIT that finds the typing queue full stops processing and
+        pauses reading until there is room, so a client sending faster
+        than scans are typed is slowed down instead of losing payloads.
+        """
+        buffer = self.buffer
+        server = self.server
+        replies = []
+        offset = 0
+        while len(buffer) - offset >= LENGTH.size:
+            length = LENGTH.unpack_from(buffer, offset)[0]
+            if length > server.max_frame:
+                replies.append(encode_frame(f"ERR request of {length} bytes exceeds {server.max_frame}"))
+                self.transport.write(b"".join(replies))
+                self.transport.close()
+                return
+            end = offset + LENGTH.size + length
+            if len(buffer) < end:
+                break
+            command, _, argument = bytes(buffer[offset + LENGTH.size:end]).partition(b" ")
+            if command == b"SUBMIT" and not server.can_submit():
+                self.wait()
+                break
+            offset = end
+            replies.append(server.handle(command, argument))
+        del buffer[:offset]
+        if replies:
+            self.transport.write(b"".join(replies))
+
+    def wait(self):
+        """Stop reading until the typing queue has room."""
+        self.waiting = True
+        self.transport.pause_reading()
+        asyncio.get_running_loop().call_later(SUBMIT_RETRY_DELAY, self.resume)
+
+    def resume(self):
+        """Retry the pending requests."""
+        if self.transport.is_closing():
+            return
+        self.waiting = False
+        self.transport.resume_reading()
+        self.process()
+
+class ControlServer:
+    """Unix domain socket API for local automation, served on the event loop.
+
+    Requests are length-prefixed frames holding a command and an optional
+    argument separated by a space; each gets one length-prefixed reply, in
+    order, so a client can pipeline thousands of requests on one
+    connection. Built-in commands:
+
+    - SUBMIT <text>: queue a payload for typing like a scan; replies OK,
+      or DROPPED if it could not be queued
+    - PING: replies OK
+
+    Other commands come from the commands dict, {name: function(argument)},
+    whose functions return the reply as a string, or a dict sent as JSON.
+    Unknown commands and failures reply ERR <message>. The socket is only
+    accessible to the user running QR2Key.
+    """
+
+    def __init__(self, path, core, submit, can_submit=None, commands=None, max_frame=MAX_FRAME):
+        """Initialize the server; submit(text) queues a payload and returns False if it was dropped."""
+        self.path = path
+        self.core = core
+        self.submit = submit
+        self.can_submit = can_submit or (lambda: True)
+        self.commands = {name.encode("ascii"): function for name, function in (commands or {}).items()}
+        self.max_frame = max_frame
+        self.submitted = 0
+        self.dropped = 0
+        self._server = None
+        self._connections = set()
+
+    def start(self, timeout=5):
+        """Bind the socket and start accepting connections on the core's loop."""
+        self._remove_stale_socket()
+        future = asyncio.run_coroutine_threadsafe(self._start(), self.core.loop)
+        future.result(timeout)
+        logger.info(f"Control socket listening on {self.path}")
+
+    def stop(self):
+        """Close the socket and every connection."""
+        if self._server is not None:
+            self.core.run(self._close)
+
+    def handle(self, command, argument):
+        """Run one request; returns the encoded reply."""
+        try:
+            text = argument.decode("utf-8")
+        except UnicodeDecodeError:
+            return encode_frame("ERR argument is not valid UTF-8")
+        if command == b"SUBMIT":
+            if not text:
+                return encode_frame("ERR empty payload")
+            self.submitted += 1
+            if self.submit(text):
+                return encode_frame("OK")
+            self.dropped += 1
+            return encode_frame("DROPPED")
+        if command == b"PING":
+            return encode_frame("OK")
+        function = self.commands.get(command)
+        if function is None:
+            return encode_frame(f"ERR unknown command {command.decode('ascii', 'replace')}")
+        try:
+            reply = function(text)
+        except Exception as e:
+            logger.error(f"Control command {command.decode('ascii', 'replace')} failed: {e}")
+            return encode_frame(f"ERR {e}")
+        if isinstance(reply, dict):
+            reply = json.dumps(reply)
+        return encode_frame(reply)
+
+    async def _start(self):
+        """Create the listening socket; runs on the loop."""
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Bind owner-only; a chmod after bind() leaves a window where anyone can connect
+        umask = os.umask(0o177)
+        try:
+            sock.bind(self.path)
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            os.umask(umask)
+        self._server = await loop.create_unix_server(lambda: _ControlProtocol(self), sock=sock)
+
+    def _close(self):
+        """Close the listener and connections; runs on the loop."""
+        self._server.close()
+        self._server = None
+        for connection in list(self._connections):
+            connection.transport.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _remove_stale_socket(self):
+        """Remove a socket file left behind by a process that is gone."""
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except ConnectionRefusedError:
+            os.unlink(self.path)
+            return
+        except OSError:
+            return  # Not a socket; binding will report it
+        finally:
+            probe.close()
+        raise OSError(f"{self.path} is in use by another process")
+
+class ControlClient:
+    """Blocking client for the control socket, for scripts and tests."""
+
+    def __init__(self, path, timeout=5.0):
+        """Connect to the control socket at path."""
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(path)
+        self._buffer = bytearray()
+
+    def close(self):
+        """Disconnect."""
+        self.socket.close()
+
+    def request(self, command, argument=None):
+        """Send one request and return its reply as a string."""
+        self.socket.sendall(self._encode(command, argument))
+        return self._reply()
+
+    def submit_many(self, payloads, chunk=1000):
+        """Submit payloads, pipelining chunk requests at a time; returns the replies."""
+        replies = []
+        payloads = list(payloads)
+        for start in range(0, len(payloads), chunk):
+            batch = payloads[start:start + chunk]
+            self.socket.sendall(b"".join(self._encode("SUBMIT", payload) for payload in batch))
+            replies.extend(self._reply() for _ in batch)
+        return replies
+
+    @staticmethod
+    def _encode(command, argument):
+        """Encode a request frame."""
+        body = command.encode("ascii")
+        if argument is not None:
+            body += b" " + (argument.encode("utf-8") if isinstance(argument, str) else argument)
+        return encode_frame(body)
+
+    def _reply(self):
+        """Read one reply frame."""
+        length = LENGTH.unpack(self._read(LENGTH.size))[0]
+        return self._read(length).decode("utf-8")
+
+    def _read(self, size):
+        """Read exactly size bytes."""
+        while len(self._buffer) < size:
+            data = self.socket.recv(65536)
+            if not data:
+                raise ConnectionError("control socket closed")
+            self._buffer += data
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
@@ -0,0 +1,138 @@
+"""
+QR2Key - asyncio event loop shared by serial I/O, timers and housekeeping
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from loguru import logger
+
+class Repeating:
+    """Handle of a function called every interval seconds by EventLoopCore.every()."""
+
+    def __init__(self, core, interval, function, args):
+        """Initialize the timer; it starts when scheduled by the core."""
+        self.core = core
+        self.interval = interval
+        self.function = function
+        self.args = args
+        self.cancelled = False
+        self._handle = None
+
+    def cancel(self):
+        """Stop calling the function; safe from any thread."""
+        self.cancelled = True
+        self.core.call(self._cancel)
+
+    def _schedule(self):
+        """Arm the next call; runs on the loop thread."""
+        if not self.cancelled:
+            self._handle = self.core.loop.call_later(self.interval, self._fire)
+
+    def _fire(self):
+        """Call the function and rearm."""
+        try:
+            self.function(*self.args)
+        except Exception as e:
+            logger.error(f"Error in timer {getattr(self.function, '__name__', self.function)}: {e}")
+        self._schedule()
+
+    def _cancel(self):
+        """Disarm the pending call."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+class EventLoopCore:
+    """One asyncio event loop on a dedicated thread.
+
+    Serial reads, framing timers, reconnect backoff, duplicate expiry and
+    config reloads all run as callbacks on this loop, one at a time and in
+    the order they became due, so they share state without locks. Other
+    threads (the GUI, the port monitor, signal handlers) never touch that
+    state directly: call() schedules a function on the loop thread and
+    run() also waits for its result.
+    """
+
+    def __init__(self, name="qr2key-core"):
+        """Initialize the core; the loop is created by start()."""
+        self.name = name
+        self.loop = None
+        self._thread = None
+
+    @property
+    def running(self):
+        """Whether the loop thread is running."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_loop(self):
+        """Whether the caller is running on the loop thread."""
+        return self._thread is threading.current_thread()
+
+    def start(self):
+        """Create the loop and start running it on its thread."""
+        if self.running:
+            return
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name=self.name, daemon=True)
+        self._thread.start()
+        ready.wait()
+        logger.debug("Event loop started")
+
+    def stop(self, timeout=2):
+        """Stop the loop and wait for its thread to exit."""
+        if not self.running:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if not self.in_loop():
+            self._thread.join(timeout)
+
+    def join(self):
+        """Wait until the loop stops."""
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def call(self, function, *args):
+        """Call function(*args) on the loop thread soon; safe from any thread.
+
+        Calls made before start() are dropped.
+        """
+        if self.loop is None or self.loop.is_closed():
+            return
+        if self.in_loop():
+            self.loop.call_soon(function, *args)
+        else:
+            self.loop.call_soon_threadsafe(function, *args)
+
+    def run(self, function, *args, timeout=None):
+        """Call function(*args) on the loop thread and return its result."""
+        if self.in_loop() or not self.running:
+            return function(*args)
+        future = concurrent.futures.Future()
+
+        def runner():
+            try:
+                future.set_result(function(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+        self.loop.call_soon_threadsafe(runner)
+        return future.result(timeout)
+
+    def every(self, interval, function, *args):
+        """Call function(*args) on the loop every interval seconds; returns a Repeating handle."""
+        timer = Repeating(self, interval, function, args)
+        self.call(timer._schedule)
+        return timer
+
+    def _run(self, ready):
+        """Thread body: run the loop until stop()."""
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+            logger.debug("Event loop stopped")
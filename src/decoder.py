@@ -0,0 +1,143 @@
+"""
+QR2Key - Text decoding for scanner payloads
+"""
+
+import codecs
+from loguru import logger
+
+DEFAULT_ENCODINGS = ("shift_jis", "utf-8")
+
+def hex_dump(data):
+    """Format undecodable bytes as space separated hex."""
+    return data.hex(' ')
+
+def sniff_encoding(data, encodings=DEFAULT_ENCODINGS):
+    """Return (encoding, text) for the first encoding that decodes data strictly.
+
+    A leading 0xE3 byte is the start of most UTF-8 encoded Japanese text,
+    so UTF-8 is tried first for such payloads. Returns (None, None) when no
+    candidate decodes the payload.
+    """
+    if data.startswith(b'\xe3') and "utf-8" in encodings:
+        encodings = ("utf-8",) + tuple(e for e in encodings if e != "utf-8")
+
+    for encoding in encodings:
+        try:
+            return encoding, data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return None, None
+
+def decode_payload(data, encodings=DEFAULT_ENCODINGS):
+    """Decode a complete payload without any learned state."""
+    if data.isascii():
+        return data.decode('ascii')
+
+    encoding, text = sniff_encoding(data, encodings)
+    return text if encoding else hex_dump(data)
+
+class StreamDecoder:
+    """Incrementally decode one encoding, safe across chunk boundaries."""
+
+    def __init__(self, encoding, errors="strict"):
+        """Initialize the decoder for the given encoding."""
+        self.encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors)
+
+    def feed(self, chunk):
+        """Decode a chunk, holding back any incomplete trailing character."""
+        return self._decoder.decode(chunk, False)
+
+    def finish(self, chunk=b""):
+        """Decode the final chunk and reset for the next payload."""
+        try:
+            return self._decoder.decode(chunk, True)
+        finally:
+            self._decoder.reset()
+
+    def reset(self):
+        """Discard any buffered partial character."""
+        self._decoder.reset()
+
+class PortDecoder:
+    """Decode scans from one port, learning the encoding its scanner sends.
+
+    Until an encoding is locked every non-ASCII scan is sniffed. Once the
+    same encoding has been chosen for learn_scans scans in a row it is
+    locked and later scans are decoded with it directly. If the locked
+    encoding fails relearn_after times in a row, learning starts over.
+    """
+
+    def __init__(self, encodings=DEFAULT_ENCODINGS, learn_scans=3, relearn_after=3, name=None):
+        """Initialize the decoder with its candidate encodings."""
+        self.encodings = tuple(encodings)
+        self.learn_scans = learn_scans
+        self.relearn_after = relearn_after
+        self.name = name
+        self.encoding = None
+        self._stream = None
+        self._candidate = None
+        self._streak = 0
+        self._misses = 0
+
+    @property
+    def locked(self):
+        """Whether an encoding has been learned for this port."""
+        return self._stream is not None
+
+    def decode(self, data):
+        """Decode one complete scan."""
+        if data.isascii():
+            return data.decode('ascii')
+
+        stream = self._stream
+        if stream is not None:
+            try:
+                text = stream.finish(data)
+                self._misses = 0
+                return text
+            except UnicodeDecodeError:
+                self._misses += 1
+                if self._misses >= self.relearn_after:
+                    logger.warning(f"{self._label()}: {self.encoding} no longer matches, relearning encoding")
+                    self.unlock()
+
+        encoding, text = sniff_encoding(data, self.encodings)
+        if encoding is None:
+            return hex_dump(data)
+
+        if stream is None:
+            self._learn(encoding)
+        return text
+
+    def feed(self, chunk):
+        """Decode part of a scan with the locked encoding; returns None until one is learned."""
+        if self._stream is None:
+            return None
+        return self._stream.feed(chunk)
+
+    def unlock(self):
+        """Forget the learned encoding."""
+        self.encoding = None
+        self._stream = None
+        self._candidate = None
+        self._streak = 0
+        self._misses = 0
+
+    def _learn(self, encoding):
+        """Count a sniffed encoding towards locking it in."""
+        if encoding == self._candidate:
+            self._streak += 1
+        else:
+            self._candidate = encoding
+            self._streak = 1
+
+        if self._streak >= self.learn_scans:
+            self.encoding = encoding
+            self._stream = StreamDecoder(encoding)
+            self._misses = 0
+            logger.info(f"{self._label()}: locked encoding {encoding}")
+
+    def _label(self):
+        """Name used in log messages."""
+        return self.name or "decoder"
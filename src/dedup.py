@@ -0,0 +1,121 @@
+"""
+QR2Key - Duplicate scan suppression
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from loguru import logger
+
+DEDUP_SCOPES = ("port", "global")
+
+class DedupCache:
+    """Suppress repeats of a scan seen within the last ttl seconds.
+
+    Scans are keyed on a 16-byte BLAKE2b digest of the raw payload (and the
+    port when scope is "port"), so memory per entry is fixed whatever the
+    payload size. Entries are kept in an OrderedDict ordered by the time
+    they last passed, which makes lookup, expiry and LRU eviction O(1) and
+    caps the cache at max_entries.
+
+    A repeat within the window is suppressed without moving the window,
+    which counts from the last scan that was typed, so a code scanned on
+    purpose at intervals just under ttl is still typed every other time
+    rather than never. Not thread-safe: call it from the reader thread only.
+    """
+
+    def __init__(self, ttl=1.0, max_entries=1024, scope="port", clock=time.monotonic):
+        """Initialize the cache; a ttl of 0 disables suppression."""
+        if scope not in DEDUP_SCOPES:
+            raise ValueError(f"Unknown dedup scope: {scope}")
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.scope = scope
+        self.clock = clock
+
+        self._seen = OrderedDict()
+        self.passed = 0
+        self.suppressed = 0
+        self.evicted = 0
+        self.last_suppressed_gap = None
+
+    def __len__(self):
+        return len(self._seen)
+
+    def key(self, scan):
+        """Return the cache key of a scan."""
+        digest = hashlib.blake2b(digest_size=16)
+        if self.scope == "port" and scan.port:
+            digest.update(scan.port.encode("utf-8", "surrogateescape"))
+            digest.update(b"\0")
+        digest.update(scan.raw if scan.raw is not None else scan.text.encode("utf-8", "surrogateescape"))
+        return digest.digest()
+
+    def is_duplicate(self, scan, now=None):
+        """Record a scan; returns True if it repeats one seen within the window."""
+        if not self.ttl:
+            self.passed += 1
+            return False
+        if now is None:
+            now = scan.received_at if scan.received_at is not None else self.clock()
+
+        self._expire(now)
+        key = self.key(scan)
+        last_passed = self._seen.get(key)
+        if last_passed is not None:
+            self.suppressed += 1
+            self.last_suppressed_gap = now - last_passed
+            logger.debug("Suppressed duplicate scan from {} ({:.0f} ms after the one typed)",
+                         scan.port, self.last_suppressed_gap * 1000)
+            return True
+
+        self._seen[key] = now
+        self.passed += 1
+        if len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+            self.evicted += 1
+        return False
+
+    def reconfigure(self, ttl, max_entries, scope):
+        """Apply new settings; a new scope forgets every scan, since its keys differ."""
+        if scope not in DEDUP_SCOPES:
+            raise ValueError(f"Unknown dedup scope: {scope}")
+        if scope != self.scope:
+            self._seen.clear()
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.scope = scope
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+            self.evicted += 1
+
+    def expire(self, now=None):
+        """Forget scans whose window has passed, so an idle cache holds nothing."""
+        self._expire(self.clock() if now is None else now)
+
+    def clear(self):
+        """Forget every scan seen so far."""
+        self._seen.clear()
+
+    def stats(self):
+        """Return the suppression window and counters."""
+        return {
+            "ttl": self.ttl,
+            "scope": self.scope,
+            "entries": len(self._seen),
+            "max_entries": self.max_entries,
+            "passed": self.passed,
+            "suppressed": self.suppressed,
+            "evicted": self.evicted,
+            "last_suppressed_gap": self.last_suppressed_gap,
+        }
+
+    def _expire(self, now):
+        """Drop entries that passed more than ttl seconds ago (oldest first)."""
+        seen = self._seen
+        cutoff = now - self.ttl
+        while seen:
+            key, last_passed = next(iter(seen.items()))
+            if last_passed > cutoff:
+                break
+            del seen[key]
@@ -0,0 +1,212 @@
+"""
+QR2Key - Scan framing for serial byte streams
+"""
+
+import time
+from loguru import logger
+
+FRAMING_MODES = ("terminator", "length", "idle")
+
+class FrameAssembler:
+    """Assemble complete scans from a serial byte stream.
+
+    Bytes are copied into a single ring buffer allocated up front; complete
+    frames are cut out of it by terminator, by length prefix or after an
+    inter-byte idle gap.
+    """
+
+    def __init__(self, mode="terminator", terminator="auto", idle_timeout=0.1,
+                 length_bytes=2, buffer_size=8192):
+        """Initialize the assembler and allocate its ring buffer."""
+        if mode not in FRAMING_MODES:
+            raise ValueError(f"Unknown framing mode: {mode}")
+        if mode == "length" and not 1 <= length_bytes <= 4:
+            raise ValueError(f"Length prefix must be 1-4 bytes, got {length_bytes}")
+
+        self.mode = mode
+        self.idle_timeout = idle_timeout or 0
+        self.length_bytes = length_bytes
+
+        if terminator == "auto":
+            self._terminators = (b"\r", b"\n")  # CR, LF or CRLF
+        else:
+            if isinstance(terminator, str):
+                terminator = terminator.encode("latin-1")
+            if not terminator:
+                raise ValueError("Terminator must not be empty")
+            self._terminators = (terminator,)
+
+        self._buffer = bytearray(buffer_size)
+        self._capacity = buffer_size
+        self._start = 0
+        self._size = 0
+        self._scanned = 0  # Leading bytes already searched for a terminator
+        self._last_byte_at = None
+
+    @classmethod
+    def from_config(cls, framing):
+        """Create an assembler from a serial.framing config section."""
+        framing = framing or {}
+        return cls(
+            mode=framing.get("mode", "terminator"),
+            terminator=framing.get("terminator", "auto"),
+            idle_timeout=framing.get("idle_timeout", 0.1),
+            length_bytes=framing.get("length_bytes", 2),
+            buffer_size=framing.get("buffer_size", 8192),
+        )
+
+    @property
+    def pending(self):
+        """Number of buffered bytes that are not yet part of a complete frame."""
+        return self._size
+
+    def reset(self):
+        """Discard any partially assembled frame."""
+        self._start = 0
+        self._size = 0
+        self._scanned = 0
+        self._last_byte_at = None
+
+    def feed(self, data, now=None):
+        """Add received bytes and return the list of frames they complete."""
+        if now is None:
+            now = time.monotonic()
+
+        frames = []
+        view = memoryview(data)
+
+        while view:
+            count = min(len(view), self._capacity - self._size)
+            self._write(view[:count])
+            view = view[count:]
+
+            self._extract(frames)
+
+            if self._size == self._capacity:
+                self._overflow(frames)
+
+        if data:
+            self._last_byte_at = now
+        return frames
+
+    def poll(self, now=None):
+        """Return frames completed by an idle gap since the last received byte."""
+        if now is None:
+            now = time.monotonic()
+
+        remaining = self.time_until_idle(now)
+        if remaining is None or remaining > 0:
+            return []
+
+        if self.mode == "length":
+            logger.warning(f"Discarding {self._size} bytes of incomplete length-prefixed frame")
+            self.reset()
+            return []
+
+        frame = self._take(self._size)
+        self.reset()
+        return [frame] if frame else []
+
+    def time_until_idle(self, now=None):
+        """Seconds until the idle gap completes the pending frame, or None if nothing is pending."""
+        if not self._size or not self.idle_timeout or self._last_byte_at is None:
+            return None
+        if now is None:
+            now = time.monotonic()
+        return max(0.0, self._last_byte_at + self.idle_timeout - now)
+
+    def _write(self, view):
+        """Copy bytes into the free space of the ring buffer."""
+        count = len(view)
+        pos = (self._start + self._size) % self._capacity
+        first = min(count, self._capacity - pos)
+        self._buffer[pos:pos + first] = view[:first]
+        if count > first:
+            self._buffer[0:count - first] = view[first:]
+        self._size += count
+
+    def _extract(self, frames):
+        """Move every complete frame from the ring buffer into frames."""
+        if self.mode == "terminator":
+            while self._size:
+                found = None
+                for terminator in self._terminators:
+                    index = self._find(terminator, self._scanned)
+                    if index >= 0 and (found is None or index < found[0]):
+                        found = (index, len(terminator))
+
+                if found is None:
+                    longest = max(len(t) for t in self._terminators)
+                    self._scanned = max(0, self._size - longest + 1)
+                    return
+
+                index, length = found
+                frame = self._take(index)
+                self._consume(index + length)
+                if frame:
+                    frames.append(frame)
+
+        elif self.mode == "length":
+            header = self.length_bytes
+            while self._size >= header:
+                length = int.from_bytes(self._take(header), "big")
+                if length > self._capacity - header:
+                    logger.warning(f"Length prefix {length} exceeds buffer, resynchronizing")
+                    self.reset()
+                    return
+                if self._size < header + length:
+                    return
+
+                self._consume(header)
+                frame = self._take(length)
+                self._consume(length)
+                if frame:
+                    frames.append(frame)
+
+    def _overflow(self, frames):
+        """Handle a ring buffer that filled up without completing a frame."""
+        logger.warning(f"Frame exceeds {self._capacity} byte buffer, emitting it unterminated")
+        frame = self._take(self._size)
+        self.reset()
+        if self.mode != "length":
+            frames.append(frame)
+
+    def _find(self, pattern, begin):
+        """Return the logical offset of pattern at or after begin, or -1."""
+        end = self._size
+        if end - begin < len(pattern):
+            return -1
+
+        start = self._start
+        tail = self._capacity - start  # Logical length of the first segment
+
+        if end <= tail:
+            index = self._buffer.find(pattern, start + begin, start + end)
+            return index - start if index >= 0 else -1
+
+        if begin < tail:
+            index = self._buffer.find(pattern, start + begin, self._capacity)
+            if index >= 0:
+                return index - start
+
+            # A multi-byte pattern may straddle the wrap point
+            for offset in range(max(begin, tail - len(pattern) + 1), min(tail, end - len(pattern) + 1)):
+                if all(self._buffer[(start + offset + i) % self._capacity] == pattern[i]
+                       for i in range(len(pattern))):
+                    return offset
+
+        index = self._buffer.find(pattern, max(0, begin - tail), end - tail)
+        return index + tail if index >= 0 else -1
+
+    def _take(self, count):
+        """Return a copy of the first count buffered bytes without consuming them."""
+        start = self._start
+        if start + count <= self._capacity:
+            return bytes(self._buffer[start:start + count])
+        return bytes(self._buffer[start:]) + bytes(self._buffer[:start + count - self._capacity])
+
+    def _consume(self, count):
+        """Drop the first count buffered bytes."""
+        self._size -= count
+        self._scanned = max(0, self._scanned - count)
+        self._start = (self._start + count) % self._capacity if self._size else 0
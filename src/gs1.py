@@ -0,0 +1,297 @@
+"""
+QR2Key - GS1 element string and GTIN parsing with validation
+"""
+
+import re
+
+GS = "\x1d"  # FNC1 as transmitted between variable-length elements
+
+GS1_MODES = ("off", "flag", "reject")
+
+# Symbology identifiers of GS1 symbols, and of EAN/UPC symbols that carry a GTIN
+GS1_IDENTIFIERS = ("]C1", "]e0", "]d2", "]Q3", "]J1")
+GTIN_IDENTIFIERS = ("]E0", "]E4", "]E3")
+
+# GTIN kinds by digit count
+GTIN_KINDS = {8: "ean8", 12: "upca", 13: "ean13", 14: "gtin14"}
+
+# Application Identifiers: (AI, title, format, flags). Formats follow the GS1
+# General Specifications: N digits, X characters of CSET 82, "..n" up to n,
+# "+" joins parts. Flags: "cd" = the leading digits end in a GS1 check digit,
+# "date" = the value is YYMMDD.
+AI_TABLE = (
+    ("00", "SSCC", "N18", "cd"),
+    ("01", "GTIN", "N14", "cd"),
+    ("02", "CONTENT", "N14", "cd"),
+    ("10", "BATCH/LOT", "X..20", ""),
+    ("11", "PROD DATE", "N6", "date"),
+    ("12", "DUE DATE", "N6", "date"),
+    ("13", "PACK DATE", "N6", "date"),
+    ("15", "BEST BEFORE", "N6", "date"),
+    ("16", "SELL BY", "N6", "date"),
+    ("17", "USE BY", "N6", "date"),
+    ("20", "VARIANT", "N2", ""),
+    ("21", "SERIAL", "X..20", ""),
+    ("22", "CPV", "X..20", ""),
+    ("240", "ADDITIONAL ID", "X..30", ""),
+    ("241", "CUST. PART No.", "X..30", ""),
+    ("242", "MTO VARIANT", "N..6", ""),
+    ("250", "SECONDARY SERIAL", "X..30", ""),
+    ("251", "REF. TO SOURCE", "X..30", ""),
+    ("253", "GDTI", "N13+X..17", "cd"),
+    ("254", "GLN EXTENSION COMPONENT", "X..20", ""),
+    ("30", "VAR. COUNT", "N..8", ""),
+    ("37", "COUNT", "N..8", ""),
+    ("400", "ORDER NUMBER", "X..30", ""),
+    ("401", "GINC", "X..30", ""),
+    ("402", "GSIN", "N17", "cd"),
+    ("403", "ROUTE", "X..30", ""),
+    ("410", "SHIP TO LOC", "N13", "cd"),
+    ("411", "BILL TO", "N13", "cd"),
+    ("412", "PURCHASE FROM", "N13", "cd"),
+    ("413", "SHIP FOR LOC", "N13", "cd"),
+    ("414", "LOC No.", "N13", "cd"),
+    ("415", "PAY TO", "N13", "cd"),
+    ("416", "PROD/SERV LOC", "N13", "cd"),
+    ("420", "SHIP TO POST", "X..20", ""),
+    ("421", "SHIP TO POST", "N3+X..9", ""),
+    ("422", "ORIGIN", "N3", ""),
+    ("423", "COUNTRY - INITIAL PROCESS.", "N3+N..12", ""),
+    ("424", "COUNTRY - PROCESS.", "N3", ""),
+    ("425", "COUNTRY - DISASSEMBLY", "N3+N..12", ""),
+    ("426", "COUNTRY - FULL PROCESS", "N3", ""),
+    ("7003", "EXPIRY TIME", "N10", ""),
+    ("8003", "GRAI", "N14+X..16", "cd"),
+    ("8004", "GIAI", "X..30", ""),
+    ("8005", "PRICE PER UNIT", "N6", ""),
+    ("8006", "ITIP", "N14+N2+N2", "cd"),
+    ("8017", "GSRN - PROVIDER", "N18", "cd"),
+    ("8018", "GSRN - RECIPIENT", "N18", "cd"),
+    ("8020", "REF No.", "X..25", ""),
+    ("90", "INTERNAL", "X..30", ""),
+) + tuple(
+    # Trade measures: the fourth digit is the decimal point position
+    (f"{prefix}{decimals}", title, "N6", "")
+    for prefix, title in (
+        ("310", "NET WEIGHT (kg)"), ("311", "LENGTH (m)"), ("312", "WIDTH (m)"), ("313", "HEIGHT (m)"),
+        ("314", "AREA (m2)"), ("315", "NET VOLUME (l)"), ("316", "NET VOLUME (m3)"),
+        ("320", "NET WEIGHT (lb)"), ("330", "GROSS WEIGHT (kg)"), ("392", "PRICE"), ("393", "PRICE"),
+    )
+    for decimals in range(10)
+) + tuple(
+    (f"9{company}", "INTERNAL", "X..90", "") for company in range(1, 10)
+)
+
+# Characters allowed in X fields (GS1 AI encodable character set 82)
+_CSET82 = r"""[!"%&'()*+,\-./0-9:;<=>?A-Z_a-z]"""
+
+def _compile_format(format):
+    """Compile an AI format into (regex, minimum length, maximum length)."""
+    pattern = []
+    min_length = max_length = 0
+    for part in format.split("+"):
+        charset = "[0-9]" if part[0] == "N" else _CSET82
+        if part[1:3] == "..":
+            length = int(part[3:])
+            pattern.append(f"{charset}{{1,{length}}}")
+            min_length += 1
+        else:
+            length = int(part[1:])
+            pattern.append(f"{charset}{{{length}}}")
+            min_length += length
+        max_length += length
+    return re.compile("".join(pattern)).fullmatch, min_length, max_length
+
+class ApplicationIdentifier:
+    """Compiled entry of AI_TABLE."""
+
+    __slots__ = ("ai", "title", "fullmatch", "min_length", "max_length", "fixed", "check_length", "date")
+
+    def __init__(self, ai, title, format, flags):
+        """Compile the format and flags of one AI."""
+        self.ai = ai
+        self.title = title
+        self.fullmatch, self.min_length, self.max_length = _compile_format(format)
+        self.fixed = self.min_length == self.max_length
+        # Digits covered by the check digit: the leading numeric part
+        self.check_length = int(format.split("+")[0][1:]) if "cd" in flags.split() else 0
+        self.date = "date" in flags.split()
+
+AIS = {entry[0]: ApplicationIdentifier(*entry) for entry in AI_TABLE}
+# Length of the AI starting with each two-digit prefix
+AI_LENGTHS = {}
+for _ai in AIS:
+    if AI_LENGTHS.setdefault(_ai[:2], len(_ai)) != len(_ai):
+        raise ValueError(f"AI {_ai} does not have the length of the other {_ai[:2]} AIs")
+del _ai
+
+_BRACKETED_AI = re.compile(r"\(([0-9]{2,4})\)")
+_DIGITS = re.compile("[0-9]+").fullmatch
+
+_CHECK_DIGITS = "0123456789"
+
+# Days per month; February gets 29 in years divisible by 4, which covers
+# every leap year of the century GS1 maps YY into
+_MONTH_DAYS = (31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def check_digit(digits):
+    """Return the GS1 mod 10 check digit for a string of digits without it."""
+    # Summing the ASCII codes runs in C; each digit carries an offset of 48
+    tripled = digits[-1::-2].encode("ascii")
+    single = digits[-2::-2].encode("ascii")
+    total = 3 * sum(tripled) + sum(single) - 48 * (3 * len(tripled) + len(single))
+    return _CHECK_DIGITS[-total % 10]
+
+def _valid_date(value):
+    """Whether six digits YYMMDD are a real date; DD 00 means the end of the month."""
+    month = int(value[2:4])
+    if not 1 <= month <= 12:
+        return False
+    day = int(value[4:6])
+    if month == 2 and day == 29:
+        return int(value[:2]) % 4 == 0
+    return day <= _MONTH_DAYS[month - 1]
+
+class GS1Code:
+    """A parsed GS1 element string or GTIN.
+
+    kind is "gs1" for element strings, or ean8/upca/ean13/gtin14 for a
+    bare GTIN, which is also available as element 01. elements maps AIs to
+    values in scan order; errors lists every problem found, without the
+    scanned values so they can be logged, and a code is valid when it has
+    none.
+    """
+
+    __slots__ = ("kind", "elements", "errors", "identifier")
+
+    def __init__(self, kind, elements=None, errors=None, identifier=""):
+        """Initialize the parse result."""
+        self.kind = kind
+        self.elements = elements if elements is not None else {}
+        self.errors = errors if errors is not None else []
+        self.identifier = identifier
+
+    @property
+    def valid(self):
+        """Whether no problems were found."""
+        return not self.errors
+
+    def get(self, ai, default=None):
+        """Return the value of an element."""
+        return self.elements.get(ai, default)
+
+    def __repr__(self):
+        return f"GS1Code({self.kind!r}, {self.elements!r}, errors={self.errors!r})"
+
+def _add(code, ai, value):
+    """Validate one element and add it to the code."""
+    spec = AIS.get(ai)
+    if spec is None:
+        code.errors.append(f"unknown AI ({ai})")
+        return
+    if not spec.fullmatch(value):
+        code.errors.append(f"({ai}) {spec.title}: bad length or characters")
+    elif spec.check_length and check_digit(value[:spec.check_length - 1]) != value[spec.check_length - 1]:
+        code.errors.append(f"({ai}) {spec.title}: wrong check digit")
+    elif spec.date and not _valid_date(value):
+        code.errors.append(f"({ai}) {spec.title}: invalid date")
+    previous = code.elements.setdefault(ai, value)
+    if previous != value:
+        code.errors.append(f"({ai}) {spec.title}: repeated with a different value")
+
+def parse_element_string(data, identifier=""):
+    """Split and validate a GS1 element string with GS (FNC1) separators."""
+    code = GS1Code("gs1", identifier=identifier)
+    pos = 0
+    end = len(data)
+    while pos < end:
+        if data[pos] == GS:
+            pos += 1
+            continue
+        ai_length = AI_LENGTHS.get(data[pos:pos + 2])
+        if ai_length is None:
+            code.errors.append(f"unknown AI at position {pos}")
+            break
+        ai = data[pos:pos + ai_length]
+        spec = AIS.get(ai)
+        pos += ai_length
+        # Predefined lengths need no separator; a short value still ends at one
+        limit = pos + spec.max_length if spec is not None and spec.fixed else end
+        value_end = data.find(GS, pos, limit)
+        if value_end < 0:
+            value_end = min(limit, end)
+        _add(code, ai, data[pos:value_end])
+        pos = value_end
+    if not code.elements and not code.errors:
+        code.errors.append("no elements")
+    return code
+
+def _next_bracketed_ai(data, pos):
+    """Return where the next bracketed known AI starts, or the end of data."""
+    for match in _BRACKETED_AI.finditer(data, pos):
+        if match.group(1) in AIS:
+            return match.start()
+    return len(data)
+
+def parse_bracketed(data):
+    """Split and validate the human-readable form, e.g. (01)04912345678904(10)ABC.
+
+    Values may contain brackets, so a value ends at the next bracketed
+    known AI, or after its predefined length.
+    """
+    code = GS1Code("gs1")
+    pos = 0
+    end = len(data)
+    while pos < end:
+        match = _BRACKETED_AI.match(data, pos)
+        if match is None:
+            code.errors.append(f"unparsed text at position {pos}")
+            break
+        ai = match.group(1)
+        spec = AIS.get(ai)
+        pos = match.end()
+        value_end = _next_bracketed_ai(data, pos)
+        if spec is not None and spec.fixed:
+            value_end = min(value_end, pos + spec.max_length)
+        _add(code, ai, data[pos:value_end])
+        pos = value_end
+    return code
+
+def parse_gtin(digits, identifier=""):
+    """Validate a bare EAN-8, UPC-A, EAN-13/JAN or GTIN-14."""
+    code = GS1Code(GTIN_KINDS[len(digits)], {"01": digits.zfill(14)}, identifier=identifier)
+    if check_digit(digits[:-1]) != digits[-1]:
+        code.errors.append(f"{code.kind}: wrong check digit")
+    return code
+
+def parse_code(text, bare_gtins=False):
+    """Parse a scan as a GS1 element string or GTIN; returns None for other payloads.
+
+    GS1 is recognised by a GS1 symbology identifier (e.g. ]C1, ]d2, ]Q3),
+    by an FNC1 separator after a known AI, or by the bracketed form
+    starting with a known AI such as "(01)". GTINs are 8, 12, 13 or 14
+    ASCII digits after an EAN/UPC identifier (]E0, ]E3, ]E4); without one,
+    order numbers and the like look the same, so bare digits are only
+    taken as a GTIN when bare_gtins is set.
+    """
+    identifier = text[:3] if text[:1] == "]" else ""
+    if identifier:
+        data = text[3:]
+        if identifier in GS1_IDENTIFIERS:
+            return parse_element_string(data.lstrip(GS), identifier)
+        if identifier not in GTIN_IDENTIFIERS:
+            return None
+    else:
+        data = text
+    if _DIGITS(data):
+        if len(data) in GTIN_KINDS and (identifier or bare_gtins):
+            return parse_gtin(data, identifier)
+        return None
+    if data[:1] == GS:
+        return parse_element_string(data[1:])
+    if data[:1] == "(":
+        match = _BRACKETED_AI.match(data)
+        return parse_bracketed(data) if match and match.group(1) in AIS else None
+    if GS in data and data[:2] in AI_LENGTHS:
+        return parse_element_string(data)
+    return None
@@ -4,44 +4,114 @@ QR2Key - Simple macOS GUI
 
 import sys
 import os
+import math
+import time
+from collections import deque
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QGroupBox, QCheckBox, QSystemTrayIcon,
-    QMenu, QAction, QStyle, QTabWidget, QTextEdit, QScrollArea
+    QMenu, QAction, QStyle, QTabWidget, QTextEdit, QScrollArea, QListWidget, QGridLayout
 )
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QSize
-from PyQt5.QtGui import QIcon, QPixmap, QFont
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QSize, QPointF
+from PyQt5.QtGui import QIcon, QPixmap, QFont, QPainter, QPen, QPolygonF
 
 from loguru import logger
 from config import Config
+from gui_bridge import FRAME_INTERVAL, MAX_SCANS, UpdateCoalescer
+from logger import log_payload
+from performance import SAMPLE_INTERVAL, SERIES
+
+class Sparkline(QWidget):
+    """Line chart of a RingBuffer, scaled from zero to its largest value."""
+    
+    def __init__(self, buffer, parent=None):
+        """Initialize the chart for a ring buffer."""
+        super().__init__(parent)
+        self.buffer = buffer
+        self.setMinimumSize(160, 28)
+    
+    def paintEvent(self, event):
+        """Draw the buffered values; NaN samples leave gaps."""
+        values = self.buffer.values()
+        top = max((v for v in values if not math.isnan(v)), default=0) or 1
+        width, height = self.width() - 2, self.height() - 2
+        step = width / max(1, self.buffer.capacity - 1)
+        offset = width - step * (len(values) - 1)  # The newest sample is at the right edge
+        
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(self.palette().highlight().color(), 1.5))
+        line = QPolygonF()
+        for i, value in enumerate(values + [math.nan]):
+            if math.isnan(value):
+                if line.size() > 1:
+                    painter.drawPolyline(line)
+                line = QPolygonF()
+                continue
+            line.append(QPointF(1 + offset + i * step, 1 + height * (1 - value / top)))
+        painter.end()
 
 class QR2KeyGUI(QMainWindow):
-    """Main GUI window for QR2Key application."""
+    """Main GUI window for QR2Key application.
+    
+    Only the tray icon is created up front. The window contents are built
+    the first time it is shown, and the Settings and About tabs the first
+    time they are selected, so starting minimized builds no widgets.
+    
+    Other threads never touch widgets: post_port_status() and post_scan()
+    queue events in an UpdateCoalescer and wake the GUI thread with one
+    queued signal, and refresh() applies everything that arrived at most
+    once per FRAME_INTERVAL.
+    """
     
     toggle_signal = pyqtSignal(bool)  # Signal for pause/resume
     exit_signal = pyqtSignal()  # Signal for exit
+    updates_posted = pyqtSignal()  # Emitted from any thread when updates start to pend
+    paused_changed = pyqtSignal(bool)  # Emitted from any thread when pausing without the GUI
     
-    def __init__(self, config, version="1.0.0"):
+    def __init__(self, config, version="1.0.0", history=None):
         """Initialize the GUI window."""
         super().__init__()
         
         self.config = config
         self.version = version
+        self.history = history
         self.is_paused = False
+        self.port_text = f"Port: {self.config.get('serial', 'port', 'Not connected')}"
+        self.ui_built = False
+        self.tab_builders = {}
+        self.updates = UpdateCoalescer(MAX_SCANS)
+        self.recent_scans = deque(maxlen=MAX_SCANS)
+        self.scan_count = 0
+        self.last_refresh = 0.0
         
         self.setWindowTitle(f"QR2Key v{version}")
         self.setMinimumSize(500, 400)
         
-        self.init_ui()
         self.setup_tray()
         
-        if self.config.get("app", "start_minimized", False):
-            self.hide()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.updates_posted.connect(self.schedule_refresh)
+        self.paused_changed.connect(self.show_paused)
+        
+        self.performance_rows = []
+        self.performance_timer = QTimer(self)
+        self.performance_timer.setInterval(int(SAMPLE_INTERVAL * 1000))
+        self.performance_timer.timeout.connect(self.refresh_performance)
         
         logger.info("GUI initialized")
     
+    def show(self):
+        """Build the window contents if needed and show the window."""
+        if not self.ui_built:
+            self.init_ui()
+        super().show()
+    
     def init_ui(self):
         """Initialize the user interface."""
+        self.ui_built = True
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
         
@@ -64,7 +134,7 @@ class QR2KeyGUI(QMainWindow):
         
         main_layout.addLayout(header_layout)
         
-        tab_widget = QTabWidget()
+        tab_widget = self.tab_widget = QTabWidget()
         
         status_tab = QWidget()
         status_layout = QVBoxLayout(status_tab)
@@ -72,10 +142,10 @@ class QR2KeyGUI(QMainWindow):
         status_group = QGroupBox("Status")
         status_group_layout = QVBoxLayout(status_group)
         
-        self.status_label = QLabel("Ready")
+        self.status_label = QLabel("Paused" if self.is_paused else "Ready")
         status_group_layout.addWidget(self.status_label)
         
-        self.port_label = QLabel(f"Port: {self.config.get('serial', 'port', 'Not connected')}")
+        self.port_label = QLabel(self.port_text)
         status_group_layout.addWidget(self.port_label)
         
         self.auto_detect_checkbox = QCheckBox("Auto-detect ports")
@@ -90,10 +160,23 @@ class QR2KeyGUI(QMainWindow):
         
         status_layout.addWidget(status_group)
         
+        scans_group = QGroupBox("Recent Scans")
+        scans_group_layout = QVBoxLayout(scans_group)
+        
+        self.scan_count_label = QLabel(f"Scans: {self.scan_count}")
+        scans_group_layout.addWidget(self.scan_count_label)
+        
+        self.scan_list = QListWidget()
+        self.scan_list.addItems([self.format_scan(event) for event in self.recent_scans])
+        self.scan_list.scrollToBottom()
+        scans_group_layout.addWidget(self.scan_list)
+        
+        status_layout.addWidget(scans_group)
+        
         controls_group = QGroupBox("Controls")
         controls_layout = QHBoxLayout(controls_group)
         
-        self.pause_button = QPushButton("Pause")
+        self.pause_button = QPushButton("Resume" if self.is_paused else "Pause")
         self.pause_button.clicked.connect(self.toggle_pause)
         controls_layout.addWidget(self.pause_button)
         
@@ -102,11 +185,77 @@ class QR2KeyGUI(QMainWindow):
         controls_layout.addWidget(exit_button)
         
         status_layout.addWidget(controls_group)
-        status_layout.addStretch()
         
-        settings_tab = QWidget()
-        settings_layout = QVBoxLayout(settings_tab)
+        tab_widget.addTab(status_tab, "Status")
+        if self.history is not None:
+            self.performance_tab = self.add_lazy_tab(tab_widget, "Performance", self.build_performance_tab)
+        self.add_lazy_tab(tab_widget, "Settings", self.build_settings_tab)
+        self.add_lazy_tab(tab_widget, "About", self.build_about_tab)
+        tab_widget.currentChanged.connect(lambda index: self.build_tab(tab_widget, index))
+        tab_widget.currentChanged.connect(self.update_performance_timer)
         
+        main_layout.addWidget(tab_widget)
+    
+    def add_lazy_tab(self, tab_widget, title, builder):
+        """Add an empty tab that builder(layout) fills when it is first selected."""
+        index = tab_widget.addTab(QWidget(), title)
+        self.tab_builders[index] = builder
+        return index
+    
+    def build_tab(self, tab_widget, index):
+        """Fill a lazily built tab the first time it is selected."""
+        builder = self.tab_builders.pop(index, None)
+        if builder:
+            builder(QVBoxLayout(tab_widget.widget(index)))
+    
+    def build_performance_tab(self, performance_layout):
+        """Build the Performance tab: one sparkline per series with its latest value."""
+        grid = QGridLayout()
+        for row, (name, label) in enumerate(SERIES):
+            buffer = self.history.series[name]
+            value_label = QLabel()
+            value_label.setMinimumWidth(90)
+            value_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            sparkline = Sparkline(buffer)
+            grid.addWidget(QLabel(label), row, 0)
+            grid.addWidget(sparkline, row, 1)
+            grid.addWidget(value_label, row, 2)
+            grid.setColumnStretch(1, 1)
+            self.performance_rows.append((name, buffer, sparkline, value_label))
+        performance_layout.addLayout(grid)
+        performance_layout.addStretch()
+        self.refresh_performance()
+    
+    def performance_visible(self):
+        """Whether the Performance tab is on screen."""
+        return (self.ui_built and self.isVisible() and self.history is not None
+                and self.tab_widget.currentIndex() == self.performance_tab)
+    
+    def update_performance_timer(self, *args):
+        """Redraw the Performance tab periodically only while it is on screen."""
+        if self.performance_visible():
+            if not self.performance_timer.isActive():
+                self.performance_timer.start()
+        else:
+            self.performance_timer.stop()
+    
+    def refresh_performance(self):
+        """Redraw the sparklines and latest values."""
+        for name, buffer, sparkline, value_label in self.performance_rows:
+            value_label.setText(self.format_metric(name, buffer.last()))
+            sparkline.update()
+    
+    @staticmethod
+    def format_metric(name, value):
+        """Format the latest value of a series."""
+        if math.isnan(value):
+            return "-"
+        if name.startswith("latency_"):
+            return f"{value * 1000:.1f} ms"
+        return f"{value:,.0f}"
+    
+    def build_settings_tab(self, settings_layout):
+        """Build the Settings tab."""
         settings_text = QTextEdit()
         settings_text.setReadOnly(True)
         
@@ -126,10 +275,9 @@ class QR2KeyGUI(QMainWindow):
         
         settings_text.setMarkdown(config_text)
         settings_layout.addWidget(settings_text)
-        
-        about_tab = QWidget()
-        about_layout = QVBoxLayout(about_tab)
-        
+    
+    def build_about_tab(self, about_layout):
+        """Build the About tab."""
         about_text = QTextEdit()
         about_text.setReadOnly(True)
         about_text.setMarkdown("""
@@ -149,12 +297,6 @@ class QR2KeyGUI(QMainWindow):
         Copyright © 2025
         """)
         about_layout.addWidget(about_text)
-        
-        tab_widget.addTab(status_tab, "Status")
-        tab_widget.addTab(settings_tab, "Settings")
-        tab_widget.addTab(about_tab, "About")
-        
-        main_layout.addWidget(tab_widget)
     
     def setup_tray(self):
         """Set up the system tray icon and menu."""
@@ -192,23 +334,77 @@ class QR2KeyGUI(QMainWindow):
     
     def toggle_pause(self):
         """Toggle between pause and resume states."""
-        self.is_paused = not self.is_paused
-        
-        if self.is_paused:
-            self.pause_button.setText("Resume")
-            self.pause_action.setText("Resume")
-            self.status_label.setText("Paused")
-        else:
-            self.pause_button.setText("Pause")
-            self.pause_action.setText("Pause")
-            self.status_label.setText("Running")
-        
+        self.show_paused(not self.is_paused)
         self.toggle_signal.emit(self.is_paused)
         logger.info(f"QR2Key {'paused' if self.is_paused else 'resumed'}")
     
+    def show_paused(self, paused):
+        """Show the paused or running state without emitting toggle_signal."""
+        self.is_paused = paused
+        self.pause_action.setText("Resume" if paused else "Pause")
+        if self.ui_built:
+            self.pause_button.setText("Resume" if paused else "Pause")
+            self.status_label.setText("Paused" if paused else "Running")
+    
     def update_port_status(self, port):
         """Update the port status display."""
-        self.port_label.setText(f"Port: {port}")
+        self.port_text = f"Port: {port}"
+        if self.ui_built:
+            self.port_label.setText(self.port_text)
+    
+    def post_port_status(self, port):
+        """Queue a port status update; safe from any thread."""
+        if self.updates.post_status(port):
+            self.updates_posted.emit()
+    
+    def post_scan(self, port, text, result):
+        """Queue a scan for the Recent Scans feed; safe from any thread."""
+        if self.updates.post_scan(port, text, result):
+            self.updates_posted.emit()
+    
+    def schedule_refresh(self):
+        """Arm the refresh timer so refreshes are at least FRAME_INTERVAL apart."""
+        if not self.refresh_timer.isActive():
+            delay = self.last_refresh + FRAME_INTERVAL - time.monotonic()
+            self.refresh_timer.start(max(0, int(delay * 1000)))
+    
+    def refresh(self):
+        """Apply the status and scans posted since the last refresh."""
+        self.last_refresh = time.monotonic()
+        update = self.updates.drain()
+        if update.status is not None:
+            self.update_port_status(update.status)
+        if update.scans or update.dropped:
+            self.scan_count += len(update.scans) + update.dropped
+            self.recent_scans.extend(update.scans)
+            if self.ui_built:
+                self.show_scans(update.scans)
+    
+    def show_scans(self, scans):
+        """Append scans to the feed, keeping its last MAX_SCANS lines."""
+        self.scan_list.setUpdatesEnabled(False)
+        self.scan_list.addItems([self.format_scan(event) for event in scans])
+        for _ in range(self.scan_list.count() - MAX_SCANS):
+            self.scan_list.takeItem(0)
+        self.scan_list.setUpdatesEnabled(True)
+        self.scan_list.scrollToBottom()
+        self.scan_count_label.setText(f"Scans: {self.scan_count}")
+    
+    @staticmethod
+    def format_scan(event):
+        """Format a scan event as a feed line, masking the payload like the log."""
+        clock = time.strftime("%H:%M:%S", time.localtime(event.timestamp))
+        return f"{clock}  {event.port or '-'}  {event.result}  {log_payload(event.text)}"
+    
+    def showEvent(self, event):
+        """Resume Performance tab redraws when the window is shown."""
+        super().showEvent(event)
+        self.update_performance_timer()
+    
+    def hideEvent(self, event):
+        """Stop Performance tab redraws while the window is hidden."""
+        super().hideEvent(event)
+        self.update_performance_timer()
     
     def closeEvent(self, event):
         """Handle window close event."""
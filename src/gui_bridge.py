@@ -0,0 +1,79 @@
+"""
+QR2Key - Coalescing bridge from the scan path to the GUI
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+# Seconds between GUI refreshes, at most, and scans kept for the live feed
+FRAME_INTERVAL = 0.05
+MAX_SCANS = 100
+
+ScanEvent = namedtuple("ScanEvent", "timestamp port text result")
+Update = namedtuple("Update", "status scans dropped")
+
+class UpdateCoalescer:
+    """Collect status and scan events from any thread for the GUI to apply in one go.
+
+    Posting only stores the event under a short lock: the latest port
+    status replaces the previous one, and scans go into a bounded deque
+    that drops the oldest. A post returns True only when nothing was
+    pending, so the poster wakes the GUI at most once per drain; however
+    fast scans arrive, at most one wake-up is queued in the Qt event loop.
+    It does not use Qt, so it can be tested without a display.
+    """
+
+    def __init__(self, max_scans=MAX_SCANS):
+        """Initialize an empty coalescer keeping at most max_scans scans."""
+        self.max_scans = max_scans
+        self._lock = threading.Lock()
+        self._status = None
+        self._scans = deque(maxlen=max_scans)
+        self._posted_scans = 0
+        self._pending = False
+        self.wakeups = 0
+        self.drains = 0
+
+    @property
+    def pending(self):
+        """Whether events are waiting for the next drain."""
+        return self._pending
+
+    def post_status(self, status):
+        """Replace the pending port status; returns True if the GUI must be woken."""
+        with self._lock:
+            self._status = status
+            return self._mark_pending()
+
+    def post_scan(self, port, text, result, timestamp=None):
+        """Add a scan to the feed; returns True if the GUI must be woken."""
+        event = ScanEvent(time.time() if timestamp is None else timestamp, port, text, result)
+        with self._lock:
+            self._scans.append(event)
+            self._posted_scans += 1
+            return self._mark_pending()
+
+    def drain(self):
+        """Take everything posted since the last drain.
+
+        Returns an Update with the latest status (None if unchanged), the
+        kept scans oldest first, and how many scans were dropped because
+        more than max_scans arrived in between.
+        """
+        with self._lock:
+            update = Update(self._status, list(self._scans), self._posted_scans - len(self._scans))
+            self._status = None
+            self._scans.clear()
+            self._posted_scans = 0
+            self._pending = False
+            self.drains += 1
+        return update
+
+    def _mark_pending(self):
+        """Flag pending events; True on the first post since the last drain."""
+        if self._pending:
+            return False
+        self._pending = True
+        self.wakeups += 1
+        return True
@@ -0,0 +1,447 @@
+"""
+QR2Key - Append-only scan journal with time and payload indexes
+"""
+
+import hashlib
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right
+from loguru import logger
+
+# Stored as an index into RESULTS, so new results are only ever added at the end
+RESULTS = ("typed", "pasted", "paused", "duplicate", "dropped", "error", "sent", "rejected")
+
+DATA_FILE = "scans.dat"
+TIME_INDEX_FILE = "time.idx"
+HASH_INDEX_FILE = "hash.idx"
+HASH_HEADS_FILE = "hash.heads"
+CLEAN_FILE = "clean"
+
+DATA_MAGIC = b"QR2KJRN1"
+# Record: length of what follows, wall-clock time, sequence number, result,
+# port, raw and text lengths; then port, raw bytes, UTF-8 text and a CRC32
+RECORD = struct.Struct("<IdQBHII")
+CRC = struct.Struct("<I")
+TIME_ENTRY = struct.Struct("<dQ")       # Timestamp, record offset
+HASH_ENTRY = struct.Struct("<8sQQ")     # Text digest, record offset, previous entry + 1 in the bucket
+HEAD = struct.Struct("<Q")              # Last entry + 1 in each bucket, 0 when empty
+
+class JournalError(Exception):
+    """Raised when a journal cannot be opened or read."""
+
+class JournalRecord:
+    """One scan read back from the journal."""
+
+    __slots__ = ("timestamp", "seq", "port", "raw", "text", "result", "offset")
+
+    def __init__(self, timestamp, seq, port, raw, text, result, offset=None):
+        """Initialize the record."""
+        self.timestamp = timestamp
+        self.seq = seq
+        self.port = port
+        self.raw = raw
+        self.text = text
+        self.result = result
+        self.offset = offset
+
+    def __repr__(self):
+        return f"JournalRecord({self.text!r}, port={self.port!r}, result={self.result!r}, seq={self.seq})"
+
+def text_digest(text):
+    """Return the 8-byte digest a payload is indexed under."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogateescape"), digest_size=8).digest()
+
+class _MappedFile:
+    """Read-only memory map of a file that is appended to, remapped when it grows."""
+
+    def __init__(self, path):
+        """Open the file for reading."""
+        self._fd = os.open(path, os.O_RDONLY)
+        self._map = None
+        self._size = 0
+
+    def view(self):
+        """Return a buffer over the whole file as it is now."""
+        size = os.fstat(self._fd).st_size
+        if size != self._size:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ) if size else None
+            self._size = size
+        return self._map if self._map is not None else b""
+
+    def close(self):
+        """Unmap and close the file."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        os.close(self._fd)
+
+class _TimeKeys:
+    """Sequence of index timestamps for bisect over a mapped time index."""
+
+    def __init__(self, buffer, count):
+        self.buffer = buffer
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return TIME_ENTRY.unpack_from(self.buffer, index * TIME_ENTRY.size)[0]
+
+class ScanJournal:
+    """Append-only binary journal of every scan, indexed by time and payload.
+
+    Records go to scans.dat. time.idx holds (timestamp, offset) pairs in
+    append order, so a time range is two binary searches over the memory
+    mapped index. Payloads are indexed in a chained hash table: hash.heads
+    is a fixed array of buckets, each pointing at the newest hash.idx
+    entry for its bucket, and every entry points at the previous one.
+    Finding all scans of a payload therefore reads only the entries that
+    share its bucket.
+
+    append() only queues the scan. A writer thread commits queued scans in
+    groups, with one write and one fsync per group, and updates the
+    indexes after the data is on disk. If the app stops between the two,
+    the missing index entries are rebuilt from scans.dat on the next open,
+    and the bucket heads are rebuilt unless the journal was closed cleanly.
+    Queries may run on any thread while the writer appends.
+    """
+
+    def __init__(self, directory="journal", hash_buckets=1 << 20, commit_interval=0.05,
+                 max_batch=1024, fsync=True, clock=time.time):
+        """Open or create the journal in directory and start the writer thread."""
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.clock = clock
+        # Records hold raw scan payloads, so only the owner may read them
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        self._data = self._open(DATA_FILE, DATA_MAGIC)
+        self._time_index = self._open(TIME_INDEX_FILE)
+        self._hash_index = self._open(HASH_INDEX_FILE)
+        self._heads_fd, self.hash_buckets = self._open_heads(hash_buckets)
+        self._heads = mmap.mmap(self._heads_fd, self.hash_buckets * HEAD.size)
+
+        clean = os.path.exists(self._path(CLEAN_FILE))
+        if clean:
+            os.remove(self._path(CLEAN_FILE))
+        self._data_end = os.fstat(self._data).st_size
+        self._last_timestamp = 0.0
+        self._seq = 0
+        self._records = 0
+        self._recover(clean)
+
+        self._data_view = _MappedFile(self._path(DATA_FILE))
+        self._time_view = _MappedFile(self._path(TIME_INDEX_FILE))
+        self._hash_view = _MappedFile(self._path(HASH_INDEX_FILE))
+
+        self._queue = queue.SimpleQueue()
+        self._committed = threading.Condition()
+        # append() runs on the loop thread and the pipeline worker
+        self._submit_lock = threading.Lock()
+        self._submitted = 0
+        self._durable = 0
+        self.commits = 0
+        self.errors = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._thread.start()
+
+    def __len__(self):
+        return self._records
+
+    def append(self, text, port=None, raw=None, result="typed", timestamp=None):
+        """Queue a scan for the journal; never blocks on disk."""
+        if result not in RESULTS:
+            raise ValueError(f"Unknown scan result: {result}")
+        item = (self.clock() if timestamp is None else timestamp, port or "", raw or b"",
+                text or "", RESULTS.index(result))
+        with self._submit_lock:
+            self._submitted += 1
+            self._queue.put(item)
+
+    def flush(self, timeout=None):
+        """Wait until every scan appended so far is committed; returns False on timeout."""
+        with self._submit_lock:
+            target = self._submitted
+        with self._committed:
+            return self._committed.wait_for(lambda: self._durable >= target, timeout)
+
+    def close(self):
+        """Commit what is queued, stop the writer and close the files."""
+        if self._closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._closed = True
+        for view in (self._data_view, self._time_view, self._hash_view):
+            view.close()
+        self._heads.flush()
+        self._heads.close()
+        for fd in (self._data, self._time_index, self._hash_index, self._heads_fd):
+            os.close(fd)
+        open(self._path(CLEAN_FILE), "w").close()
+
+    def between(self, start, end):
+        """Return the records with start <= timestamp <= end, oldest first."""
+        buffer = self._time_view.view()
+        keys = _TimeKeys(buffer, len(buffer) // TIME_ENTRY.size)
+        first = bisect_left(keys, start)
+        last = bisect_right(keys, end)
+        data = self._data_view.view()
+        return [self._read(data, TIME_ENTRY.unpack_from(buffer, i * TIME_ENTRY.size)[1])
+                for i in range(first, last)]
+
+    def find(self, text):
+        """Return every record of a payload, newest first."""
+        digest = text_digest(text)
+        buffer = self._hash_view.view()
+        entries = len(buffer) // HASH_ENTRY.size
+        data = self._data_view.view()
+        records = []
+        link = HEAD.unpack_from(self._heads, self._bucket(digest) * HEAD.size)[0]
+        while link:
+            if link > entries:  # Head written before the view was remapped
+                buffer = self._hash_view.view()
+                entries = len(buffer) // HASH_ENTRY.size
+            entry_digest, offset, link = HASH_ENTRY.unpack_from(buffer, (link - 1) * HASH_ENTRY.size)
+            if entry_digest == digest:
+                record = self._read(data, offset)
+                if record.text == text:
+                    records.append(record)
+        return records
+
+    def read(self, offset):
+        """Read the record at a data file offset."""
+        return self._read(self._data_view.view(), offset)
+
+    def stats(self):
+        """Return record and commit counters."""
+        return {
+            "records": len(self),
+            "bytes": self._data_end,
+            "queued": self._submitted - self._durable,
+            "commits": self.commits,
+            "errors": self.errors,
+        }
+
+    def _run(self):
+        """Writer loop: collect a group of scans and commit it."""
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.commit_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(0.0, remaining)) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                self._commit(batch)
+                self.commits += 1
+            except OSError as e:
+                self.errors += 1
+                logger.error(f"Journal write failed, {len(batch)} scans not recorded: {e}")
+            with self._committed:
+                self._durable += len(batch)
+                self._committed.notify_all()
+
+    def _commit(self, batch):
+        """Write a group of scans, make it durable, then index it."""
+        chunks = []
+        index = []
+        offset = self._data_end
+        for timestamp, port, raw, text, result in batch:
+            self._seq += 1
+            # Keep the time index sorted if the wall clock steps back
+            timestamp = max(timestamp, self._last_timestamp)
+            self._last_timestamp = timestamp
+            record = self._encode(timestamp, self._seq, port, raw, text, result)
+            chunks.append(record)
+            index.append((timestamp, offset, text_digest(text)))
+            offset += len(record)
+
+        try:
+            os.write(self._data, b"".join(chunks))
+            if self.fsync:
+                os.fsync(self._data)
+        except OSError:
+            # Do not leave part of a group behind the next one
+            os.ftruncate(self._data, self._data_end)
+            raise
+        self._data_end = offset
+        self._index(index)
+
+    def _index(self, entries):
+        """Append time and hash index entries, then link them into their buckets."""
+        first = os.fstat(self._hash_index).st_size // HASH_ENTRY.size
+        time_entries = []
+        hash_entries = []
+        heads = {}
+        for i, (timestamp, offset, digest) in enumerate(entries):
+            bucket = self._bucket(digest) * HEAD.size
+            previous = heads[bucket] if bucket in heads else HEAD.unpack_from(self._heads, bucket)[0]
+            time_entries.append(TIME_ENTRY.pack(timestamp, offset))
+            hash_entries.append(HASH_ENTRY.pack(digest, offset, previous))
+            heads[bucket] = first + i + 1
+
+        # Entries must be in the file before a head can point at them
+        os.write(self._hash_index, b"".join(hash_entries))
+        os.write(self._time_index, b"".join(time_entries))
+        for bucket, link in heads.items():
+            HEAD.pack_into(self._heads, bucket, link)
+        self._records = first + len(entries)
+
+    def _read(self, data, offset):
+        """Decode the record at offset in a data file view."""
+        record, _ = self._decode(data, offset)
+        if record is None:
+            raise JournalError(f"No valid record at offset {offset}")
+        return record
+
+    def _recover(self, clean):
+        """Drop a torn record at the end of the data file and index unindexed records."""
+        size = os.fstat(self._data).st_size
+        data = mmap.mmap(self._data, size, access=mmap.ACCESS_READ)
+        try:
+            indexed_end = self._check_indexes(data, clean)
+            self._index_unindexed(data, indexed_end)
+        finally:
+            data.close()
+
+    def _check_indexes(self, data, clean):
+        """Cut the indexes back to whole entries of records that exist; returns the end of the last one."""
+        time_size = os.fstat(self._time_index).st_size
+        hash_size = os.fstat(self._hash_index).st_size
+        count = min(time_size // TIME_ENTRY.size, hash_size // HASH_ENTRY.size)
+
+        indexed_end = len(DATA_MAGIC)
+        while count:
+            offset = TIME_ENTRY.unpack(os.pread(self._time_index, TIME_ENTRY.size,
+                                                (count - 1) * TIME_ENTRY.size))[1]
+            record, end = self._decode(data, offset)
+            if record is not None:
+                indexed_end = end
+                self._seq = record.seq
+                self._last_timestamp = record.timestamp
+                break
+            count -= 1  # Indexed but lost from the data file, e.g. without fsync
+
+        if time_size != count * TIME_ENTRY.size or hash_size != count * HASH_ENTRY.size:
+            os.ftruncate(self._time_index, count * TIME_ENTRY.size)
+            os.ftruncate(self._hash_index, count * HASH_ENTRY.size)
+            clean = False
+        if not clean:
+            self._rebuild_heads(count)
+        self._records = count
+        return indexed_end
+
+    def _index_unindexed(self, data, offset):
+        """Index the records from offset on, truncating a torn tail."""
+        missing = []
+        while offset < len(data):
+            record, end = self._decode(data, offset)
+            if record is None:
+                logger.warning(f"Journal: discarding {len(data) - offset} bytes of an incomplete record")
+                os.ftruncate(self._data, offset)
+                break
+            missing.append((record.timestamp, offset, text_digest(record.text)))
+            self._seq = record.seq
+            self._last_timestamp = max(self._last_timestamp, record.timestamp)
+            offset = end
+        self._data_end = offset
+        if missing:
+            logger.info(f"Journal: indexing {len(missing)} records written before the last shutdown")
+            self._index(missing)
+
+    def _rebuild_heads(self, count):
+        """Recompute the bucket heads from the first count hash index entries."""
+        self._heads[:] = bytes(len(self._heads))
+        if not count:
+            return
+        logger.info(f"Journal: rebuilding the payload index heads from {count} entries")
+        entries = os.pread(self._hash_index, count * HASH_ENTRY.size, 0)
+        for i, (digest, _, _) in enumerate(HASH_ENTRY.iter_unpack(entries)):
+            HEAD.pack_into(self._heads, self._bucket(digest) * HEAD.size, i + 1)
+
+    def _bucket(self, digest):
+        """Return the hash bucket of a digest."""
+        return int.from_bytes(digest, "little") % self.hash_buckets
+
+    @staticmethod
+    def _encode(timestamp, seq, port, raw, text, result):
+        """Serialize one record."""
+        port = port.encode("utf-8", "surrogateescape")
+        text = text.encode("utf-8", "surrogateescape")
+        body = RECORD.pack(0, timestamp, seq, result, len(port), len(raw), len(text))[4:] + port + raw + text
+        return struct.pack("<I", len(body) + CRC.size) + body + CRC.pack(zlib.crc32(body))
+
+    @staticmethod
+    def _decode(buffer, offset):
+        """Parse the record at offset; returns (record, end) or (None, offset) if it is incomplete."""
+        if offset + RECORD.size > len(buffer):
+            return None, offset
+        length, timestamp, seq, result, port_length, raw_length, text_length = RECORD.unpack_from(buffer, offset)
+        end = offset + 4 + length
+        if end > len(buffer) or length != RECORD.size - 4 + port_length + raw_length + text_length + CRC.size:
+            return None, offset
+        body = bytes(buffer[offset + 4:end - CRC.size])
+        if zlib.crc32(body) != CRC.unpack_from(buffer, end - CRC.size)[0]:
+            return None, offset
+
+        pos = RECORD.size - 4
+        port = body[pos:pos + port_length].decode("utf-8", "surrogateescape")
+        pos += port_length
+        raw = body[pos:pos + raw_length]
+        pos += raw_length
+        text = body[pos:pos + text_length].decode("utf-8", "surrogateescape")
+        result = RESULTS[result] if result < len(RESULTS) else str(result)
+        return JournalRecord(timestamp, seq, port or None, raw, text, result, offset), end
+
+    def _open(self, name, magic=b""):
+        """Open an append-only journal file, writing its magic if it is new."""
+        path = self._path(name)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o600)
+        if magic:
+            head = os.pread(fd, len(magic), 0)
+            if not head:
+                os.write(fd, magic)
+            elif head != magic:
+                os.close(fd)
+                raise JournalError(f"{path} is not a QR2Key scan journal")
+        return fd
+
+    def _open_heads(self, buckets):
+        """Open the bucket head table, creating it with the given number of buckets."""
+        path = self._path(HASH_HEADS_FILE)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = os.fstat(fd).st_size
+        if size:
+            if size % HEAD.size:
+                os.close(fd)
+                raise JournalError(f"{path} is damaged")
+            return fd, size // HEAD.size
+        os.ftruncate(fd, buckets * HEAD.size)
+        return fd, buckets
+
+    def _path(self, name):
+        """Return the path of a journal file."""
+        return os.path.join(self.directory, name)
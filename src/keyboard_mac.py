@@ -2,29 +2,240 @@
 QR2Key - Keyboard input simulation for macOS
 """
 
-from pynput.keyboard import Controller, Key
+import sys
 import time
+from abc import ABC, abstractmethod
+from array import array
 from loguru import logger
 
+from clipboard import ClipboardError
+from logger import log_payload
+
+# pynput loads the display libraries, so it is imported by the first PynputBackend
+Controller = None
+PynputKey = None
+
+class Key:
+    """Names of the special keys QR2Key sends; backends map them to real keys."""
+    enter = "enter"
+    tab = "tab"
+    cmd = "cmd"
+
+def _import_pynput():
+    """Import pynput's keyboard controller; returns False if it is unavailable."""
+    global Controller, PynputKey
+    if Controller is None:
+        try:
+            from pynput.keyboard import Controller, Key as PynputKey
+        except ImportError:  # pynput missing or no display to inject into (e.g. Linux CI)
+            return False
+    return True
+
+class KeyboardBackend(ABC):
+    """Interface for keystroke backends used by KeyboardController.
+    
+    It mirrors pynput's Controller: type() sends text, press() and
+    release() send a single key, which is a character or a Key name.
+    """
+    
+    name = "base"
+    
+    @abstractmethod
+    def type(self, text):
+        """Type a string of text."""
+    
+    @abstractmethod
+    def press(self, key):
+        """Press a key."""
+    
+    @abstractmethod
+    def release(self, key):
+        """Release a key."""
+
+class PynputBackend(KeyboardBackend):
+    """Backend that injects real key events through pynput."""
+    
+    name = "pynput"
+    
+    def __init__(self):
+        """Initialize the pynput controller."""
+        if not _import_pynput():
+            raise RuntimeError("pynput keyboard control is not available on this system")
+        self.controller = Controller()
+        self.keys = {}
+        if PynputKey is not None:
+            self.keys = {name: getattr(PynputKey, name) for name in vars(Key) if not name.startswith("_")}
+    
+    def type(self, text):
+        """Type a string of text."""
+        self.controller.type(text)
+    
+    def press(self, key):
+        """Press a key."""
+        self.controller.press(self.keys.get(key, key))
+    
+    def release(self, key):
+        """Release a key."""
+        self.controller.release(self.keys.get(key, key))
+
+class NullBackend(KeyboardBackend):
+    """Backend that discards all output, counting what it was sent."""
+    
+    name = "null"
+    
+    def __init__(self):
+        """Initialize the counters."""
+        self.chars = 0
+        self.keys = 0
+    
+    def type(self, text):
+        """Discard a string of text."""
+        self.chars += len(text)
+    
+    def press(self, key):
+        """Discard a key press."""
+        self.keys += 1
+    
+    def release(self, key):
+        """Discard a key release."""
+
+class StdoutBackend(KeyboardBackend):
+    """Backend that prints what would be typed, for headless use.
+    
+    Enter and Tab are written as newline and tab characters; other
+    special keys are ignored. Output is flushed at every Enter.
+    """
+    
+    name = "stdout"
+    KEY_TEXT = {Key.enter: "\n", Key.tab: "\t"}
+    
+    def __init__(self, stream=None):
+        """Initialize with the stream to write to (standard output by default)."""
+        self.stream = stream if stream is not None else sys.stdout
+    
+    def type(self, text):
+        """Write a string of text."""
+        self.stream.write(text)
+    
+    def press(self, key):
+        """Write a character key, Enter or Tab."""
+        text = key if isinstance(key, str) and len(key) == 1 else self.KEY_TEXT.get(key, "")
+        if text:
+            self.stream.write(text)
+        if key == Key.enter:
+            self.stream.flush()
+    
+    def release(self, key):
+        """Ignore key releases."""
+
+class RecordingBackend(KeyboardBackend):
+    """Backend that timestamps every key event into preallocated arrays.
+    
+    Each typed character is one TYPE event holding its code point; press()
+    and release() record PRESS/RELEASE events holding the code point of a
+    character key or the index of a special key in special_keys. Events
+    beyond capacity are counted in dropped but not stored.
+    """
+    
+    name = "recording"
+    TYPE, PRESS, RELEASE = 0, 1, 2
+    
+    def __init__(self, capacity=100000, clock=time.perf_counter):
+        """Allocate room for capacity events."""
+        self.capacity = capacity
+        self.clock = clock
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.kinds = array('b', bytes(capacity))
+        self.codes = array('q', bytes(8 * capacity))
+        self.special_keys = []
+        self.count = 0
+        self.dropped = 0
+    
+    def type(self, text):
+        """Record one TYPE event per character."""
+        now = self.clock()
+        for char in text:
+            self._record(now, self.TYPE, ord(char))
+    
+    def press(self, key):
+        """Record a PRESS event."""
+        self._record(self.clock(), self.PRESS, self._key_code(key))
+    
+    def release(self, key):
+        """Record a RELEASE event."""
+        self._record(self.clock(), self.RELEASE, self._key_code(key))
+    
+    def clear(self):
+        """Forget all recorded events, keeping the arrays."""
+        self.count = 0
+        self.dropped = 0
+    
+    def events(self):
+        """Yield (timestamp, kind, value) for each recorded event."""
+        for i in range(self.count):
+            code = self.codes[i]
+            value = chr(code) if code >= 0 else self.special_keys[-code - 1]
+            yield self.timestamps[i], self.kinds[i], value
+    
+    def text(self):
+        """Return the characters recorded by TYPE events."""
+        return "".join(chr(self.codes[i]) for i in range(self.count) if self.kinds[i] == self.TYPE)
+    
+    def _key_code(self, key):
+        """Encode a key as a code point or a negative special key index."""
+        if isinstance(key, str) and len(key) == 1:
+            return ord(key)
+        if key not in self.special_keys:
+            self.special_keys.append(key)
+        return -(self.special_keys.index(key) + 1)
+    
+    def _record(self, timestamp, kind, code):
+        """Store one event if there is room."""
+        index = self.count
+        if index >= self.capacity:
+            self.dropped += 1
+            return
+        self.timestamps[index] = timestamp
+        self.kinds[index] = kind
+        self.codes[index] = code
+        self.count = index + 1
+
+KEYBOARD_BACKENDS = {
+    "pynput": PynputBackend,
+    "null": NullBackend,
+    "stdout": StdoutBackend,
+    "recording": RecordingBackend,
+}
+
+def create_backend(name="pynput"):
+    """Create a keystroke backend by name."""
+    try:
+        return KEYBOARD_BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown keyboard backend: {name}") from None
+
 class KeyboardController:
     """Class to handle keyboard input simulation on macOS."""
     
-    def __init__(self):
+    def __init__(self, burst_size=1, max_burst=1, backend=None):
         """Initialize the keyboard controller."""
-        self.keyboard = Controller()
-        logger.debug("Keyboard controller initialized")
+        self.keyboard = backend if backend is not None else PynputBackend()
+        self.burst_size = max(1, burst_size)
+        self.max_burst = max(self.burst_size, max_burst)
+        self.last_typing_stats = None
+        logger.debug(f"Keyboard controller initialized with {self.keyboard.name} backend")
         
     def type_string(self, text):
         """Type a string of text."""
         if not text:
             return
             
-        logger.debug(f"Typing string: {text}")
+        logger.opt(lazy=True).debug("Typing string: {}", lambda: log_payload(text))
         self.keyboard.type(text)
         
     def press_key(self, key):
         """Press a specific key."""
-        logger.debug(f"Pressing key: {key}")
+        logger.debug("Pressing key: {}", key)
         self.keyboard.press(key)
         self.keyboard.release(key)
         
@@ -40,12 +251,114 @@ class KeyboardController:
         self.keyboard.press(Key.tab)
         self.keyboard.release(Key.tab)
         
+    def paste_text(self, text, clipboard, restore_delay=0.2):
+        """Paste text through the clipboard with Cmd+V, then restore the clipboard.
+        
+        restore_delay gives the target app time to read the pasted text
+        before the previous clipboard contents are put back. Clipboard
+        errors before Cmd+V is sent propagate so the caller can type the
+        text instead; a failed restore is only logged, since the text has
+        already been pasted.
+        """
+        if not text:
+            return
+        
+        logger.debug("Pasting {} characters", len(text))
+        previous = clipboard.get_text()
+        clipboard.set_text(text)
+        try:
+            self.keyboard.press(Key.cmd)
+            self.keyboard.press('v')
+            self.keyboard.release('v')
+            self.keyboard.release(Key.cmd)
+            time.sleep(restore_delay)
+        finally:
+            if previous is not None:
+                try:
+                    clipboard.set_text(previous)
+                except ClipboardError as e:
+                    logger.warning(f"Could not restore the clipboard after pasting: {e}")
+    
     def type_with_delay(self, text, delay=0.05):
         """Type text with a delay between each character."""
         if not text:
             return
             
-        logger.debug(f"Typing with delay ({delay}s): {text}")
+        logger.opt(lazy=True).debug("Typing with delay ({}s): {}", lambda: delay, lambda: log_payload(text))
         for char in text:
             self.keyboard.type(char)
             time.sleep(delay)
+    
+    def type_paced(self, text, rate=20.0):
+        """Type text at a target characters-per-second rate.
+        
+        Characters are sent in bursts of burst_size on a monotonic deadline
+        schedule, so time spent injecting counts towards the interval and
+        no sleep follows the last burst. When max_burst is larger than
+        burst_size, the burst size adapts between runs: it halves when an
+        injection overruns its time slot and grows while injection stays
+        well ahead of the schedule.
+        """
+        if not text:
+            return None
+        
+        logger.debug("Typing {} characters at {} chars/s in bursts of {}", len(text), rate, self.burst_size)
+        
+        burst = self.burst_size
+        start = time.monotonic()
+        deadline = start
+        lateness = []
+        bursts = 0
+        position = 0
+        
+        while position < len(text):
+            chunk = text[position:position + burst]
+            injected_at = time.monotonic()
+            self.keyboard.type(chunk)
+            injected = time.monotonic() - injected_at
+            position += len(chunk)
+            bursts += 1
+            
+            slot = len(chunk) / rate
+            burst = self._adapt_burst(burst, injected, slot)
+            if position >= len(text):
+                break
+            
+            deadline += slot
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif -delay > slot:
+                deadline = time.monotonic()  # Too far behind to catch up; restart the schedule
+            lateness.append(max(0.0, time.monotonic() - deadline))
+        
+        elapsed = time.monotonic() - start
+        self.burst_size = burst
+        self.last_typing_stats = {
+            "chars": len(text),
+            "bursts": bursts,
+            "elapsed": elapsed,
+            "target_rate": rate,
+            "rate": len(text) / elapsed if elapsed > 0 else float("inf"),
+            "jitter": self._jitter(lateness),
+            "burst_size": burst,
+        }
+        return self.last_typing_stats
+    
+    def _adapt_burst(self, burst, injected, slot):
+        """Return the burst size to use after an injection that took injected seconds."""
+        if self.max_burst <= 1:
+            return burst
+        if injected > slot:
+            return max(1, burst // 2)
+        if injected < slot / 4:
+            return min(self.max_burst, burst + 1)
+        return burst
+    
+    @staticmethod
+    def _jitter(lateness):
+        """Standard deviation of burst lateness in seconds."""
+        if len(lateness) < 2:
+            return 0.0
+        mean = sum(lateness) / len(lateness)
+        return (sum((late - mean) ** 2 for late in lateness) / len(lateness)) ** 0.5
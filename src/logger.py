@@ -2,33 +2,140 @@
 QR2Key - Logging configuration
 """
 
+import hashlib
 import os
 import sys
+import threading
+import time
 from loguru import logger
 
-def setup_logger(log_level="INFO", log_dir="logs"):
-    """Configure the logger with rotation and level."""
+PAYLOAD_MODES = ("full", "truncate", "hash", "none")
+
+# Messages per second allowed for each kind of repeated scan-path message
+DEFAULT_RATE_LIMITS = {
+    "scan": 20,
+    "queue_full": 1,
+    "read_error": 1,
+    "sink_error": 1,
+    "gs1_invalid": 1,
+}
+
+class RateLimiter:
+    """Token bucket per message kind, deciding which log lines are written.
+
+    Each kind may log rate messages per second on average with bursts of
+    up to rate messages; the rest are counted in suppressed. Kinds without
+    a limit are always allowed.
+    """
+
+    def __init__(self, limits=None, clock=time.monotonic):
+        """Initialize the buckets from {kind: messages per second}."""
+        self.limits = dict(limits or {})
+        self.clock = clock
+        self.suppressed = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, kind):
+        """Take a token for kind; returns False if the message should be dropped."""
+        rate = self.limits.get(kind)
+        if rate is None:
+            return True
+        if rate <= 0:
+            self.suppressed[kind] = self.suppressed.get(kind, 0) + 1
+            return False
+
+        now = self.clock()
+        with self._lock:
+            tokens, last = self._buckets.get(kind, (rate, now))
+            tokens = min(rate, tokens + (now - last) * rate)
+            if tokens >= 1:
+                self._buckets[kind] = (tokens - 1, now)
+                return True
+            self._buckets[kind] = (tokens, now)
+            self.suppressed[kind] = self.suppressed.get(kind, 0) + 1
+            return False
+
+    def take_suppressed(self, kind):
+        """Return and reset the number of suppressed messages of a kind."""
+        with self._lock:
+            return self.suppressed.pop(kind, 0)
+
+class PayloadFormatter:
+    """Shorten or hide scan payloads before they are logged."""
+
+    def __init__(self, mode="full", max_chars=32):
+        """Initialize with one of PAYLOAD_MODES."""
+        if mode not in PAYLOAD_MODES:
+            raise ValueError(f"Unknown payload log mode: {mode}")
+        self.mode = mode
+        self.max_chars = max_chars
+
+    def __call__(self, text):
+        """Return the loggable form of a payload."""
+        if self.mode == "full":
+            return text
+        if self.mode == "none":
+            return f"<{len(text)} chars>"
+        if self.mode == "hash":
+            digest = hashlib.blake2b(text.encode("utf-8", "surrogateescape"), digest_size=6).hexdigest()
+            return f"<{len(text)} chars #{digest}>"
+        if len(text) <= self.max_chars:
+            return text
+        return f"{text[:self.max_chars]}... <{len(text)} chars>"
+
+_limiter = RateLimiter(DEFAULT_RATE_LIMITS)
+_payload = PayloadFormatter()
+
+def log_allowed(kind):
+    """Whether a scan-path message of this kind may be logged now."""
+    return _limiter.allow(kind)
+
+def log_payload(text):
+    """Format a scan payload for the log according to the payload mode."""
+    return _payload(text)
+
+def log_suppressed(kind):
+    """Return and reset the number of messages of this kind dropped since the last call."""
+    return _limiter.take_suppressed(kind)
+
+def setup_logger(log_level="INFO", log_dir="logs", enqueue=True, payload="full",
+                 payload_chars=32, rate_limits=None):
+    """Configure the logger with rotation and level.
+
+    With enqueue, log records are handed to a background thread that
+    formats and writes them, so logging never blocks the scan path on
+    the terminal or on disk. rate_limits sets messages per second for
+    each kind of repeated message (see DEFAULT_RATE_LIMITS).
+    """
+    global _limiter, _payload
+
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-        
+
     logger.remove()
-    
+
     logger.add(
         sys.stderr,
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-        level=log_level
+        level=log_level,
+        enqueue=enqueue
     )
-    
+
     logger.add(
         os.path.join(log_dir, "qr2key_{time:YYYY-MM-DD}.log"),
         rotation="1 day",    # Rotate daily
         retention="7 days",  # Keep logs for 7 days
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
         level=log_level,
-        compression="zip"    # Compress rotated logs
+        compression="zip",   # Compress rotated logs
+        enqueue=enqueue
     )
-    
+
+    _limiter = RateLimiter({**DEFAULT_RATE_LIMITS, **(rate_limits or {})})
+    _payload = PayloadFormatter(payload, payload_chars)
+
     logger.info(f"Logger initialized with level {log_level}")
     logger.info(f"Log files will be stored in {os.path.abspath(log_dir)}")
-    
+
     return logger
@@ -5,21 +5,31 @@ Milestone M3: macOS GUI + App Packaging
 
 import sys
 import os
-import serial
-import serial.tools.list_ports
-import time
+import argparse
+import signal
 import threading
+from importlib.util import find_spec
 from loguru import logger
 
-try:
-    from PyQt5.QtWidgets import QApplication
-    GUI_AVAILABLE = True
-except ImportError:
-    GUI_AVAILABLE = False
+# PyQt5, the GUI and auto_start are only imported once scanning has started
+GUI_AVAILABLE = find_spec("PyQt5") is not None
 
 from config import Config
-from logger import setup_logger
-from keyboard_mac import KeyboardController
+from logger import log_allowed, log_payload, log_suppressed, setup_logger
+from keyboard_mac import KeyboardController, create_backend
+from clipboard import ClipboardError, create_clipboard
+from decoder import decode_payload
+from gs1 import parse_code
+from pipeline import Scan, ScanPipeline
+from dedup import DedupCache
+from journal import JournalError, ScanJournal
+from metrics import MetricsRegistry, MetricsServer
+from performance import SAMPLE_INTERVAL, PerformanceHistory
+from sinks import SinkFanout
+from control_socket import ControlServer
+from core import EventLoopCore
+from connection_manager import AsyncConnectionManager
+from reconnect import CONNECTED, ReconnectPolicy
 
 try:
     from port_detector import PortDetector
@@ -27,22 +37,45 @@ try:
 except ImportError:
     PORT_DETECTOR_AVAILABLE = False
 
-try:
-    from gui import QR2KeyGUI
-    from auto_start import toggle_auto_start, is_auto_start_enabled
-    AUTO_START_AVAILABLE = True
-except ImportError:
-    AUTO_START_AVAILABLE = False
+# Seconds between config.json checks and between duplicate cache expiries
+CONFIG_CHECK_INTERVAL = 1.0
+DEDUP_EXPIRE_INTERVAL = 1.0
+# Port recorded for payloads submitted over the control socket
+CONTROL_PORT = "control"
+# Settings a reload applies without a restart; serial ones on the next connection
+RELOADABLE_SETTINGS = frozenset({
+    "keyboard.type_delay", "keyboard.type_rate", "keyboard.burst_size", "keyboard.max_burst",
+    "keyboard.press_enter_after", "keyboard.paste_threshold", "keyboard.paste_restore_delay",
+    "gs1.mode", "gs1.bare_gtins", "transforms.rules", "output.keyboard", "dedup.ttl", "dedup.max_entries", "dedup.scope",
+    "serial.baud_rate", "serial.timeout",
+})
 
 config = None
+core = None
 keyboard = None
-serial_connection = None
+clipboard = None
+sinks = None
+scan_pipeline = None
+dedup = None
+journal = None
+metrics = None
+metrics_server = None
+# Counters updated on every scan, looked up once by register_scan_metrics()
+chars_injected = None
+scans_pasted = None
+gs1_invalid = None
+control_server = None
+connection_manager = None
+port_detector = None
+gui_window = None
 is_running = True
 is_paused = False
 app_version = "1.0.0"
 
 def detect_serial_ports():
     """Detect available serial ports."""
+    import serial.tools.list_ports
+    
     ports = list(serial.tools.list_ports.comports())
     if not ports:
         logger.error("No serial ports found.")
@@ -55,90 +88,180 @@ def detect_serial_ports():
     return [port.device for port in ports]
 
 def connect_to_serial(port, baud_rate=9600, timeout=1):
-    """Connect to a serial port."""
-    global serial_connection
-    
-    try:
-        ser = serial.Serial(port, baud_rate, timeout=timeout)
-        logger.info(f"Connected to {port} at {baud_rate} baud")
-        serial_connection = ser
-        return ser
-    except serial.SerialException as e:
-        logger.error(f"Error connecting to {port}: {e}")
-        return None
+    """Connect to a serial port and start reading it alongside any others."""
+    conn = connection_manager.connect(port, baud_rate, timeout)
+    if conn:
+        update_port_status()
+    return conn
 
 def decode_shift_jis(data):
-    """Decode Shift_JIS encoded data."""
-    if data.startswith(b'\xe3'):
-        try:
-            return data.decode('utf-8')
-        except UnicodeDecodeError:
-            pass
+    """Decode Shift_JIS encoded data, falling back to UTF-8 and then hex."""
+    return decode_payload(data)
+
+def inject_text(data, settings=None):
+    """Paste or type a scan, choosing the injection mode by payload size."""
+    if settings is None:
+        settings = config.snapshot
+    if chars_injected is not None:
+        chars_injected.inc(len(data))
     
-    try:
-        return data.decode('shift_jis')
-    except UnicodeDecodeError:
+    threshold = settings.paste_threshold
+    if clipboard and threshold and len(data) >= threshold:
         try:
-            return data.decode('utf-8')
-        except UnicodeDecodeError:
-            return ' '.join([f'{b:02x}' for b in data])
-
-def read_serial_data(ser):
-    """Read data from serial port and decode it."""
-    if ser.in_waiting:
-        data = ser.read(ser.in_waiting)
-        if data:
-            decoded = decode_shift_jis(data)
-            logger.info(f"Received: {decoded}")
-            return decoded
-    return None
-
-def process_qr_data(data):
-    """Process QR code data and simulate keyboard input."""
-    if not data or is_paused:
-        return
+            keyboard.paste_text(data, clipboard, settings.paste_restore_delay)
+            if scans_pasted is not None:
+                scans_pasted.inc()
+            return "paste"
+        except ClipboardError as e:
+            logger.warning(f"Paste failed ({e}), typing {len(data)} characters instead")
     
-    if keyboard:
-        if config.get("keyboard", "type_delay", 0) > 0:
-            keyboard.type_with_delay(data, config.get("keyboard", "type_delay", 0.05))
-        else:
-            keyboard.type_string(data)
-        
-        if config.get("keyboard", "press_enter_after", False):
+    rate = settings.type_rate
+    if rate > 0:
+        stats = keyboard.type_paced(data, rate)
+        logger.opt(lazy=True).debug("Typed {} chars at {:.1f}/s (jitter {:.1f} ms, burst {})",
+                                    lambda: stats['chars'], lambda: stats['rate'],
+                                    lambda: stats['jitter'] * 1000, lambda: stats['burst_size'])
+    else:
+        keyboard.type_string(data)
+    return "type"
+
+def process_qr_data(data, port=None):
+    """Process QR code data: type it and hand it to the output sinks; returns the journal result."""
+    if not data:
+        return None
+    if is_paused:
+        return "paused"
+    
+    settings = config.snapshot
+    code = None
+    if settings.gs1_mode != "off":
+        code = parse_code(data, settings.gs1_bare_gtins)
+        if code is not None and code.errors:
+            if gs1_invalid is not None:
+                gs1_invalid.inc()
+            if log_allowed("gs1_invalid"):
+                skipped = log_suppressed("gs1_invalid")
+                logger.warning("Invalid {} scan {}: {}{}", code.kind, log_payload(data), "; ".join(code.errors),
+                               f" ({skipped} more not logged)" if skipped else "")
+            if settings.gs1_mode == "reject":
+                return "rejected"
+    
+    if not settings.keyboard_output:
+        result = "sent"
+    elif keyboard:
+        pasted = False
+        for text, key in settings.transforms.apply(data, code):
+            if text and inject_text(text, settings) == "paste":
+                pasted = True
+            if key is not None:
+                keyboard.press_key(key)
+
+        if settings.press_enter_after:
             keyboard.press_enter()
+        result = "pasted" if pasted else "typed"
     else:
         logger.warning("Keyboard controller not initialized, cannot type data")
+        return "error"
+    
+    if sinks is not None:
+        sinks.publish(data, port, result)
+    return result
+
+def record_scan(scan, result):
+    """Append a scan and its result to the journal and the GUI's scan feed."""
+    if journal is not None:
+        journal.append(scan.text, scan.port, scan.raw, result)
+    if gui_window is not None:
+        gui_window.post_scan(scan.port, scan.text, result)
+
+def submit_scan(scan):
+    """Queue a scan read from a port unless it repeats a recent one."""
+    if dedup is not None and dedup.is_duplicate(scan):
+        record_scan(scan, "duplicate")
+        return False
+    if not scan_pipeline.submit(scan):
+        record_scan(scan, "dropped")
+        return False
+    return True
+
+def submit_payload(text):
+    """Queue a payload from the control socket for typing; it is not checked for duplicates."""
+    scan = Scan(text, port=CONTROL_PORT, raw=text.encode("utf-8"))
+    if not scan_pipeline.submit(scan):
+        record_scan(scan, "dropped")
+        return False
+    return True
+
+def pipeline_has_room():
+    """Whether the scan queue can take another scan without dropping it."""
+    return scan_pipeline.maxsize <= 0 or scan_pipeline.depth < scan_pipeline.maxsize
+
+def handle_scan(scan):
+    """Inject a scan taken off the pipeline queue."""
+    try:
+        result = process_qr_data(scan.text, scan.port)
+    except Exception:
+        record_scan(scan, "error")
+        raise
+    if result is not None:
+        record_scan(scan, result)
+
+def on_core(function, *args):
+    """Run function(*args) on the event loop, or right away if the loop is not running."""
+    if core is not None and core.running:
+        core.call(function, *args)
+    else:
+        function(*args)
+
+def update_port_status():
+    """Show the managed ports and their connection states in the GUI, from any thread."""
+    if gui_window:
+        states = connection_manager.port_states() if connection_manager is not None else {}
+        ports = [port if state == CONNECTED else f"{port} ({state})" for port, state in states.items()]
+        gui_window.post_port_status(", ".join(ports) if ports else "Not connected")
 
-def serial_reader_thread():
-    """Thread function to read from serial port."""
-    global serial_connection
-    
-    while is_running:
-        if serial_connection and serial_connection.is_open and not is_paused:
-            try:
-                data = read_serial_data(serial_connection)
-                if data:
-                    process_qr_data(data)
-            except Exception as e:
-                logger.error(f"Error reading serial data: {e}")
-        
-        time.sleep(0.1)  # Small delay to prevent CPU hogging
+def check_config():
+    """Reload config.json if it changed on disk."""
+    if config.check_reload():
+        config_reloaded(config.snapshot)
+
+def config_reloaded(settings):
+    """Apply a reloaded configuration to the running components."""
+    keyboard.burst_size = settings.burst_size
+    keyboard.max_burst = max(settings.burst_size, settings.max_burst)
+    if dedup is not None:
+        try:
+            dedup.reconfigure(settings.dedup_ttl, config.get("dedup", "max_entries", 1024),
+                              config.get("dedup", "scope", "port"))
+        except ValueError as e:
+            logger.error(f"Keeping the current duplicate settings: {e}")
+    restart = [key for key in config.changed if key not in RELOADABLE_SETTINGS]
+    if restart:
+        logger.warning(f"Configuration reloaded (version {settings.version}); "
+                       f"restart to apply {', '.join(restart)}")
+    else:
+        logger.info(f"Configuration reloaded (version {settings.version})")
+
+def port_state_changed(port, old, new):
+    """Called by the connection manager on every port state transition."""
+    logger.info(f"Port {port}: {old} -> {new}")
+    update_port_status()
 
 def port_monitor_callback(port):
     """Callback function for port monitor."""
-    global serial_connection
-    
-    if serial_connection and serial_connection.is_open:
-        logger.info(f"Already connected to {serial_connection.port}, ignoring new port {port}")
-        return
+    if connection_manager.is_connected(port):
+        logger.info(f"Port {port} is back, retrying connection")
+    else:
+        logger.info(f"New port detected: {port}, attempting to connect")
     
-    logger.info(f"New port detected: {port}, attempting to connect")
     baud_rate = config.get("serial", "baud_rate", 9600)
     timeout = config.get("serial", "timeout", 1)
     connect_to_serial(port, baud_rate, timeout)
-    
-    if 'gui_window' in globals() and gui_window:
-        gui_window.update_port_status(port)
+
+def port_removed_callback(port):
+    """Callback function for ports that disappear."""
+    if connection_manager.is_connected(port):
+        logger.info(f"Port {port} was removed, will reconnect when it returns")
 
 def port_monitor_thread():
     """Thread function to monitor for new serial ports."""
@@ -146,102 +269,310 @@ def port_monitor_thread():
         logger.info("Port monitoring disabled in config")
         return
     
-    detector = PortDetector()
-    detector.monitor_ports(port_monitor_callback)
+    port_detector.monitor_ports(port_monitor_callback, on_removed=port_removed_callback)
 
-def handle_toggle_pause(paused):
-    """Handle pause/resume signal from GUI."""
+def set_paused(paused):
+    """Pause or resume typing scans."""
     global is_paused
     is_paused = paused
     logger.info(f"QR2Key {'paused' if is_paused else 'resumed'}")
 
+def control_pause(argument):
+    """PAUSE command of the control socket."""
+    set_paused(True)
+    if gui_window is not None:
+        gui_window.paused_changed.emit(True)
+    return "OK"
+
+def control_resume(argument):
+    """RESUME command of the control socket."""
+    set_paused(False)
+    if gui_window is not None:
+        gui_window.paused_changed.emit(False)
+    return "OK"
+
+def control_status(argument):
+    """STATUS command of the control socket."""
+    return {
+        "version": app_version,
+        "paused": is_paused,
+        "ports": connection_manager.port_states(),
+        "queue": scan_pipeline.stats(),
+    }
+
+def control_metrics(argument):
+    """METRICS command of the control socket: the Prometheus text format."""
+    return metrics.render_prometheus()
+
+def handle_toggle_pause(paused):
+    """Handle pause/resume signal from GUI."""
+    on_core(set_paused, paused)
+
 def handle_exit():
-    """Handle exit signal from GUI."""
+    """Handle exit signal from GUI, SIGTERM or Ctrl-C: stop reading, type what is queued and exit."""
     global is_running
     is_running = False
     
-    if serial_connection and serial_connection.is_open:
-        serial_connection.close()
-        logger.info(f"Disconnected from {serial_connection.port}")
+    if port_detector:
+        port_detector.stop()
+    if metrics_server:
+        metrics_server.stop()
+    if control_server is not None:
+        control_server.stop()
+    if connection_manager is not None:
+        connection_manager.stop()
+    if core is not None:
+        core.stop()
+    if scan_pipeline is not None:
+        scan_pipeline.stop(2)
+    if sinks is not None:
+        sinks.close()
+    if journal is not None:
+        journal.close()
     
     logger.info("QR2Key exiting")
     sys.exit(0)
 
-def main():
-    """Main function to run the QR2Key application."""
-    global config, keyboard, serial_connection, gui_window
-    
-    setup_logger(log_level="INFO", log_dir="logs")
-    logger.info(f"QR2Key v{app_version} - Starting application")
-    
-    config = Config("config.json")
-    
-    keyboard = KeyboardController()
-    
-    if 'unittest' in sys.modules or not GUI_AVAILABLE:
-        logger.info("Running in test mode or GUI not available")
-        
-        ports = detect_serial_ports()
-        if ports:
-            port = ports[0]
-            logger.info(f"Using first available port: {port}")
-            baud_rate = config.get("serial", "baud_rate", 9600)
-            timeout = config.get("serial", "timeout", 1)
-            connect_to_serial(port, baud_rate, timeout)
-        
-        if 'unittest' in sys.modules:
-            return
-        
-        try:
-            while True:
-                if serial_connection and serial_connection.is_open:
-                    data = read_serial_data(serial_connection)
-                    if data:
-                        process_qr_data(data)
-                time.sleep(0.1)
-        except KeyboardInterrupt:
-            logger.info("Received interrupt signal. Exiting...")
-        return
-    
-    app = QApplication(sys.argv)
-    gui_window = QR2KeyGUI(config, app_version)
-    gui_window.toggle_signal.connect(handle_toggle_pause)
-    gui_window.exit_signal.connect(handle_exit)
+def reload_config():
+    """Re-read the configuration file and apply it."""
+    logger.info(f"Reloading {config.config_path}")
+    if config.load_config():
+        config_reloaded(config.snapshot)
+
+def handle_signal(signum, frame):
+    """SIGHUP reloads the configuration; SIGTERM shuts down cleanly."""
+    if signum == getattr(signal, "SIGHUP", None):
+        on_core(reload_config)
+    else:
+        logger.info(f"Received {signal.Signals(signum).name}")
+        handle_exit()
+
+def install_signal_handlers():
+    """Reload on SIGHUP and shut down on SIGTERM when there is no GUI to do it."""
+    signal.signal(signal.SIGTERM, handle_signal)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, handle_signal)
+
+def connect_initial_port():
+    """Connect to the auto-detected or configured port."""
+    baud_rate = config.get("serial", "baud_rate", 9600)
+    timeout = config.get("serial", "timeout", 1)
     
     if PORT_DETECTOR_AVAILABLE and config.get("serial", "auto_detect", True):
         logger.info("Auto-detecting serial port")
-        detector = PortDetector()
-        port = detector.auto_detect_port()
+        port = port_detector.auto_detect_port()
         if port:
             logger.info(f"Auto-detected port: {port}")
-            baud_rate = config.get("serial", "baud_rate", 9600)
-            timeout = config.get("serial", "timeout", 1)
             connect_to_serial(port, baud_rate, timeout)
-            gui_window.update_port_status(port)
         else:
             logger.warning("No ports detected automatically")
-            gui_window.update_port_status("Not connected")
     else:
         port = config.get("serial", "port", None)
         if port:
             logger.info(f"Using configured port: {port}")
-            baud_rate = config.get("serial", "baud_rate", 9600)
-            timeout = config.get("serial", "timeout", 1)
             connect_to_serial(port, baud_rate, timeout)
-            gui_window.update_port_status(port)
         else:
             logger.warning("No port configured")
-            gui_window.update_port_status("Not connected")
+    if not connection_manager.ports:
+        detect_serial_ports()
+
+def start_reading():
+    """Set up everything between the serial port and the scan queue and open the port.
+    
+    Ports are read on the event loop thread, which also runs the framing
+    and reconnect timers. Scans read from here on wait in the queue until
+    start_services() has created the keyboard and started the pipeline.
+    """
+    global core, scan_pipeline, dedup, metrics, connection_manager, port_detector
+    
+    core = EventLoopCore()
+    metrics = MetricsRegistry()
+    scan_pipeline = ScanPipeline(handle_scan, config.get("keyboard", "queue_size", 256), metrics=metrics)
+    dedup = DedupCache(
+        ttl=config.get("dedup", "ttl", 1.0),
+        max_entries=config.get("dedup", "max_entries", 1024),
+        scope=config.get("dedup", "scope", "port")
+    )
+    metrics.gauge("duplicates_suppressed", "Repeated scans that were not typed", lambda: dedup.suppressed)
+    connection_manager = AsyncConnectionManager(
+        submit_scan,
+        core=core,
+        framing=config.get("serial", "framing", {}),
+        max_connections=config.get("serial", "max_connections", 16),
+        on_state_change=port_state_changed,
+        policy=ReconnectPolicy.from_config(config.get("serial", "reconnect", {})),
+        metrics=metrics,
+        trace_dir=config.get("serial", "trace_dir", "")
+    )
+    if PORT_DETECTOR_AVAILABLE:
+        port_detector = PortDetector()
+    
+    connect_initial_port()
+
+def register_scan_metrics():
+    """Create the counters process_qr_data() updates, so scans don't look them up in the registry."""
+    global chars_injected, scans_pasted, gs1_invalid
+    chars_injected = metrics.counter("chars_injected_total", "Characters typed or pasted")
+    scans_pasted = metrics.counter("scans_pasted_total", "Scans injected through the clipboard")
+    gs1_invalid = metrics.counter("gs1_invalid_total", "GS1 and GTIN scans that failed validation")
+
+def start_services():
+    """Create the keyboard and the other services, then start typing queued scans."""
+    global keyboard, clipboard, sinks, journal, metrics_server, control_server
+    
+    register_scan_metrics()
+    keyboard = KeyboardController(
+        burst_size=config.get("keyboard", "burst_size", 1),
+        max_burst=config.get("keyboard", "max_burst", 1),
+        backend=create_backend(config.get("keyboard", "backend", "pynput"))
+    )
+    clipboard = create_clipboard(config.get("keyboard", "clipboard", "pasteboard"))
+    if config.get("output", "sinks", []):
+        sinks = SinkFanout.from_config(config.get("output", "sinks", []), metrics)
+    if config.get("journal", "enabled", True):
+        try:
+            journal = ScanJournal(
+                directory=config.get("journal", "directory", "journal"),
+                hash_buckets=config.get("journal", "hash_buckets", 1 << 20),
+                commit_interval=config.get("journal", "commit_interval", 0.05)
+            )
+            metrics.gauge("journal_records", "Scans in the scan journal", lambda: len(journal))
+        except (OSError, JournalError) as e:
+            logger.error(f"Could not open the scan journal: {e}")
+            journal = None
+    scan_pipeline.start()
+    
+    metrics_port = config.get("metrics", "http_port", 0)
+    if metrics_port:
+        metrics_server = MetricsServer(metrics, metrics_port)
+        try:
+            metrics_server.start()
+        except OSError as e:
+            logger.error(f"Could not start metrics server on port {metrics_port}: {e}")
+            metrics_server = None
+    
+    control_path = config.get("control", "socket", "")
+    if control_path:
+        control_server = ControlServer(
+            os.path.expanduser(control_path), core, submit_payload, pipeline_has_room,
+            {"PAUSE": control_pause, "RESUME": control_resume, "STATUS": control_status, "METRICS": control_metrics}
+        )
+        try:
+            control_server.start()
+        except OSError as e:
+            logger.error(f"Could not open control socket {control_path}: {e}")
+            control_server = None
+    core.every(DEDUP_EXPIRE_INTERVAL, dedup.expire)
+    if config.get("app", "watch_config", True):
+        core.every(CONFIG_CHECK_INTERVAL, check_config)
+
+def parse_args(argv=None):
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(prog="qr2key", description="Type QR codes read from a serial scanner")
+    parser.add_argument("--headless", action="store_true",
+                        help="run without the GUI, e.g. as a service (implied when PyQt5 is missing)")
+    parser.add_argument("--config", default="config.json", metavar="PATH", help="configuration file")
+    parser.add_argument("--port", help="read only this port, without auto-detection or hotplug")
+    parser.add_argument("--baud", type=int, metavar="RATE", help="baud rate")
+    parser.add_argument("--framing", choices=("terminator", "length", "idle"), help="how scans are delimited")
+    parser.add_argument("--terminator", metavar="SUFFIX", help="scan suffix in terminator framing")
+    parser.add_argument("--output", choices=("keyboard", "stdout", "null"), default="keyboard",
+                        help="type scans (default), print one per line, or discard them")
+    parser.add_argument("--log-level", choices=("DEBUG", "INFO", "WARNING", "ERROR"), help="log level")
+    return parser.parse_args(argv)
+
+def apply_args(args):
+    """Apply command line options on top of the configuration file."""
+    if args.port:
+        config.override("serial", "port", args.port)
+        config.override("serial", "auto_detect", False)
+        config.override("serial", "monitor_ports", False)
+    if args.baud:
+        config.override("serial", "baud_rate", args.baud)
+    framing = {}
+    if args.framing:
+        framing["mode"] = args.framing
+    if args.terminator:
+        framing["terminator"] = args.terminator
+    if framing:
+        config.override("serial", "framing", framing)
+    if args.output != "keyboard":
+        # No key events to pace and no clipboard to paste through
+        config.override("keyboard", "backend", args.output)
+        config.override("keyboard", "type_delay", 0)
+        config.override("keyboard", "type_rate", 0)
+        config.override("keyboard", "paste_threshold", 0)
+    if args.output == "stdout":
+        config.override("keyboard", "press_enter_after", True)
+    if args.log_level:
+        config.override("app", "log_level", args.log_level)
+
+def main(argv=None):
+    """Main function to run the QR2Key application."""
+    global config, gui_window
+    
+    args = parse_args(argv)
+    config = Config(args.config)
+    apply_args(args)
+    
+    setup_logger(
+        log_level=config.get("app", "log_level", "INFO"),
+        log_dir="logs",
+        enqueue=config.get("logging", "enqueue", True),
+        payload=config.get("logging", "payload", "full"),
+        payload_chars=config.get("logging", "payload_chars", 32),
+        rate_limits=config.get("logging", "rate_limits", {})
+    )
+    logger.info(f"QR2Key v{app_version} - Starting application")
+    
+    headless = args.headless or not GUI_AVAILABLE
+    if headless and not args.headless:
+        logger.info("PyQt5 not available, running headless")
+    if headless:
+        install_signal_handlers()
     
-    serial_thread = threading.Thread(target=serial_reader_thread, daemon=True)
-    serial_thread.start()
+    # Reach "port open and reading" before loading the keyboard and the GUI
+    start_reading()
+    connection_manager.start()  # Also starts the event loop
+    start_services()
     
     if PORT_DETECTOR_AVAILABLE and config.get("serial", "monitor_ports", True):
         monitor_thread = threading.Thread(target=port_monitor_thread, daemon=True)
         monitor_thread.start()
     
-    if AUTO_START_AVAILABLE and config.get("app", "auto_start", False) != is_auto_start_enabled():
-        toggle_auto_start(config.get("app", "auto_start", False))
+    if not headless:
+        try:
+            from PyQt5.QtWidgets import QApplication
+            from gui import QR2KeyGUI
+        except ImportError as e:
+            # find_spec() only finds PyQt5; its Qt libraries can still fail to load
+            logger.warning(f"Could not load the GUI ({e}), running headless")
+            headless = True
+            install_signal_handlers()
+    
+    if headless:
+        logger.info("Running headless; SIGHUP reloads the configuration, SIGTERM exits")
+        try:
+            connection_manager.join()
+        except KeyboardInterrupt:
+            logger.info("Received interrupt signal. Exiting...")
+            handle_exit()
+        return
+    
+    app = QApplication(sys.argv)
+    history = PerformanceHistory(metrics)
+    core.every(SAMPLE_INTERVAL, history.sample)
+    gui_window = QR2KeyGUI(config, app_version, history)
+    gui_window.toggle_signal.connect(handle_toggle_pause)
+    gui_window.exit_signal.connect(handle_exit)
+    update_port_status()
+    
+    try:
+        from auto_start import toggle_auto_start, is_auto_start_enabled
+        if config.get("app", "auto_start", False) != is_auto_start_enabled():
+            toggle_auto_start(config.get("app", "auto_start", False))
+    except ImportError:
+        pass
     
     if not config.get("app", "start_minimized", False):
         gui_window.show()
@@ -0,0 +1,249 @@
+"""
+QR2Key - Hot-path metrics: counters, gauges and latency histograms
+"""
+
+import threading
+from bisect import bisect_left
+from loguru import logger
+
+# Upper bounds in seconds, from a fast read or decode to a long typed payload
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+def bucket_quantile(buckets, counts, q):
+    """Estimate a quantile as the upper bound of the bucket containing it.
+
+    counts has one entry per bound plus the overflow bucket; returns None
+    without observations and infinity for the overflow bucket.
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bound, count in zip(buckets, counts):
+        seen += count
+        if seen >= rank:
+            return bound
+    return float("inf")
+
+class Counter:
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name, help=""):
+        """Initialize the counter at zero."""
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Add to the counter."""
+        self.value += amount
+
+    def snapshot(self):
+        """Return the current count."""
+        return self.value
+
+    def samples(self):
+        """Yield (suffix, labels, value) for the Prometheus exposition."""
+        yield "", "", self.value
+
+class Gauge:
+    """Value sampled when read, from a callback or the last set()."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help="", function=None):
+        """Initialize the gauge, optionally reading its value from function()."""
+        self.name = name
+        self.help = help
+        self.function = function
+        self.value = 0
+
+    def set(self, value):
+        """Set the gauge."""
+        self.value = value
+
+    def snapshot(self):
+        """Return the current value."""
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} failed: {e}")
+                return None
+        return self.value
+
+    def samples(self):
+        """Yield (suffix, labels, value) for the Prometheus exposition."""
+        value = self.snapshot()
+        if value is not None:
+            yield "", "", value
+
+class Histogram:
+    """Fixed-bucket histogram.
+
+    observe() is a bisect over the bucket bounds and two additions, so it
+    costs a fraction of a microsecond and never allocates. Observations
+    from several threads may very rarely be lost to a race, which is
+    acceptable for monitoring.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help="", buckets=LATENCY_BUCKETS):
+        """Initialize empty buckets; the last one catches everything above the bounds."""
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record one observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        """Number of observations."""
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Estimate a quantile as the upper bound of the bucket containing it."""
+        return bucket_quantile(self.buckets, list(self.counts), q)
+
+    def snapshot(self):
+        """Return the count, sum, per-bucket counts and estimated p50/p99."""
+        counts = list(self.counts)
+        total = sum(counts)
+        return {
+            "count": total,
+            "sum": self.sum,
+            "buckets": dict(zip(self.buckets + (float("inf"),), counts)),
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+    def samples(self):
+        """Yield (suffix, labels, value) for the Prometheus exposition."""
+        cumulative = 0
+        counts = list(self.counts)
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            yield "_bucket", f'{{le="{bound:g}"}}', cumulative
+        cumulative += counts[-1]
+        yield "_bucket", '{le="+Inf"}', cumulative
+        yield "_sum", "", self.sum
+        yield "_count", "", cumulative
+
+class MetricsRegistry:
+    """Named collection of metrics shared by the stages of the scan path.
+
+    Stages look their metrics up once, when they are created, and then
+    update them directly; the registry is only consulted again to take a
+    snapshot or render the Prometheus text format.
+    """
+
+    def __init__(self, prefix="qr2key_"):
+        """Initialize an empty registry."""
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name, help=""):
+        """Return the counter with this name, creating it if needed."""
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help="", function=None):
+        """Return the gauge with this name, creating it if needed."""
+        gauge = self._get(Gauge, name, help)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, help="", buckets=LATENCY_BUCKETS):
+        """Return the histogram with this name, creating it if needed."""
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def snapshot(self):
+        """Return {name: value} for counters and gauges and a dict for histograms."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render_prometheus(self):
+        """Render every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            name = self.prefix + metric.name
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{name}{suffix}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _get(self, cls, name, help, **kwargs):
+        """Look up a metric, creating it on first use."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+class MetricsServer:
+    """HTTP server exposing a registry at /metrics, bound to localhost only."""
+
+    def __init__(self, registry, port=9464, host="127.0.0.1"):
+        """Initialize the server; port 0 picks a free port when started."""
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """Start serving on a background thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Not needed unless enabled
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        logger.info(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        """Stop the server."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
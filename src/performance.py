@@ -0,0 +1,107 @@
+"""
+QR2Key - Ring-buffered performance history for the dashboard
+"""
+
+import math
+import time
+from array import array
+
+from metrics import bucket_quantile
+
+# Samples kept per series and seconds between samples: two minutes of history
+HISTORY_LENGTH = 120
+SAMPLE_INTERVAL = 1.0
+
+# (series, label) in the order the Performance tab shows them
+SERIES = (
+    ("scans_per_min", "Scans/min"),
+    ("bytes_per_sec", "Bytes/s"),
+    ("latency_p50", "Latency p50"),
+    ("latency_p95", "Latency p95"),
+    ("latency_p99", "Latency p99"),
+    ("queue_depth", "Queue depth"),
+    ("reconnects", "Reconnects"),
+)
+
+LATENCY_QUANTILES = (("latency_p50", 0.5), ("latency_p95", 0.95), ("latency_p99", 0.99))
+
+class RingBuffer:
+    """Fixed-size buffer of floats that overwrites its oldest value.
+
+    The storage is one array allocated up front, so appending never
+    allocates. NaN marks a sample with no value, e.g. the latency of an
+    interval without scans.
+    """
+
+    def __init__(self, capacity=HISTORY_LENGTH):
+        """Allocate the buffer."""
+        self.capacity = capacity
+        self._values = array("d", [math.nan]) * capacity
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        """Add a value, dropping the oldest one if the buffer is full."""
+        self._values[self._next] = math.nan if value is None else value
+        self._next = (self._next + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def last(self):
+        """Return the newest value, or NaN if the buffer is empty."""
+        if not self._count:
+            return math.nan
+        return self._values[self._next - 1]
+
+    def values(self):
+        """Return the values oldest first."""
+        if self._count < self.capacity:
+            return self._values[:self._count].tolist()
+        return (self._values[self._next:] + self._values[:self._next]).tolist()
+
+class PerformanceHistory:
+    """One RingBuffer per dashboard series, sampled from a MetricsRegistry.
+
+    sample() is called every SAMPLE_INTERVAL seconds on the event loop.
+    Rates and latency percentiles are computed from what changed since
+    the previous sample, so they describe that interval, not the whole
+    run. Reading the series for display never touches the registry.
+    """
+
+    def __init__(self, metrics, capacity=HISTORY_LENGTH, clock=time.monotonic):
+        """Initialize empty series over the scan path's metrics."""
+        self.clock = clock
+        self.series = {name: RingBuffer(capacity) for name, _ in SERIES}
+        self._scans = metrics.counter("scans_read_total", "Scans framed and decoded")
+        self._bytes = metrics.counter("bytes_read_total", "Bytes read from all ports")
+        self._reconnects = metrics.counter("reconnects_total", "Lost ports that were reopened")
+        self._latency = metrics.histogram("scan_latency_seconds",
+                                          "Time from a scan's arrival to the end of its injection")
+        self._queue_depth = metrics.gauge("queue_depth", "Scans waiting for the injection worker")
+        self._previous = None
+
+    def sample(self, now=None):
+        """Append one sample to every series; the first call only sets the baseline."""
+        if now is None:
+            now = self.clock()
+        scans = self._scans.value
+        read = self._bytes.value
+        counts = list(self._latency.counts)
+
+        if self._previous is not None:
+            then, last_scans, last_read, last_counts = self._previous
+            elapsed = now - then
+            if elapsed > 0:
+                self.series["scans_per_min"].append((scans - last_scans) * 60 / elapsed)
+                self.series["bytes_per_sec"].append((read - last_read) / elapsed)
+                interval = [count - last for count, last in zip(counts, last_counts)]
+                for name, q in LATENCY_QUANTILES:
+                    # The overflow bucket has no upper bound; show it at the highest one
+                    value = bucket_quantile(self._latency.buckets, interval, q)
+                    self.series[name].append(min(value, self._latency.buckets[-1]) if value is not None else None)
+                self.series["queue_depth"].append(self._queue_depth.snapshot())
+                self.series["reconnects"].append(self._reconnects.value)
+        self._previous = (now, scans, read, counts)
@@ -0,0 +1,151 @@
+"""
+QR2Key - Scan pipeline between the serial reader and keystroke injection
+"""
+
+import queue
+import threading
+import time
+from loguru import logger
+
+from logger import log_allowed, log_suppressed
+from metrics import MetricsRegistry
+
+class Scan:
+    """A decoded scan travelling from a reader to the injection worker."""
+
+    __slots__ = ("text", "port", "raw", "seq", "received_at", "enqueued_at", "waited")
+
+    def __init__(self, text, port=None, received_at=None, raw=None):
+        """Initialize the scan, stamping its arrival time."""
+        self.text = text
+        self.port = port
+        self.raw = raw
+        self.seq = None
+        self.received_at = time.monotonic() if received_at is None else received_at
+        self.enqueued_at = None
+        self.waited = None
+
+    def __repr__(self):
+        return f"Scan({self.text!r}, port={self.port!r})"
+
+class ScanPipeline:
+    """Bounded queue feeding a dedicated injection worker thread.
+
+    Readers call submit(), which never blocks: when the queue is full the
+    scan is dropped and counted so that the serial port keeps being read
+    at line rate however slowly the worker types.
+
+    Queue wait, injection time and end-to-end latency from the scan's
+    arrival are recorded in metrics.
+    """
+
+    _STOP = object()
+
+    def __init__(self, handler, maxsize=256, metrics=None):
+        """Initialize the pipeline with the function that injects a scan."""
+        self.handler = handler
+        self.maxsize = maxsize
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._wait_time = self.metrics.histogram("queue_wait_seconds", "Time scans wait for the injection worker")
+        self._inject_time = self.metrics.histogram("inject_seconds", "Time spent typing or pasting a scan")
+        self._latency = self.metrics.histogram("scan_latency_seconds", "Time from a scan's arrival to the end of its injection")
+        self._dropped = self.metrics.counter("scans_dropped_total", "Scans dropped because the queue was full")
+        self._errors = self.metrics.counter("inject_errors_total", "Scans whose injection failed")
+        self.metrics.gauge("queue_depth", "Scans waiting for the injection worker", lambda: self.depth)
+
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.last_wait = 0.0
+        self.total_wait = 0.0
+
+    @property
+    def depth(self):
+        """Number of scans waiting for the worker."""
+        return self._queue.qsize()
+
+    def start(self):
+        """Start the injection worker thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="injection-worker", daemon=True)
+        self._thread.start()
+        logger.debug(f"Scan pipeline started (queue size {self.maxsize})")
+
+    def stop(self, timeout=None):
+        """Ask the worker to finish the queued scans and exit."""
+        if not self._thread:
+            return
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Scan pipeline queue full, worker not stopped cleanly")
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, scan):
+        """Queue a scan for injection; returns False if it had to be dropped."""
+        scan.enqueued_at = time.monotonic()
+        try:
+            self._queue.put_nowait(scan)
+        except queue.Full:
+            self.dropped += 1
+            self._dropped.inc()
+            if log_allowed("queue_full"):
+                skipped = log_suppressed("queue_full")
+                logger.error("Scan queue full ({}), dropping scan from {} ({} dropped so far){}",
+                             self.maxsize, scan.port, self.dropped,
+                             f" ({skipped} more not logged)" if skipped else "")
+            return False
+
+        self.submitted += 1
+        depth = self._queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return True
+
+    def stats(self):
+        """Return a snapshot of the pipeline counters."""
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_wait": self.last_wait,
+            "avg_wait": self.total_wait / self.processed if self.processed else 0.0,
+        }
+
+    def _run(self):
+        """Worker loop: take scans off the queue and inject them in order."""
+        while True:
+            scan = self._queue.get()
+            if scan is self._STOP:
+                break
+
+            started = time.monotonic()
+            scan.waited = started - scan.enqueued_at
+            self.last_wait = scan.waited
+            self.total_wait += scan.waited
+            self._wait_time.observe(scan.waited)
+            logger.opt(lazy=True).debug("Injecting scan after {:.1f} ms in queue, depth {}",
+                                        lambda: scan.waited * 1000, self._queue.qsize)
+
+            try:
+                self.handler(scan)
+            except Exception as e:
+                self.errors += 1
+                self._errors.inc()
+                logger.error(f"Error injecting scan: {e}")
+            finally:
+                self.processed += 1
+                finished = time.monotonic()
+                self._inject_time.observe(finished - started)
+                self._latency.observe(finished - scan.received_at)
@@ -0,0 +1,214 @@
+"""
+QR2Key - Serial port detection and hotplug monitoring
+"""
+
+import os
+import select
+import threading
+import time
+
+from loguru import logger
+
+# USB-serial bridges commonly built into barcode scanners, in order of preference
+USB_SERIAL_VIDS = {
+    0x0403: "FTDI",
+    0x10C4: "CP210x",
+    0x1A86: "CH340",
+    0x067B: "PL2303",
+}
+USB_SERIAL_NAMES = ("usbserial", "usbmodem", "wchusbserial", "SLAB_USBtoUART", "ttyUSB", "ttyACM")
+
+def comports():
+    """List serial ports, importing the platform port enumeration on first use."""
+    import serial.tools.list_ports
+    return serial.tools.list_ports.comports()
+
+class PortDetector:
+    """Detect scanner serial ports and report hotplug events.
+
+    The result of serial.tools.list_ports.comports() is cached and only
+    refreshed when the device directory changes, so watching for hotplug
+    costs almost nothing while idle. Where kqueue is available (macOS) the
+    monitor sleeps until the kernel reports a change to the device
+    directory; elsewhere it polls the directory's modification time every
+    poll_interval. Changes are debounced and enumerations rate limited.
+    """
+
+    def __init__(self, poll_interval=0.1, debounce=0.1, min_scan_interval=0.05,
+                 rescan_interval=30.0, device_dir="/dev", list_ports=None):
+        """Initialize the detector."""
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.min_scan_interval = min_scan_interval
+        self.rescan_interval = rescan_interval
+        self.device_dir = device_dir
+        self.list_ports = list_ports or comports
+
+        self._snapshot = {}
+        self._scanned_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        os.set_blocking(self._wakeup_read, False)
+        os.set_blocking(self._wakeup_write, False)
+
+    def snapshot(self):
+        """Return the cached {device: port info} map, enumerating if none exists yet."""
+        with self._lock:
+            if self._scanned_at is None:
+                self._rescan()
+            return dict(self._snapshot)
+
+    def refresh(self):
+        """Re-enumerate ports and return the (added, removed) device lists."""
+        with self._lock:
+            elapsed = time.monotonic() - self._scanned_at if self._scanned_at is not None else None
+            if elapsed is not None and elapsed < self.min_scan_interval:
+                time.sleep(self.min_scan_interval - elapsed)
+            return self._rescan()
+
+    @staticmethod
+    def is_scanner_port(info):
+        """Whether a port looks like a USB scanner rather than a built-in or Bluetooth port."""
+        if getattr(info, "vid", None) is not None:
+            return True
+        return any(hint in info.device for hint in USB_SERIAL_NAMES)
+
+    def scanner_ports(self):
+        """Return likely scanner ports, best candidates first."""
+        ports = [info for info in self.snapshot().values() if self.is_scanner_port(info)]
+        vids = list(USB_SERIAL_VIDS)
+        ports.sort(key=lambda info: (vids.index(info.vid) if info.vid in USB_SERIAL_VIDS else len(vids),
+                                     info.device))
+        return [info.device for info in ports]
+
+    def auto_detect_port(self):
+        """Return the most likely scanner port, or None."""
+        ports = self.scanner_ports()
+        if not ports:
+            return None
+        logger.debug(f"Scanner port candidates: {ports}")
+        return ports[0]
+
+    def monitor_ports(self, callback, on_removed=None):
+        """Call callback(port) for each scanner port that appears until stop() is called."""
+        self._stop.clear()
+        self._drain_wakeup()
+        self.snapshot()
+        method, wait_for_change, close = self._create_watcher()
+        logger.info(f"Monitoring {self.device_dir} for new ports ({method})")
+
+        last_rescan = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                changed = wait_for_change()
+                if self._stop.is_set():
+                    break
+
+                if not changed and time.monotonic() - last_rescan < self.rescan_interval:
+                    continue
+
+                if changed:
+                    self._stop.wait(self.debounce)  # Let the burst of node changes settle
+                last_rescan = time.monotonic()
+                added, removed = self.refresh()
+
+                for port in removed:
+                    logger.info(f"Port removed: {port}")
+                    if on_removed:
+                        on_removed(port)
+
+                snapshot = self.snapshot()
+                for port in added:
+                    if self.is_scanner_port(snapshot[port]):
+                        logger.info(f"Port added: {port}")
+                        callback(port)
+        finally:
+            close()
+
+        logger.debug("Port monitoring stopped")
+
+    def stop(self):
+        """Stop monitor_ports()."""
+        self._stop.set()
+        try:
+            os.write(self._wakeup_write, b"\0")
+        except OSError:
+            pass
+
+    def _rescan(self):
+        """Enumerate ports into the snapshot; the caller holds the lock."""
+        previous = self._snapshot
+        self._snapshot = {info.device: info for info in self.list_ports()}
+        self._scanned_at = time.monotonic()
+
+        added = [port for port in self._snapshot if port not in previous]
+        removed = [port for port in previous if port not in self._snapshot]
+        return added, removed
+
+    def _create_watcher(self):
+        """Return (method, wait_for_change, close) for watching the device directory."""
+        if hasattr(select, "kqueue"):
+            try:
+                return self._kqueue_watcher()
+            except OSError as e:
+                logger.warning(f"kqueue unavailable for {self.device_dir} ({e}), polling instead")
+        return self._stat_watcher()
+
+    def _kqueue_watcher(self):
+        """Sleep in kqueue until the device directory is written or stop() is called."""
+        kq = select.kqueue()
+        try:
+            dir_fd = os.open(self.device_dir, os.O_RDONLY)
+        except OSError:
+            kq.close()
+            raise
+        kq.control([
+            select.kevent(dir_fd, filter=select.KQ_FILTER_VNODE,
+                          flags=select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+                          fflags=select.KQ_NOTE_WRITE | select.KQ_NOTE_EXTEND),
+            select.kevent(self._wakeup_read, filter=select.KQ_FILTER_READ,
+                          flags=select.KQ_EV_ADD),
+        ], 0)
+
+        def wait_for_change():
+            try:
+                fired = kq.control(None, 4, self.rescan_interval)
+            except OSError:
+                return False
+            return any(event.ident == dir_fd for event in fired)
+
+        def close():
+            kq.close()
+            os.close(dir_fd)
+
+        return "kqueue", wait_for_change, close
+
+    def _stat_watcher(self):
+        """Poll the device directory's modification time."""
+        state = {"mtime": self._dir_mtime()}
+
+        def wait_for_change():
+            self._stop.wait(self.poll_interval)
+            mtime = self._dir_mtime()
+            if mtime == state["mtime"]:
+                return False
+            state["mtime"] = mtime
+            return True
+
+        return "polling", wait_for_change, lambda: None
+
+    def _drain_wakeup(self):
+        """Discard stop() wakeups left over from a previous monitor run."""
+        try:
+            while os.read(self._wakeup_read, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _dir_mtime(self):
+        """Modification time of the device directory, or None if it cannot be read."""
+        try:
+            return os.stat(self.device_dir).st_mtime_ns
+        except OSError:
+            return None
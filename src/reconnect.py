@@ -0,0 +1,154 @@
+"""
+QR2Key - Reconnect state machine for serial ports
+"""
+
+import random
+import time
+from collections import Counter
+from loguru import logger
+
+CONNECTED = "connected"
+LOST = "lost"
+RECONNECTING = "reconnecting"
+CLOSED = "closed"
+
+# Allowed transitions; RECONNECTING -> RECONNECTING is a failed attempt
+TRANSITIONS = {
+    CONNECTED: {LOST, CLOSED},
+    LOST: {RECONNECTING, CLOSED},
+    RECONNECTING: {RECONNECTING, CONNECTED, CLOSED},
+    CLOSED: set(),
+}
+
+class ReconnectPolicy:
+    """Exponential backoff with jitter between reconnect attempts."""
+
+    def __init__(self, initial_delay=0.5, max_delay=30.0, multiplier=2.0, jitter=0.2,
+                 keep_buffer_for=5.0, rng=random.random):
+        """Initialize the policy."""
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.keep_buffer_for = keep_buffer_for
+        self.rng = rng
+
+    @classmethod
+    def from_config(cls, reconnect):
+        """Create a policy from a serial.reconnect config section."""
+        reconnect = reconnect or {}
+        return cls(
+            initial_delay=reconnect.get("initial_delay", 0.5),
+            max_delay=reconnect.get("max_delay", 30.0),
+            multiplier=reconnect.get("multiplier", 2.0),
+            jitter=reconnect.get("jitter", 0.2),
+            keep_buffer_for=reconnect.get("keep_buffer_for", 5.0),
+        )
+
+    def delay(self, attempt):
+        """Seconds to wait before the given attempt (0 is the first)."""
+        delay = min(self.max_delay, self.initial_delay * self.multiplier ** attempt)
+        return delay * (1 + self.jitter * (2 * self.rng() - 1))
+
+class PortState:
+    """Connection state of one port: connected -> lost -> reconnecting -> connected.
+
+    Every transition is counted and the time spent in each state is
+    accumulated. on_change(port, old, new) is called after each transition.
+    """
+
+    def __init__(self, port, policy=None, on_change=None, clock=time.monotonic):
+        """Initialize the state machine in the connected state."""
+        self.port = port
+        self.policy = policy or ReconnectPolicy()
+        self.on_change = on_change
+        self.clock = clock
+
+        self.state = CONNECTED
+        self.entered_at = clock()
+        self.attempts = 0
+        self.lost_at = None
+        self.next_attempt_at = None
+        self.last_outage = None
+        self.transitions = Counter()
+        self.durations = Counter()
+
+    def lose(self, error=None):
+        """Record that the port stopped working and schedule the first attempt."""
+        self._transition(LOST)
+        self.lost_at = self.entered_at
+        self.attempts = 0
+        logger.warning(f"{self.port}: connection lost{f' ({error})' if error else ''}")
+        self._schedule()
+
+    def attempt_failed(self, error=None):
+        """Record a failed reconnect attempt and schedule the next one."""
+        self.attempts += 1
+        logger.debug(f"{self.port}: reconnect attempt {self.attempts} failed: {error}")
+        self._transition(RECONNECTING)
+        self._schedule()
+
+    def reconnected(self):
+        """Record a successful reconnect; returns the length of the outage in seconds."""
+        self._transition(CONNECTED)
+        self.last_outage = self.entered_at - self.lost_at
+        self.next_attempt_at = None
+        logger.info(f"{self.port}: reconnected after {self.last_outage:.1f} s, {self.attempts + 1} attempts")
+        return self.last_outage
+
+    def retry_now(self):
+        """Bring the next reconnect attempt forward, e.g. when the device reappears."""
+        if self.state == RECONNECTING:
+            self.next_attempt_at = self.clock()
+
+    def close(self):
+        """Stop tracking the port."""
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+        self.next_attempt_at = None
+
+    def due(self, now=None):
+        """Whether a reconnect attempt is due."""
+        if self.next_attempt_at is None:
+            return False
+        return (self.clock() if now is None else now) >= self.next_attempt_at
+
+    def time_in_state(self, now=None):
+        """Seconds spent in the current state."""
+        return (self.clock() if now is None else now) - self.entered_at
+
+    def stats(self):
+        """Return transition counts and time spent per state."""
+        durations = dict(self.durations)
+        durations[self.state] = durations.get(self.state, 0.0) + self.time_in_state()
+        return {
+            "state": self.state,
+            "attempts": self.attempts,
+            "last_outage": self.last_outage,
+            "transitions": {f"{old}->{new}": count for (old, new), count in self.transitions.items()},
+            "durations": durations,
+        }
+
+    def _schedule(self):
+        """Move to reconnecting with the next attempt after the backoff delay."""
+        if self.state == LOST:
+            self._transition(RECONNECTING)
+        self.next_attempt_at = self.clock() + self.policy.delay(self.attempts)
+
+    def _transition(self, new):
+        """Change state, updating counters and notifying the listener."""
+        old = self.state
+        if new not in TRANSITIONS[old]:
+            raise ValueError(f"{self.port}: invalid transition {old} -> {new}")
+
+        now = self.clock()
+        self.durations[old] += now - self.entered_at
+        self.transitions[(old, new)] += 1
+        self.state = new
+        self.entered_at = now
+
+        if self.on_change and old != new:
+            try:
+                self.on_change(self.port, old, new)
+            except Exception as e:
+                logger.error(f"Error in state change listener for {self.port}: {e}")
@@ -0,0 +1,240 @@
+"""
+QR2Key - Record raw serial traffic to trace files and replay it into a pty
+"""
+
+import argparse
+import os
+import struct
+import sys
+import threading
+import time
+from loguru import logger
+
+MAGIC = b"QR2KTRC1"
+HEADER = struct.Struct("<dH")   # Wall-clock start time, port name length
+RECORD = struct.Struct("<IH")   # Microseconds since the previous record, data length
+MAX_DELTA_US = 0xFFFFFFFF
+MAX_CHUNK = 0xFFFF
+TRACE_SUFFIX = ".qrtrace"
+
+class TraceError(Exception):
+    """Raised when a trace file cannot be read."""
+
+class TraceRecorder:
+    """Append raw serial reads with their arrival times to a trace file.
+
+    Each read costs six bytes of framing: the time since the previous
+    read in microseconds and the length of the data. Timestamps come from
+    the monotonic clock so they are exact relative to each other. Records
+    are buffered; the owner calls flush() once time_until_flush() reaches
+    zero, so at most flush_interval seconds of reads wait in memory.
+    """
+
+    def __init__(self, path, port="", clock=time.monotonic, flush_interval=1.0):
+        """Create the trace file and write its header."""
+        self.path = path
+        self.port = port
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.bytes = 0
+        self._last = clock()
+        self._unflushed_since = None
+        self._file = open(path, "wb")
+        name = port.encode("utf-8", "surrogateescape")
+        self._file.write(MAGIC + HEADER.pack(time.time(), len(name)) + name)
+        self._file.flush()
+
+    def record(self, data, now=None):
+        """Append one read; now is its monotonic arrival time."""
+        if now is None:
+            now = self.clock()
+        delta = max(0, int(round((now - self._last) * 1e6)))
+        self._last = now
+
+        # A gap longer than ~71 minutes is written as empty records
+        while delta > MAX_DELTA_US:
+            self._file.write(RECORD.pack(MAX_DELTA_US, 0))
+            delta -= MAX_DELTA_US
+        for start in range(0, max(len(data), 1), MAX_CHUNK):
+            chunk = data[start:start + MAX_CHUNK]
+            self._file.write(RECORD.pack(delta, len(chunk)))
+            self._file.write(chunk)
+            delta = 0
+
+        self.records += 1
+        self.bytes += len(data)
+        if self._unflushed_since is None:
+            self._unflushed_since = now
+
+    def time_until_flush(self, now):
+        """Seconds until buffered records are due to be flushed, or None if there are none."""
+        if self._unflushed_since is None:
+            return None
+        return max(0.0, self._unflushed_since + self.flush_interval - now)
+
+    def flush(self):
+        """Flush buffered records to disk."""
+        self._file.flush()
+        self._unflushed_since = None
+
+    def close(self):
+        """Close the trace file."""
+        if not self._file.closed:
+            self._file.close()
+            logger.info(f"Recorded {self.records} reads, {self.bytes} bytes to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_trace(path):
+    """Read a trace file; returns (header dict, list of (offset seconds, bytes))."""
+    with open(path, "rb") as f:
+        blob = f.read()
+
+    if blob[:len(MAGIC)] != MAGIC:
+        raise TraceError(f"{path} is not a QR2Key trace")
+    pos = len(MAGIC)
+    try:
+        started, name_length = HEADER.unpack_from(blob, pos)
+    except struct.error:
+        raise TraceError(f"{path}: truncated header")
+    pos += HEADER.size
+    port = blob[pos:pos + name_length].decode("utf-8", "surrogateescape")
+    pos += name_length
+
+    events = []
+    offset_us = 0
+    while pos + RECORD.size <= len(blob):
+        delta, length = RECORD.unpack_from(blob, pos)
+        pos += RECORD.size
+        offset_us += delta
+        data = blob[pos:pos + length]
+        pos += length
+        if len(data) < length:
+            logger.warning(f"{path}: last record truncated")
+        if data:
+            events.append((offset_us / 1e6, data))
+
+    return {"port": port, "started": started}, events
+
+class TraceReplayer:
+    """Play a trace into a pty that the app can open like a real scanner.
+
+    speed scales the recorded timing: 1 is real time, 10 is ten times
+    faster and 0 writes everything as fast as the pty accepts it. Writes
+    follow deadlines from the monotonic clock, so timing does not drift
+    over long traces.
+    """
+
+    def __init__(self, events, speed=1.0):
+        """Open the pty; events is a list of (offset seconds, bytes)."""
+        self.events = events
+        self.speed = speed
+        self.master, self.slave = os.openpty()
+        self.port = os.ttyname(self.slave)
+        self.sent_at = []
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_file(cls, path, speed=1.0):
+        """Create a replayer for a trace file."""
+        _, events = read_trace(path)
+        return cls(events, speed)
+
+    def play(self):
+        """Write every event to the pty; returns the elapsed time."""
+        started = time.monotonic()
+        for offset, data in self.events:
+            if self.speed > 0:
+                remaining = started + offset / self.speed - time.monotonic()
+                if remaining > 0 and self._stopped.wait(remaining):
+                    break
+            elif self._stopped.is_set():
+                break
+            self.sent_at.append(time.monotonic())
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.master, view):]
+        return time.monotonic() - started
+
+    def start(self):
+        """Play the trace on a background thread."""
+        self._thread = threading.Thread(target=self.play, name="trace-replay", daemon=True)
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """Wait for a background replay to finish; returns False on timeout."""
+        if self._thread:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    def close(self):
+        """Stop replaying and close the pty."""
+        self._stopped.set()
+        self.wait(1)
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+def trace_path(trace_dir, port):
+    """Return a new trace file name for a port."""
+    name = os.path.basename(port) or "port"
+    return os.path.join(trace_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}{TRACE_SUFFIX}")
+
+def record_port(port, path, baud_rate=9600):
+    """Record a serial port to a trace file until interrupted."""
+    import serial
+
+    with serial.Serial(port, baud_rate, timeout=0.5) as ser, TraceRecorder(path, port) as recorder:
+        logger.info(f"Recording {port} to {path}, press Ctrl+C to stop")
+        try:
+            while True:
+                data = ser.read(ser.in_waiting or 1)
+                if data:
+                    recorder.record(data)
+                    recorder.flush()
+        except KeyboardInterrupt:
+            pass
+
+def replay_file(path, speed=1.0):
+    """Replay a trace file into a pty, printing the device to connect to."""
+    replayer = TraceReplayer.from_file(path, speed)
+    print(f"Replaying {len(replayer.events)} reads on {replayer.port}; press Enter to start")
+    try:
+        sys.stdin.readline()
+        elapsed = replayer.play()
+        print(f"Replayed in {elapsed:.3f} s")
+        time.sleep(0.5)
+    finally:
+        replayer.close()
+
+def main(argv=None):
+    """Command line entry point: record or replay a trace."""
+    parser = argparse.ArgumentParser(description="Record and replay QR2Key serial traces")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="record a serial port to a trace file")
+    record.add_argument("port")
+    record.add_argument("path")
+    record.add_argument("--baud", type=int, default=9600)
+
+    replay = commands.add_parser("replay", help="replay a trace file into a pty")
+    replay.add_argument("path")
+    replay.add_argument("--speed", type=float, default=1.0, help="1 = real time, 0 = as fast as possible")
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        record_port(args.port, args.path, args.baud)
+    else:
+        replay_file(args.path, args.speed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""
+QR2Key - Output sinks: scans written to files, stdout or a Unix socket
+"""
+
+import json
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from loguru import logger
+
+from logger import log_allowed, log_suppressed
+from metrics import MetricsRegistry
+
+SINK_FORMATS = ("text", "json")
+
+class OutputSink(ABC):
+    """Destination for scans besides the keyboard.
+
+    write() receives a batch of encoded lines as one bytes object and
+    raises on failure; BufferedSink calls it from its own thread only.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def write(self, data):
+        """Write a batch of lines."""
+
+    def close(self):
+        """Release the destination."""
+
+class FileSink(OutputSink):
+    """Append scans to a file, one batch per write."""
+
+    name = "file"
+
+    def __init__(self, path, fsync=False):
+        """Initialize the sink; the file is opened on the first write."""
+        self.path = path
+        self.fsync = fsync
+        self._fd = None
+
+    def write(self, data):
+        """Append a batch, reopening the file after an earlier failure."""
+        if self._fd is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(self._fd, data)
+            if self.fsync:
+                os.fsync(self._fd)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        """Close the file."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+class StdoutSink(OutputSink):
+    """Write scans to standard output."""
+
+    name = "stdout"
+
+    def __init__(self, stream=None):
+        """Initialize with a binary stream (standard output by default)."""
+        self.stream = stream if stream is not None else sys.stdout.buffer
+
+    def write(self, data):
+        """Write and flush a batch."""
+        self.stream.write(data)
+        self.stream.flush()
+
+class SocketSink(OutputSink):
+    """Send scans to a process listening on a Unix stream socket.
+
+    The socket is connected on the first write and reconnected after a
+    failure, so the consumer can start after QR2Key or restart.
+    """
+
+    name = "socket"
+
+    def __init__(self, path, timeout=1.0):
+        """Initialize the sink for the socket at path."""
+        self.path = path
+        self.timeout = timeout
+        self._socket = None
+
+    def write(self, data):
+        """Send a batch, connecting first if needed."""
+        if self._socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self._socket = sock
+        try:
+            self._socket.sendall(data)
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        """Disconnect."""
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+class BufferedSink:
+    """Runs an OutputSink on its own writer thread behind a bounded buffer.
+
+    publish() never blocks: a scan is encoded later, on the writer, and
+    when buffer_size scans are already waiting it is dropped and counted.
+    The writer takes up to batch_size scans at a time, waiting at most
+    flush_interval after the first for more to arrive, and writes them
+    with one call. A failing write drops that batch and pauses the sink
+    for retry_delay seconds; other sinks and the keyboard are unaffected.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sink, format="text", buffer_size=1024, batch_size=256, flush_interval=0.05,
+                 retry_delay=1.0, metrics=None):
+        """Initialize the sink's buffer and start its writer thread."""
+        if format not in SINK_FORMATS:
+            raise ValueError(f"Unknown sink format: {format}")
+        self.sink = sink
+        self.format = format
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(max(1, buffer_size))
+        self._written = threading.Condition()
+        self._stop = threading.Event()
+
+        self.metrics = metrics if metrics is not None else MetricsRegistry()
+        self._scans_written = self.metrics.counter("sink_scans_total", "Scans written to output sinks")
+        self._dropped = self.metrics.counter("sink_dropped_total", "Scans dropped because a sink's buffer was full")
+        self._errors = self.metrics.counter("sink_errors_total", "Failed output sink writes")
+
+        self.published = 0
+        self.done = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.batches = 0
+        self._thread = threading.Thread(target=self._run, name=f"sink-{sink.name}", daemon=True)
+        self._thread.start()
+
+    @property
+    def name(self):
+        """Name of the wrapped sink."""
+        return self.sink.name
+
+    def publish(self, text, port=None, result="typed", timestamp=None):
+        """Queue a scan for the sink; returns False if the buffer was full."""
+        try:
+            self._queue.put_nowait((time.time() if timestamp is None else timestamp, port, text, result))
+        except queue.Full:
+            self.dropped += 1
+            self._dropped.inc()
+            return False
+        self.published += 1
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until every scan published so far is written or dropped; returns False on timeout."""
+        target = self.published
+        with self._written:
+            return self._written.wait_for(lambda: self.done >= target, timeout)
+
+    def close(self, timeout=2):
+        """Write what is buffered, stop the writer and close the sink."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning(f"{self.name} sink buffer full, not flushed before closing")
+            self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        """Return the sink's counters."""
+        return {
+            "buffered": self._queue.qsize(),
+            "published": self.published,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "batches": self.batches,
+        }
+
+    def encode(self, batch):
+        """Encode a batch of (timestamp, port, text, result) scans as lines."""
+        if self.format == "json":
+            lines = [json.dumps({"time": timestamp, "port": port, "text": text, "result": result},
+                                ensure_ascii=False)
+                     for timestamp, port, text, result in batch]
+        else:
+            lines = [text.replace("\n", " ") for _, _, text, _ in batch]
+        return ("\n".join(lines) + "\n").encode("utf-8", "surrogateescape")
+
+    def _run(self):
+        """Writer loop: collect a batch and write it."""
+        stopping = False
+        while not stopping and not self._stop.is_set():
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                self.sink.write(self.encode(batch))
+                self.written += len(batch)
+                self.batches += 1
+                self._scans_written.inc(len(batch))
+                failed = False
+            except Exception as e:
+                self.errors += 1
+                self._errors.inc()
+                failed = True
+                if log_allowed("sink_error"):
+                    skipped = log_suppressed("sink_error")
+                    logger.error("{} sink failed, {} scans not written: {}{}", self.name, len(batch), e,
+                                 f" ({skipped} more errors not logged)" if skipped else "")
+            with self._written:
+                self.done += len(batch)
+                self._written.notify_all()
+            if failed and not stopping:
+                self._stop.wait(self.retry_delay)
+        try:
+            self.sink.close()
+        except Exception as e:
+            logger.debug(f"Error closing {self.name} sink: {e}")
+
+SINK_TYPES = {
+    "file": lambda options: FileSink(options["path"], options.get("fsync", False)),
+    "stdout": lambda options: StdoutSink(),
+    "socket": lambda options: SocketSink(options["path"], options.get("timeout", 1.0)),
+}
+
+def create_sink(options, metrics=None):
+    """Create a buffered sink from one output.sinks entry."""
+    kind = options.get("type")
+    if kind not in SINK_TYPES:
+        raise ValueError(f"Unknown output sink type: {kind}")
+    try:
+        sink = SINK_TYPES[kind](options)
+    except KeyError as e:
+        raise ValueError(f"Output sink {kind} needs {e}") from None
+    return BufferedSink(
+        sink,
+        format=options.get("format", "text"),
+        buffer_size=options.get("buffer_size", 1024),
+        batch_size=options.get("batch_size", 256),
+        flush_interval=options.get("flush_interval", 0.05),
+        retry_delay=options.get("retry_delay", 1.0),
+        metrics=metrics,
+    )
+
+class SinkFanout:
+    """Publishes every scan to each configured sink without waiting for any of them."""
+
+    def __init__(self, sinks=()):
+        """Initialize with a list of BufferedSinks."""
+        self.sinks = list(sinks)
+
+    @classmethod
+    def from_config(cls, sinks, metrics=None):
+        """Create the sinks of an output.sinks list, skipping invalid entries."""
+        created = []
+        for options in sinks or ():
+            try:
+                created.append(create_sink(options, metrics))
+            except (AttributeError, TypeError, ValueError) as e:
+                logger.error(f"Ignoring output sink {options!r}: {e}")
+        return cls(created)
+
+    def __len__(self):
+        return len(self.sinks)
+
+    def publish(self, text, port=None, result="typed", timestamp=None):
+        """Queue a scan for every sink."""
+        if timestamp is None:
+            timestamp = time.time()
+        for sink in self.sinks:
+            sink.publish(text, port, result, timestamp)
+
+    def flush(self, timeout=None):
+        """Wait until every sink has written what it was given."""
+        return all([sink.flush(timeout) for sink in self.sinks])
+
+    def close(self, timeout=2):
+        """Flush and close every sink."""
+        for sink in self.sinks:
+            sink.close(timeout)
+
+    def stats(self):
+        """Return {sink name: counters}."""
+        return {f"{i}:{sink.name}": sink.stats() for i, sink in enumerate(self.sinks)}
@@ -0,0 +1,26 @@
+"""
+Shared helpers for the QR2Key unit tests
+"""
+
+import os
+import unittest
+
+# Benchmarks assert wall-clock budgets, which shared CI machines cannot
+# promise, so they only run when QR2KEY_BENCHMARKS is set
+BENCHMARKS = bool(os.environ.get("QR2KEY_BENCHMARKS"))
+benchmark = unittest.skipUnless(BENCHMARKS, "benchmark; set QR2KEY_BENCHMARKS=1 to run it")
+
+class FakeClock:
+    """Manually advanced monotonic clock."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
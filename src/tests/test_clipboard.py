@@ -0,0 +1,146 @@
+"""
+Unit tests for QR2Key clipboard paste injection
+"""
+
+import unittest
+import sys
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from clipboard import ClipboardError, MemoryClipboard, PasteboardClipboard, create_clipboard
+from keyboard_mac import KeyboardController, Key, RecordingBackend
+
+class TestClipboard(unittest.TestCase):
+    """Test cases for the clipboard implementations."""
+
+    def test_memory_clipboard(self):
+        """Test the in-process clipboard stand-in."""
+        clipboard = MemoryClipboard("before")
+
+        self.assertEqual(clipboard.get_text(), "before")
+        clipboard.set_text("after")
+        self.assertEqual(clipboard.get_text(), "after")
+
+    def test_pasteboard_uses_pbcopy_and_pbpaste(self):
+        """Test that the macOS pasteboard goes through pbcopy/pbpaste as UTF-8."""
+        with patch('clipboard.subprocess.run') as mock_run:
+            mock_run.return_value = MagicMock(stdout="こんにちは".encode("utf-8"))
+            clipboard = PasteboardClipboard()
+
+            self.assertEqual(clipboard.get_text(), "こんにちは")
+            clipboard.set_text("テスト")
+
+        self.assertEqual(mock_run.call_args_list[0][0][0], ["pbpaste"])
+        self.assertEqual(mock_run.call_args_list[1][0][0], ["pbcopy"])
+        self.assertEqual(mock_run.call_args_list[1][1]["input"], "テスト".encode("utf-8"))
+
+    def test_pasteboard_failure_raises_clipboard_error(self):
+        """Test that helper failures surface as ClipboardError."""
+        logger.disable("clipboard")
+        try:
+            with patch('clipboard.subprocess.run', side_effect=FileNotFoundError("pbcopy")):
+                with self.assertRaises(ClipboardError):
+                    PasteboardClipboard().set_text("x")
+            with patch('clipboard.subprocess.run', side_effect=subprocess.TimeoutExpired("pbpaste", 1)):
+                with self.assertRaises(ClipboardError):
+                    PasteboardClipboard().get_text()
+        finally:
+            logger.enable("clipboard")
+
+    def test_create_clipboard(self):
+        """Test creating clipboards by name."""
+        self.assertIsInstance(create_clipboard("memory"), MemoryClipboard)
+        with self.assertRaises(ValueError):
+            create_clipboard("fax")
+
+class TestPasteInjection(unittest.TestCase):
+    """Test cases for paste mode in KeyboardController and process_qr_data()."""
+
+    def setUp(self):
+        import main
+        self.main = main
+        self.test_dir = tempfile.mkdtemp()
+        self.saved = (main.config, main.keyboard, main.clipboard)
+        logger.disable("config")
+
+        main.config = main.Config(os.path.join(self.test_dir, "config.json"))
+        main.config.set("keyboard", "type_delay", 0)
+        main.config.set("keyboard", "paste_threshold", 10)
+        main.config.set("keyboard", "paste_restore_delay", 0)
+        self.backend = RecordingBackend()
+        main.keyboard = KeyboardController(backend=self.backend)
+        main.clipboard = MemoryClipboard("user clipboard")
+
+    def tearDown(self):
+        self.main.config, self.main.keyboard, self.main.clipboard = self.saved
+        logger.enable("config")
+        shutil.rmtree(self.test_dir)
+
+    def test_paste_text_sends_chord_and_restores(self):
+        """Test that pasting sends Cmd+V and restores the previous clipboard text."""
+        clipboard = MemoryClipboard("previous")
+        keyboard = KeyboardController(backend=self.backend)
+
+        keyboard.paste_text("payload", clipboard, restore_delay=0)
+
+        events = [(kind, value) for _, kind, value in self.backend.events()]
+        self.assertEqual(events, [
+            (RecordingBackend.PRESS, Key.cmd),
+            (RecordingBackend.PRESS, 'v'),
+            (RecordingBackend.RELEASE, 'v'),
+            (RecordingBackend.RELEASE, Key.cmd),
+        ])
+        self.assertEqual(clipboard.get_text(), "previous")
+        self.assertEqual(clipboard.writes, 2)
+
+    def test_failed_restore_does_not_type_again(self):
+        """Test that a clipboard restore failing after Cmd+V does not inject the payload twice."""
+        clipboard = MemoryClipboard("user clipboard")
+        restore = MagicMock(side_effect=[None, ClipboardError("pasteboard busy")])
+        clipboard.set_text = restore
+        self.main.clipboard = clipboard
+        logger.disable("keyboard_mac")
+        try:
+            result = self.main.process_qr_data("X" * 500)
+        finally:
+            logger.enable("keyboard_mac")
+
+        self.assertEqual(result, "pasted")
+        self.assertEqual(self.backend.text(), "")
+        self.assertEqual(self.backend.count, 4)
+        self.assertEqual(restore.call_count, 2)
+
+    def test_large_payload_is_pasted(self):
+        """Test that process_qr_data() pastes payloads at or above the threshold."""
+        self.main.process_qr_data("X" * 500)
+
+        self.assertEqual(self.backend.text(), "")
+        self.assertEqual(self.backend.count, 4)
+        self.assertEqual(self.main.clipboard.get_text(), "user clipboard")
+
+    def test_small_payload_is_typed(self):
+        """Test that process_qr_data() types payloads below the threshold."""
+        self.main.process_qr_data("short")
+
+        self.assertEqual(self.backend.text(), "short")
+        self.assertEqual(self.main.clipboard.writes, 0)
+
+    def test_clipboard_failure_falls_back_to_typing(self):
+        """Test that a failing clipboard types the payload instead."""
+        self.main.clipboard = MagicMock()
+        self.main.clipboard.get_text.side_effect = ClipboardError("no pasteboard")
+        logger.disable("main")
+        try:
+            self.main.process_qr_data("0123456789ABC")
+        finally:
+            logger.enable("main")
+
+        self.assertEqual(self.backend.text(), "0123456789ABC")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,9 +8,12 @@ import os
 import json
 import tempfile
 import shutil
+import threading
+import time
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from config import Config, DEFAULT_CONFIG
+from loguru import logger
+from config import Config, ConfigSnapshot, DEFAULT_CONFIG
 
 class TestConfig(unittest.TestCase):
     """Test cases for the Config class."""
@@ -39,18 +42,85 @@ class TestConfig(unittest.TestCase):
         """Test loading an existing config file."""
         custom_config = {
             "serial": {
+                "port": "/dev/cu.usbserial-1140",
                 "baud_rate": 115200,
                 "timeout": 2,
-                "auto_detect": True
+                "auto_detect": True,
+                "monitor_ports": False,
+                "max_connections": 4,
+                "trace_dir": "traces",
+                "reconnect": {
+                    "initial_delay": 1,
+                    "max_delay": 10,
+                    "multiplier": 3.0,
+                    "jitter": 0,
+                    "keep_buffer_for": 1.0
+                },
+                "framing": {
+                    "mode": "length",
+                    "terminator": "\r\n",
+                    "idle_timeout": 0,
+                    "length_bytes": 4,
+                    "buffer_size": 4096
+                }
             },
             "keyboard": {
+                "backend": "null",
                 "type_delay": 0.1,
-                "press_enter_after": True
+                "type_rate": 100,
+                "burst_size": 2,
+                "max_burst": 2,
+                "press_enter_after": True,
+                "paste_threshold": 500,
+                "paste_restore_delay": 0.5,
+                "clipboard": "memory",
+                "queue_size": 32
+            },
+            "output": {
+                "keyboard": False,
+                "sinks": [{"type": "file", "path": "scans.log", "format": "json"}]
+            },
+            "gs1": {
+                "mode": "reject",
+                "bare_gtins": True
+            },
+            "transforms": {
+                "rules": [{"strip_prefix": "]Q1"}, {"match": "^\\d{13}$", "append_key": "enter"}]
+            },
+            "dedup": {
+                "ttl": 0.5,
+                "max_entries": 64,
+                "scope": "global"
+            },
+            "logging": {
+                "enqueue": False,
+                "payload": "hash",
+                "payload_chars": 8,
+                "rate_limits": {
+                    "scan": 5,
+                    "queue_full": 0,
+                    "read_error": 2,
+                    "sink_error": 5,
+                    "gs1_invalid": 3
+                }
+            },
+            "metrics": {
+                "http_port": 9464
+            },
+            "control": {
+                "socket": "~/.qr2key.sock"
+            },
+            "journal": {
+                "enabled": False,
+                "directory": "/var/lib/qr2key",
+                "commit_interval": 0.2,
+                "hash_buckets": 4096
             },
             "app": {
                 "start_minimized": True,
                 "auto_start": True,
-                "log_level": "DEBUG"
+                "log_level": "DEBUG",
+                "watch_config": False
             }
         }
         
@@ -61,6 +131,18 @@ class TestConfig(unittest.TestCase):
         
         self.assertEqual(config.get_all(), custom_config)
     
+    def test_load_partial_framing_section(self):
+        """Test that a partial serial.framing section is merged with the defaults."""
+        with open(self.config_path, 'w') as f:
+            json.dump({"serial": {"framing": {"mode": "idle"}}}, f)
+        
+        config = Config(self.config_path)
+        framing = config.get("serial", "framing")
+        
+        self.assertEqual(framing["mode"], "idle")
+        self.assertEqual(framing["terminator"], "auto")
+        self.assertEqual(framing["buffer_size"], 8192)
+    
     def test_get_config_value(self):
         """Test getting a config value."""
         config = Config(self.config_path)
@@ -84,5 +166,106 @@ class TestConfig(unittest.TestCase):
         
         self.assertFalse(config.set("nonexistent", "key", "value"))
 
+    def test_set_does_not_change_defaults(self):
+        """Test that changing a config value leaves DEFAULT_CONFIG untouched."""
+        config = Config(self.config_path)
+        
+        config.set("serial", "baud_rate", 115200)
+        config.get("serial", "framing")["mode"] = "idle"
+        
+        self.assertEqual(DEFAULT_CONFIG["serial"]["baud_rate"], 9600)
+        self.assertEqual(DEFAULT_CONFIG["serial"]["framing"]["mode"], "terminator")
+    
+    def test_defaults_cover_every_key_read(self):
+        """Test that keys read by the app exist in the defaults."""
+        config = Config(self.config_path)
+        
+        self.assertIsNone(config.get("serial", "port"))
+        self.assertTrue(config.get("serial", "monitor_ports"))
+
+class TestConfigSnapshot(unittest.TestCase):
+    """Test cases for the compiled ConfigSnapshot."""
+    
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("config")
+    
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("config")
+    
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.test_dir, "config.json")
+        self.config = Config(self.config_path)
+    
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+    
+    def write(self, keyboard):
+        """Write a config file with the given keyboard section."""
+        with open(self.config_path, 'w') as f:
+            json.dump({"keyboard": keyboard}, f)
+    
+    def test_snapshot_is_typed_and_read_only(self):
+        """Test that the snapshot compiles the effective values and cannot be changed."""
+        snapshot = self.config.snapshot
+        
+        self.assertIsInstance(snapshot, ConfigSnapshot)
+        self.assertEqual(snapshot.type_rate, 20.0)
+        self.assertIs(snapshot.press_enter_after, False)
+        self.assertFalse(hasattr(snapshot, "__dict__"))
+        with self.assertRaises(AttributeError):
+            snapshot.type_rate = 100
+    
+    def test_set_swaps_snapshot(self):
+        """Test that set() publishes a new snapshot and leaves the old one intact."""
+        before = self.config.snapshot
+        
+        self.assertTrue(self.config.set("keyboard", "type_rate", 250))
+        
+        self.assertEqual(self.config.snapshot.type_rate, 250.0)
+        self.assertEqual(self.config.snapshot.version, before.version + 1)
+        self.assertEqual(before.type_rate, 20.0)
+        self.assertFalse(self.config.set("keyboard", "type_rate", "fast"))
+        self.assertEqual(self.config.snapshot.type_rate, 250.0)
+    
+    def test_check_reload(self):
+        """Test that an edited file is reloaded once and a broken one is ignored."""
+        self.assertFalse(self.config.check_reload())
+        
+        self.write({"type_rate": 80, "paste_threshold": 300})
+        self.assertTrue(self.config.check_reload())
+        self.assertFalse(self.config.check_reload())
+        self.assertEqual(self.config.snapshot.type_rate, 80.0)
+        self.assertEqual(self.config.snapshot.paste_threshold, 300)
+        self.assertEqual(self.config.changed, ["keyboard.type_rate", "keyboard.paste_threshold"])
+        
+        with open(self.config_path, 'w') as f:
+            f.write("{not json")
+        self.assertFalse(self.config.check_reload())
+        self.assertEqual(self.config.snapshot.type_rate, 80.0)
+    
+    def test_reload_does_not_block_readers(self):
+        """Test that check_reload() swaps the snapshot while another thread keeps reading it."""
+        seen = set()
+        stop = threading.Event()
+        
+        def reader():
+            while not stop.is_set():
+                snapshot = self.config.snapshot
+                seen.add((snapshot.type_rate, snapshot.paste_threshold))
+        
+        thread = threading.Thread(target=reader)
+        thread.start()
+        time.sleep(0.05)
+        self.write({"type_rate": 80, "paste_threshold": 300})
+        self.assertTrue(self.config.check_reload())
+        time.sleep(0.02)
+        stop.set()
+        thread.join()
+        
+        self.assertEqual(seen, {(20.0, 0), (80.0, 300)})
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,232 @@
+"""
+Unit tests for QR2Key multi-port connection management
+"""
+
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+import serial
+from connection_manager import AsyncConnectionManager, ConnectionManager
+from reconnect import CONNECTED, LOST, RECONNECTING, ReconnectPolicy
+
+class ScanCollector:
+    """Collect scans from the manager and signal when enough have arrived."""
+
+    def __init__(self, expected):
+        self.expected = expected
+        self.scans = []
+        self.done = threading.Event()
+
+    def __call__(self, scan):
+        self.scans.append(scan)
+        if len(self.scans) >= self.expected:
+            self.done.set()
+
+@unittest.skipUnless(hasattr(os, "openpty"), "pty support required")
+class TestConnectionManager(unittest.TestCase):
+    """Test cases for the ConnectionManager class."""
+
+    @classmethod
+    def setUpClass(cls):
+        for module in ("connection_manager", "decoder", "reconnect", "core"):
+            logger.disable(module)
+
+    @classmethod
+    def tearDownClass(cls):
+        for module in ("connection_manager", "decoder", "reconnect", "core"):
+            logger.enable(module)
+
+    def setUp(self):
+        self.ptys = []
+        self.manager = None
+
+    def tearDown(self):
+        if self.manager is not None:
+            self.manager.stop()
+        for master, slave in self.ptys:
+            for fd in (master, slave):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    def make_manager(self, on_scan, **kwargs):
+        """Create the manager under test."""
+        return ConnectionManager(on_scan, **kwargs)
+
+    def open_pty(self):
+        """Open a pty pair, returning (master fd, slave device name)."""
+        master, slave = os.openpty()
+        self.ptys.append((master, slave))
+        return master, os.ttyname(slave)
+
+    def test_sixteen_ports_on_one_thread(self):
+        """Test that 16 ports are read concurrently and merged with port tags."""
+        ports = 16
+        per_port = 20
+        collector = ScanCollector(ports * per_port)
+        self.manager = self.make_manager(collector, max_connections=ports)
+
+        masters = {}
+        for _ in range(ports):
+            master, name = self.open_pty()
+            self.assertIsNotNone(self.manager.connect(name, timeout=0))
+            masters[name] = master
+        self.manager.start()
+
+        threads_before = threading.active_count()
+        for i in range(per_port):
+            for name, master in masters.items():
+                os.write(master, f"{name[-3:]}-{i}\r".encode())
+
+        self.assertTrue(collector.done.wait(5), f"only {len(collector.scans)} scans arrived")
+        self.assertEqual(threading.active_count(), threads_before)
+
+        seqs = [scan.seq for scan in collector.scans]
+        self.assertEqual(seqs, sorted(seqs))
+        times = [scan.received_at for scan in collector.scans]
+        self.assertEqual(times, sorted(times))
+
+        for name in masters:
+            texts = [scan.text for scan in collector.scans if scan.port == name]
+            self.assertEqual(texts, [f"{name[-3:]}-{i}" for i in range(per_port)])
+
+    def test_per_port_framing_state(self):
+        """Test that partial scans on different ports do not mix."""
+        collector = ScanCollector(2)
+        self.manager = self.make_manager(collector)
+        master_a, name_a = self.open_pty()
+        master_b, name_b = self.open_pty()
+        self.manager.connect(name_a, timeout=0)
+        self.manager.connect(name_b, timeout=0)
+        self.manager.start()
+
+        os.write(master_a, b"AAA")
+        os.write(master_b, b"BBB")
+        time.sleep(0.02)
+        os.write(master_b, b"bbb\r")
+        os.write(master_a, b"aaa\r")
+
+        self.assertTrue(collector.done.wait(2))
+        self.assertEqual({(s.port, s.text) for s in collector.scans},
+                         {(name_a, "AAAaaa"), (name_b, "BBBbbb")})
+
+    def test_max_connections(self):
+        """Test that ports beyond max_connections are refused."""
+        self.manager = self.make_manager(lambda scan: None, max_connections=1)
+        _, name_a = self.open_pty()
+        _, name_b = self.open_pty()
+
+        self.assertIsNotNone(self.manager.connect(name_a, timeout=0))
+        self.assertIsNone(self.manager.connect(name_b, timeout=0))
+        self.assertEqual(self.manager.ports, [name_a])
+
+    def test_stop_before_reader_thread_runs(self):
+        """Test that a stop() issued before the reader thread gets going is not undone by it."""
+        self.manager = ConnectionManager(lambda scan: None)
+        threads = []
+        start = threading.Thread.start
+        with patch.object(threading.Thread, 'start', lambda thread: threads.append(thread)):
+            self.manager.start()
+        self.manager._running = False
+
+        start(threads[0])
+        threads[0].join(1)
+
+        self.assertFalse(threads[0].is_alive())
+
+    def test_disconnect(self):
+        """Test that a disconnected port is closed and no longer read."""
+        self.manager = self.make_manager(lambda scan: None)
+        _, name = self.open_pty()
+        ser = self.manager.connect(name, timeout=0).serial
+        self.manager.start()
+
+        self.manager.disconnect(name)
+        time.sleep(0.05)
+
+        self.assertFalse(self.manager.is_connected(name))
+        self.assertFalse(ser.is_open)
+
+    def test_lost_port_reconnects_and_keeps_partial_scan(self):
+        """Test that a dropped scanner is reconnected with backoff and its half scan completed."""
+        first_master, first_name = self.open_pty()
+        second_master, second_name = self.open_pty()
+        attempts = []
+
+        def open_serial(port, baud_rate, timeout=None):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                return serial.Serial(first_name, baud_rate, timeout=timeout)
+            if len(attempts) < 4:
+                raise serial.SerialException("device not present")
+            return serial.Serial(second_name, baud_rate, timeout=timeout)
+
+        collector = ScanCollector(1)
+        changes = []
+        policy = ReconnectPolicy(initial_delay=0.02, multiplier=2, jitter=0)
+        self.manager = self.make_manager(collector, framing={"idle_timeout": 0}, policy=policy,
+                                         on_state_change=lambda *change: changes.append(change[1:]),
+                                         open_serial=open_serial)
+        self.manager.connect("scanner", timeout=0)
+        self.manager.start()
+
+        os.write(first_master, b"HALF-")
+        time.sleep(0.05)
+        os.close(first_master)
+        self.ptys[0] = (-1, self.ptys[0][1])
+
+        deadline = time.monotonic() + 2
+        while self.manager.port_states().get("scanner") != CONNECTED or len(attempts) < 4:
+            self.assertLess(time.monotonic(), deadline, f"not reconnected: {changes}")
+            time.sleep(0.01)
+
+        os.write(second_master, b"SCAN\r")
+        self.assertTrue(collector.done.wait(2))
+
+        self.assertEqual(collector.scans[0].text, "HALF-SCAN")
+        self.assertEqual(changes, [(CONNECTED, LOST), (LOST, RECONNECTING), (RECONNECTING, CONNECTED)])
+        self.assertGreaterEqual(attempts[3] - attempts[2], 0.08)
+        self.assertGreaterEqual(attempts[2] - attempts[1], 0.04)
+
+        stats = self.manager.stats()["scanner"]
+        self.assertEqual(stats["transitions"]["reconnecting->reconnecting"], 2)
+        self.assertEqual(stats["scans"], 1)
+        self.assertEqual(self.manager.metrics.snapshot()["reconnects_total"], 1)
+
+class TestAsyncConnectionManager(TestConnectionManager):
+    """Run the ConnectionManager tests against the event loop manager."""
+
+    def make_manager(self, on_scan, **kwargs):
+        """Create an AsyncConnectionManager with its own core."""
+        return AsyncConnectionManager(on_scan, **kwargs)
+
+    def test_reads_and_timers_share_one_thread(self):
+        """Test that scans, idle flushes and reconnects all run on the core's loop thread."""
+        threads = set()
+
+        def on_scan(scan):
+            threads.add(threading.current_thread().name)
+            collector(scan)
+
+        collector = ScanCollector(2)
+        self.manager = self.make_manager(on_scan, framing={"idle_timeout": 0.05})
+        master, name = self.open_pty()
+        self.manager.connect(name, timeout=0)
+        self.manager.start()
+
+        os.write(master, b"TERMINATED\r")
+        os.write(master, b"NO-SUFFIX")
+        self.assertTrue(collector.done.wait(2))
+
+        self.assertEqual([scan.text for scan in collector.scans], ["TERMINATED", "NO-SUFFIX"])
+        self.assertEqual(threads, {"qr2key-core"})
+
+if __name__ == '__main__':
+    unittest.main()
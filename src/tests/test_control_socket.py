@@ -0,0 +1,258 @@
+"""
+Unit tests and throughput benchmark for the QR2Key control socket
+"""
+
+import unittest
+import sys
+import os
+import json
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from config import Config
+from core import EventLoopCore
+from control_socket import LENGTH, ControlClient, ControlServer, encode_frame
+from keyboard_mac import KeyboardController, RecordingBackend
+from metrics import MetricsRegistry
+from pipeline import ScanPipeline
+from helpers import benchmark
+
+class TestControlServer(unittest.TestCase):
+    """Test cases for the ControlServer class."""
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("control_socket")
+        logger.disable("core")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("control_socket")
+        logger.enable("core")
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "control.sock")
+        self.core = EventLoopCore()
+        self.core.start()
+        self.submitted = []
+        self.server = None
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        if self.server is not None:
+            self.server.stop()
+        self.core.stop()
+        shutil.rmtree(self.test_dir)
+
+    def start(self, **kwargs):
+        """Start a server that records submitted payloads."""
+        kwargs.setdefault("commands", {"ECHO": lambda argument: argument,
+                                       "STATUS": lambda argument: {"submitted": len(self.submitted)},
+                                       "FAIL": lambda argument: 1 / 0})
+        self.server = ControlServer(self.path, self.core, kwargs.pop("submit", self.submit), **kwargs)
+        self.server.start()
+        return self.connect()
+
+    def connect(self):
+        """Connect a client that is closed after the test."""
+        client = ControlClient(self.path)
+        self.clients.append(client)
+        return client
+
+    def submit(self, text):
+        self.submitted.append(text)
+        return True
+
+    def test_commands(self):
+        """Test built-in and configured commands and error replies."""
+        client = self.start()
+
+        self.assertEqual(client.request("PING"), "OK")
+        self.assertEqual(client.request("ECHO", "ｽｷｬﾝ 1"), "ｽｷｬﾝ 1")
+        self.assertEqual(client.request("SUBMIT", "4901234567894"), "OK")
+        self.assertEqual(json.loads(client.request("STATUS")), {"submitted": 1})
+        self.assertEqual(client.request("FAIL"), "ERR division by zero")
+        self.assertEqual(client.request("REBOOT"), "ERR unknown command REBOOT")
+        self.assertEqual(client.request("SUBMIT"), "ERR empty payload")
+        self.assertEqual(client.request("SUBMIT", b"\xff\xfe"), "ERR argument is not valid UTF-8")
+        self.assertEqual(self.submitted, ["4901234567894"])
+
+    def test_dropped_submission(self):
+        """Test that a payload the pipeline rejects is reported."""
+        client = self.start(submit=lambda text: False)
+
+        self.assertEqual(client.request("SUBMIT", "A"), "DROPPED")
+        self.assertEqual(self.server.dropped, 1)
+
+    def test_split_and_pipelined_frames(self):
+        """Test requests split across writes and many requests in one write."""
+        client = self.start()
+        frame = encode_frame("SUBMIT split")
+        for byte in range(len(frame)):
+            client.socket.send(frame[byte:byte + 1])
+            time.sleep(0.001)
+
+        replies = client.submit_many([f"code-{i}" for i in range(500)], chunk=500)
+
+        self.assertEqual(client._reply(), "OK")
+        self.assertEqual(replies, ["OK"] * 500)
+        self.assertEqual(self.submitted, ["split"] + [f"code-{i}" for i in range(500)])
+
+    def test_oversized_request_closes_connection(self):
+        """Test that a frame over max_frame is refused and the connection closed."""
+        client = self.start(max_frame=16)
+        client.socket.sendall(LENGTH.pack(17) + b"x" * 17)
+
+        self.assertEqual(client._reply(), "ERR request of 17 bytes exceeds 16")
+        with self.assertRaises(ConnectionError):
+            client._reply()
+
+    def test_backpressure_instead_of_drops(self):
+        """Test that a full queue pauses the connection rather than dropping payloads."""
+        queue = []
+        lock = threading.Lock()
+
+        def submit(text):
+            with lock:
+                if len(queue) >= 8:
+                    return False
+                queue.append(text)
+                return True
+
+        def drain():
+            typed = 0
+            while typed < 200:
+                with lock:
+                    if queue:
+                        queue.pop(0)
+                        typed += 1
+                time.sleep(0.0005)
+
+        client = self.start(submit=submit, can_submit=lambda: len(queue) < 8)
+        worker = threading.Thread(target=drain)
+        worker.start()
+        replies = client.submit_many([f"code-{i}" for i in range(200)])
+        worker.join(5)
+
+        self.assertEqual(replies, ["OK"] * 200)
+        self.assertEqual(self.server.dropped, 0)
+
+    def test_socket_file(self):
+        """Test owner-only permissions from bind on, stale socket cleanup and refusing a live socket."""
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+        umask = os.umask(0o022)
+
+        try:
+            with patch('control_socket.os.chmod'):
+                self.start()
+        finally:
+            self.assertEqual(os.umask(umask), 0o022)
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        with self.assertRaises(OSError):
+            ControlServer(self.path, self.core, self.submit).start()
+        self.server.stop()
+        self.server = None
+        self.assertFalse(os.path.exists(self.path))
+
+class TestControlSocketThroughput(unittest.TestCase):
+    """Drive main's typing pipeline through the control socket."""
+
+    PAYLOADS = 10000
+
+    def setUp(self):
+        import main
+        self.main = main
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "control.sock")
+        for module in ("config", "main", "core", "control_socket", "keyboard_mac", "pipeline"):
+            logger.disable(module)
+        self.core = EventLoopCore()
+        self.core.start()
+        self.backend = RecordingBackend(capacity=self.PAYLOADS * 16)
+        config = Config(os.path.join(self.test_dir, "config.json"))
+        config.set("keyboard", "type_delay", 0)
+        metrics = MetricsRegistry()
+        pipeline = ScanPipeline(main.handle_scan, 64, metrics=metrics)
+        self.patches = [
+            patch.object(main, 'config', config),
+            patch.object(main, 'keyboard', KeyboardController(backend=self.backend)),
+            patch.object(main, 'clipboard', None),
+            patch.object(main, 'journal', None),
+            patch.object(main, 'metrics', metrics),
+            patch.object(main, 'scan_pipeline', pipeline),
+            patch.object(main, 'connection_manager', type("Ports", (), {"port_states": lambda self: {}})()),
+            patch.object(main, 'is_paused', False),
+        ]
+        for p in self.patches:
+            p.start()
+        pipeline.start()
+        self.server = ControlServer(self.path, self.core, main.submit_payload, main.pipeline_has_room, {
+            "PAUSE": main.control_pause, "RESUME": main.control_resume,
+            "STATUS": main.control_status, "METRICS": main.control_metrics})
+        self.server.start()
+        self.client = ControlClient(self.path)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        self.core.stop()
+        self.main.scan_pipeline.stop(2)
+        for p in reversed(self.patches):
+            p.stop()
+        for module in ("config", "main", "core", "control_socket", "keyboard_mac", "pipeline"):
+            logger.enable(module)
+        shutil.rmtree(self.test_dir)
+
+    def submit_all(self):
+        """Submit PAYLOADS payloads and wait until they are typed; returns (payloads, replies, seconds)."""
+        payloads = [f"4901234{i:06d}" for i in range(self.PAYLOADS)]
+
+        started = time.perf_counter()
+        replies = self.client.submit_many(payloads)
+        deadline = time.monotonic() + 10
+        while self.main.scan_pipeline.processed < self.PAYLOADS and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return payloads, replies, time.perf_counter() - started
+
+    def test_bulk_submission(self):
+        """Test that thousands of payloads reach the keyboard in order, none dropped."""
+        payloads, replies, _ = self.submit_all()
+
+        self.assertEqual(replies, ["OK"] * self.PAYLOADS)
+        self.assertEqual(self.backend.text(), "".join(payloads))
+
+    @benchmark
+    def test_bulk_submission_rate(self):
+        """Test that one connection types thousands of payloads per second."""
+        _, _, elapsed = self.submit_all()
+
+        self.assertGreater(self.PAYLOADS / elapsed, 2000)
+
+    def test_pause_status_and_metrics(self):
+        """Test pausing and resuming, the status document and the metrics text."""
+        self.assertEqual(self.client.request("PAUSE"), "OK")
+        self.assertEqual(self.client.request("SUBMIT", "while paused"), "OK")
+        status = json.loads(self.client.request("STATUS"))
+        self.assertEqual(self.client.request("RESUME"), "OK")
+
+        self.assertTrue(status["paused"])
+        self.assertEqual(status["ports"], {})
+        self.assertIn("depth", status["queue"])
+        self.assertFalse(self.main.is_paused)
+        self.assertIn("# TYPE qr2key_queue_depth gauge", self.client.request("METRICS"))
+
+if __name__ == '__main__':
+    unittest.main()
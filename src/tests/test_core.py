@@ -0,0 +1,101 @@
+"""
+Unit tests for the QR2Key event loop core
+"""
+
+import unittest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from core import EventLoopCore
+from dedup import DedupCache
+from pipeline import Scan
+
+class TestEventLoopCore(unittest.TestCase):
+    """Test cases for the EventLoopCore class."""
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("core")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("core")
+
+    def setUp(self):
+        self.core = EventLoopCore()
+        self.core.start()
+
+    def tearDown(self):
+        self.core.stop()
+
+    def test_calls_run_on_the_loop_thread_in_order(self):
+        """Test that calls from several threads run one at a time on the loop thread."""
+        calls = []
+
+        def record(i):
+            calls.append((i, threading.current_thread().name))
+
+        threads = [threading.Thread(target=lambda i=i: [self.core.call(record, (i, n)) for n in range(50)])
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.core.run(lambda: None)
+
+        self.assertEqual(len(calls), 200)
+        self.assertEqual({name for _, name in calls}, {"qr2key-core"})
+        for i in range(4):
+            self.assertEqual([n for (t, n), _ in calls if t == i], list(range(50)))
+
+    def test_run_returns_result_and_raises(self):
+        """Test that run() waits for the loop and passes results and exceptions back."""
+        self.assertEqual(self.core.run(threading.current_thread), self.core._thread)
+        with self.assertRaises(ZeroDivisionError):
+            self.core.run(lambda: 1 / 0)
+
+    def test_every_and_cancel(self):
+        """Test a repeating timer, and that an exception does not stop it."""
+        ticks = []
+
+        def tick():
+            ticks.append(time.monotonic())
+            if len(ticks) == 2:
+                raise RuntimeError("one bad tick")
+
+        timer = self.core.every(0.02, tick)
+        time.sleep(0.15)
+        timer.cancel()
+        count = len(ticks)
+        time.sleep(0.05)
+
+        self.assertGreaterEqual(count, 4)
+        self.assertEqual(len(ticks), count)
+        self.assertGreaterEqual(min(b - a for a, b in zip(ticks, ticks[1:])), 0.015)
+
+    def test_dedup_expiry_on_the_loop(self):
+        """Test that expiring the duplicate cache on the loop empties it while idle."""
+        cache = DedupCache(ttl=0.05)
+        self.core.run(cache.is_duplicate, Scan("A"))
+        self.core.every(0.02, cache.expire)
+
+        deadline = time.monotonic() + 1
+        while len(cache) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(len(cache), 0)
+
+    def test_stop(self):
+        """Test that stop() ends the loop thread and later calls are ignored."""
+        self.core.stop()
+
+        self.assertFalse(self.core.running)
+        self.core.call(self.fail, "called after stop")
+        self.assertEqual(self.core.run(lambda: 42), 42)
+
+if __name__ == '__main__':
+    unittest.main()
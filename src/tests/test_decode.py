@@ -5,9 +5,36 @@ Unit tests for QR2Key Shift_JIS decoding functionality
 import unittest
 import sys
 import os
+import timeit
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from main import decode_shift_jis
+from decoder import PortDecoder, StreamDecoder
+from loguru import logger
+from helpers import benchmark
+
+QR_MAX_BYTES = 7089
+BENCHMARK_SIZES = (10, 100, 1000, QR_MAX_BYTES)
+
+def make_payload(kind, size):
+    """Build a benchmark payload of roughly size bytes."""
+    if kind == "ascii":
+        unit, encoding = "0123456789ABCDEF", "ascii"
+    elif kind == "shift_jis":
+        unit, encoding = "こんにちは世界", "shift_jis"
+    elif kind == "utf-8":
+        unit, encoding = "こんにちは世界", "utf-8"
+    elif kind == "utf-8 after ascii":
+        return b"ID:" + make_payload("utf-8", size - 3)
+    else:
+        return (b'\xff\xfe\xfd\xfc' * (size // 4 + 1))[:size]
+    
+    text = unit * (size // len(unit.encode(encoding)) + 1)
+    data = text.encode(encoding)
+    while len(data) > size:
+        text = text[:-1]
+        data = text.encode(encoding)
+    return data
 
 class TestDecode(unittest.TestCase):
     """Test cases for the decode_shift_jis function."""
@@ -30,5 +57,129 @@ class TestDecode(unittest.TestCase):
         result = decode_shift_jis(invalid_bytes)
         self.assertEqual(result, "ff fe fd fc")
 
+    def test_ascii_fast_path(self):
+        """Test that plain ASCII is decoded as is."""
+        self.assertEqual(decode_shift_jis(b"4901234567894"), "4901234567894")
+
+class TestPortDecoder(unittest.TestCase):
+    """Test cases for the PortDecoder class."""
+    
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("decoder")
+    
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("decoder")
+    
+    def test_learns_and_locks_encoding(self):
+        """Test that the encoding is locked after learn_scans agreeing scans."""
+        decoder = PortDecoder(learn_scans=2)
+        sjis = "テスト".encode("shift_jis")
+        
+        self.assertEqual(decoder.decode(b"ascii only"), "ascii only")
+        self.assertFalse(decoder.locked)
+        self.assertEqual(decoder.decode(sjis), "テスト")
+        self.assertFalse(decoder.locked)
+        self.assertEqual(decoder.decode(sjis), "テスト")
+        self.assertTrue(decoder.locked)
+        self.assertEqual(decoder.encoding, "shift_jis")
+    
+    def test_locked_utf8_without_leading_e3(self):
+        """Test that a locked UTF-8 port decodes payloads the stateless sniff gets wrong."""
+        decoder = PortDecoder(learn_scans=1)
+        decoder.decode("こんにちは".encode("utf-8"))
+        
+        self.assertEqual(decoder.decode("é".encode("utf-8")), "é")
+        self.assertEqual(decode_shift_jis("é".encode("utf-8")), "ﾃｩ")
+        self.assertEqual(decoder.encoding, "utf-8")
+    
+    def test_locked_encoding_falls_back_and_relearns(self):
+        """Test that scans the locked encoding rejects are sniffed, and learning restarts."""
+        decoder = PortDecoder(learn_scans=1, relearn_after=2)
+        decoder.decode("テスト".encode("shift_jis"))
+        self.assertEqual(decoder.encoding, "shift_jis")
+        
+        utf8 = "テスト".encode("utf-8")
+        self.assertEqual(decoder.decode(utf8), "テスト")
+        self.assertTrue(decoder.locked)
+        self.assertEqual(decoder.decode(utf8), "テスト")
+        self.assertEqual(decoder.decode(utf8), "テスト")
+        self.assertEqual(decoder.encoding, "utf-8")
+    
+    def test_invalid_bytes_do_not_learn(self):
+        """Test that undecodable scans fall back to hex without locking."""
+        decoder = PortDecoder(learn_scans=1)
+        
+        self.assertEqual(decoder.decode(b'\xff\xfe'), "ff fe")
+        self.assertFalse(decoder.locked)
+    
+    def test_stream_decoder_across_chunks(self):
+        """Test that multi-byte characters split across chunks decode correctly."""
+        data = "こんにちは".encode("utf-8")
+        for encoding, payload in (("utf-8", data), ("shift_jis", "こんにちは".encode("shift_jis"))):
+            stream = StreamDecoder(encoding)
+            text = "".join(stream.feed(payload[i:i + 1]) for i in range(len(payload)))
+            text += stream.finish()
+            self.assertEqual(text, "こんにちは")
+    
+    def test_feed_requires_locked_encoding(self):
+        """Test that incremental feeding waits until an encoding is learned."""
+        decoder = PortDecoder(learn_scans=1)
+        payload = "日本".encode("shift_jis")
+        
+        self.assertIsNone(decoder.feed(payload[:1]))
+        decoder.decode(payload)
+        self.assertEqual(decoder.feed(payload[:1]), "")
+        self.assertEqual(decoder.feed(payload[1:]), "日本")
+
+class TestDecodeBenchmark(unittest.TestCase):
+    """Compare stateless decoding with a learned per-port decoder."""
+    
+    KINDS = ("ascii", "shift_jis", "utf-8", "utf-8 after ascii", "invalid")
+    
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("decoder")
+    
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("decoder")
+    
+    def learned_decoders(self):
+        """Yield (kind, payload, decoder) with each decoder warmed up on its kind."""
+        for kind in self.KINDS:
+            for size in BENCHMARK_SIZES:
+                payload = make_payload(kind, size)
+                decoder = PortDecoder(name=kind)
+                warmup = make_payload("utf-8", size) if kind == "utf-8 after ascii" else payload
+                for _ in range(decoder.learn_scans):
+                    decoder.decode(warmup)
+                yield kind, payload, decoder
+    
+    def time_per_call(self, func, payload):
+        """Return the best per-call time of func(payload) in microseconds."""
+        number = max(20, 20000 // (len(payload) // 100 + 1))
+        return min(timeit.repeat(lambda: func(payload), number=number, repeat=3)) / number * 1e6
+    
+    def test_learned_decoding_matches_stateless(self):
+        """Test that a learned decoder returns what stateless decoding does at every size."""
+        for kind, payload, decoder in self.learned_decoders():
+            with self.subTest(kind=kind, size=len(payload)):
+                if kind in ("utf-8", "utf-8 after ascii"):
+                    self.assertEqual(decoder.decode(payload), payload.decode("utf-8"))
+                else:
+                    self.assertEqual(decoder.decode(payload), decode_shift_jis(payload))
+    
+    @benchmark
+    def test_learned_decoding_is_not_slower(self):
+        """Test that a learned decoder is at least as fast as stateless decoding."""
+        for kind, payload, decoder in self.learned_decoders():
+            stateless = self.time_per_call(decode_shift_jis, payload)
+            learned = self.time_per_call(decoder.decode, payload)
+            with self.subTest(kind=kind, size=len(payload)):
+                self.assertLess(learned, stateless * 1.25 + 0.5,
+                                f"learned {learned:.2f} us, stateless {stateless:.2f} us")
+
 if __name__ == '__main__':
     unittest.main()
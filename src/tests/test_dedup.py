@@ -0,0 +1,180 @@
+"""
+Unit tests for QR2Key duplicate scan suppression
+"""
+
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from config import Config
+from dedup import DedupCache
+from keyboard_mac import KeyboardController, RecordingBackend
+from pipeline import Scan
+from helpers import FakeClock
+
+class TestDedupCache(unittest.TestCase):
+    """Test cases for the DedupCache class."""
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("dedup")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("dedup")
+
+    def setUp(self):
+        self.clock = FakeClock(100.0)
+
+    def scan(self, text, port="/dev/ttyUSB0"):
+        """Create a scan stamped with the fake clock."""
+        return Scan(text, port=port, received_at=self.clock.now, raw=text.encode())
+
+    def test_repeats_within_ttl_are_suppressed(self):
+        """Test that a burst of repeats is typed once and counted."""
+        cache = DedupCache(ttl=1.0, clock=self.clock)
+
+        results = []
+        for _ in range(3):
+            results.append(cache.is_duplicate(self.scan("4901234567894")))
+            self.clock.now += 0.3
+
+        self.assertEqual(results, [False, True, True])
+        self.assertEqual(cache.stats()["suppressed"], 2)
+        self.assertAlmostEqual(cache.stats()["last_suppressed_gap"], 0.6)
+
+    def test_suppressed_repeats_do_not_extend_the_window(self):
+        """Test that a code scanned just under ttl apart is typed every other time, not only once."""
+        cache = DedupCache(ttl=1.0, clock=self.clock)
+
+        results = []
+        for _ in range(6):
+            results.append(cache.is_duplicate(self.scan("4901234567894")))
+            self.clock.now += 0.8
+
+        self.assertEqual(results, [False, True, False, True, False, True])
+
+    def test_repeat_after_ttl_passes(self):
+        """Test that the same code is accepted again once the window has passed."""
+        cache = DedupCache(ttl=1.0, clock=self.clock)
+        cache.is_duplicate(self.scan("ABC"))
+
+        self.clock.now += 1.5
+
+        self.assertFalse(cache.is_duplicate(self.scan("ABC")))
+        self.assertEqual(len(cache), 1)
+
+    def test_scope(self):
+        """Test that port scope keeps scanners apart and global scope does not."""
+        per_port = DedupCache(scope="port", clock=self.clock)
+        shared = DedupCache(scope="global", clock=self.clock)
+
+        for cache in (per_port, shared):
+            cache.is_duplicate(self.scan("ABC", port="/dev/ttyUSB0"))
+
+        self.assertFalse(per_port.is_duplicate(self.scan("ABC", port="/dev/ttyUSB1")))
+        self.assertTrue(shared.is_duplicate(self.scan("ABC", port="/dev/ttyUSB1")))
+
+    def test_disabled(self):
+        """Test that a ttl of 0 lets every scan through."""
+        cache = DedupCache(ttl=0, clock=self.clock)
+
+        self.assertFalse(cache.is_duplicate(self.scan("ABC")))
+        self.assertFalse(cache.is_duplicate(self.scan("ABC")))
+        self.assertEqual(len(cache), 0)
+
+    def test_memory_is_bounded(self):
+        """Test that many distinct codes never grow the cache beyond max_entries."""
+        cache = DedupCache(ttl=3600, max_entries=100, clock=self.clock)
+
+        for i in range(10000):
+            cache.is_duplicate(self.scan(f"CODE-{i}"))
+            self.clock.now += 0.001
+
+        self.assertEqual(len(cache), 100)
+        self.assertEqual(cache.stats()["evicted"], 9900)
+        # The most recent codes are still suppressed, evicted ones are not
+        self.assertTrue(cache.is_duplicate(self.scan("CODE-9999")))
+        self.assertFalse(cache.is_duplicate(self.scan("CODE-0")))
+
+    def test_invalid_scope(self):
+        """Test that an unknown scope is rejected."""
+        with self.assertRaises(ValueError):
+            DedupCache(scope="room")
+
+    def test_reconfigure(self):
+        """Test that a smaller max_entries evicts the oldest codes and a new scope forgets all of them."""
+        cache = DedupCache(ttl=10, clock=self.clock)
+        for text in ("A", "B", "C"):
+            cache.is_duplicate(self.scan(text))
+
+        cache.reconfigure(5, 2, "port")
+        self.assertEqual((cache.ttl, len(cache), cache.stats()["evicted"]), (5, 2, 1))
+        self.assertFalse(cache.is_duplicate(self.scan("A")))
+
+        cache.reconfigure(5, 2, "global")
+        self.assertEqual(len(cache), 0)
+        with self.assertRaises(ValueError):
+            cache.reconfigure(5, 2, "room")
+        self.assertEqual(cache.scope, "global")
+
+class TestSubmitScan(unittest.TestCase):
+    """Test that main only queues scans that are not duplicates."""
+
+    def test_duplicates_are_not_queued(self):
+        """Test submit_scan with a dedup cache in front of the pipeline."""
+        import main
+        submitted = []
+
+        class FakePipeline:
+            def submit(self, scan):
+                submitted.append(scan.text)
+                return True
+
+        logger.disable("dedup")
+        try:
+            with patch.object(main, 'scan_pipeline', FakePipeline()), \
+                 patch.object(main, 'dedup', DedupCache()):
+                for text in ("A", "A", "B", "A"):
+                    main.submit_scan(Scan(text, port="/dev/ttyUSB0"))
+        finally:
+            logger.enable("dedup")
+
+        self.assertEqual(submitted, ["A", "B"])
+
+    def test_reload_applies_dedup_settings_and_lists_restart_keys(self):
+        """Test that config_reloaded() applies the duplicate settings and names the rest."""
+        import main
+        test_dir = tempfile.mkdtemp()
+        messages = []
+        sink = logger.add(lambda message: messages.append(message.record), level="INFO")
+        logger.disable("config")
+        try:
+            config = Config(os.path.join(test_dir, "config.json"))
+            cache = DedupCache()
+            with open(config.config_path, "w") as f:
+                json.dump({"dedup": {"ttl": 0.5, "max_entries": 8, "scope": "global"},
+                           "keyboard": {"queue_size": 16}}, f)
+            config.load_config()
+            with patch.object(main, 'config', config), patch.object(main, 'dedup', cache), \
+                 patch.object(main, 'keyboard', KeyboardController(backend=RecordingBackend())):
+                main.config_reloaded(config.snapshot)
+        finally:
+            logger.remove(sink)
+            logger.enable("config")
+            shutil.rmtree(test_dir)
+
+        self.assertEqual((cache.ttl, cache.max_entries, cache.scope), (0.5, 8, "global"))
+        warning = [record for record in messages if record["level"].name == "WARNING"]
+        self.assertEqual(len(warning), 1)
+        self.assertIn("restart to apply keyboard.queue_size", warning[0]["message"])
+        self.assertNotIn("dedup", warning[0]["message"])
+
+if __name__ == '__main__':
+    unittest.main()
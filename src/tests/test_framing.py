@@ -0,0 +1,115 @@
+"""
+Unit tests for QR2Key scan framing
+"""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from framing import FrameAssembler
+
+class TestFrameAssembler(unittest.TestCase):
+    """Test cases for the FrameAssembler class."""
+
+    def test_terminator_split_across_reads(self):
+        """Test that a scan split over several reads is emitted once complete."""
+        assembler = FrameAssembler()
+
+        self.assertEqual(assembler.feed(b"ABC", now=0), [])
+        self.assertEqual(assembler.feed(b"DEF", now=0.01), [])
+        self.assertEqual(assembler.feed(b"G\r", now=0.02), [b"ABCDEFG"])
+        self.assertEqual(assembler.pending, 0)
+
+    def test_terminator_glued_scans(self):
+        """Test that several scans in one read are separated, including CRLF."""
+        assembler = FrameAssembler()
+
+        frames = assembler.feed(b"ONE\r\nTWO\rTHREE\nFOU", now=0)
+
+        self.assertEqual(frames, [b"ONE", b"TWO", b"THREE"])
+        self.assertEqual(assembler.pending, 3)
+
+    def test_custom_terminator_across_wrap(self):
+        """Test a multi-byte terminator that straddles the ring buffer wrap point."""
+        assembler = FrameAssembler(terminator="<END>", buffer_size=16)
+
+        self.assertEqual(assembler.feed(b"0123456789<END>", now=0), [b"0123456789"])
+        self.assertEqual(assembler.feed(b"abcdefgh<E", now=0), [])
+        self.assertEqual(assembler.feed(b"ND>", now=0), [b"abcdefgh"])
+
+    def test_terminator_prefix_at_wrap_ignores_stale_bytes(self):
+        """Test that a partial terminator before the wrap point does not match bytes past the end."""
+        assembler = FrameAssembler(terminator=b"XYZ", buffer_size=8)
+
+        self.assertEqual(assembler.feed(b"YZXYZbb", now=0), [b"YZ"])
+        self.assertEqual(assembler.feed(b"XY", now=0), [])
+        self.assertEqual(assembler.pending, 4)
+        self.assertEqual(assembler.feed(b"Z", now=0), [b"bb"])
+        self.assertEqual(assembler.pending, 0)
+
+    def test_length_prefix(self):
+        """Test length-prefixed frames, including a header split across reads."""
+        assembler = FrameAssembler(mode="length", length_bytes=2)
+
+        self.assertEqual(assembler.feed(b"\x00", now=0), [])
+        self.assertEqual(assembler.feed(b"\x03ab", now=0), [])
+        self.assertEqual(assembler.feed(b"c\x00\x02\r\n", now=0), [b"abc", b"\r\n"])
+
+    def test_length_prefix_too_large_resynchronizes(self):
+        """Test that an impossible length prefix discards the buffer."""
+        assembler = FrameAssembler(mode="length", length_bytes=2, buffer_size=64)
+
+        self.assertEqual(assembler.feed(b"\xff\xffjunk", now=0), [])
+        self.assertEqual(assembler.pending, 0)
+
+    def test_idle_gap(self):
+        """Test that idle framing emits a scan only after the inter-byte gap."""
+        assembler = FrameAssembler(mode="idle", idle_timeout=0.05)
+
+        self.assertEqual(assembler.feed(b"AB\rC", now=1.0), [])
+        self.assertEqual(assembler.poll(now=1.02), [])
+        self.assertAlmostEqual(assembler.time_until_idle(now=1.02), 0.03)
+        self.assertEqual(assembler.poll(now=1.06), [b"AB\rC"])
+        self.assertIsNone(assembler.time_until_idle(now=1.06))
+
+    def test_idle_flushes_unterminated_scan(self):
+        """Test that terminator framing falls back to the idle gap."""
+        assembler = FrameAssembler(idle_timeout=0.1)
+
+        self.assertEqual(assembler.feed(b"NOSUFFIX", now=0), [])
+        self.assertEqual(assembler.poll(now=0.2), [b"NOSUFFIX"])
+
+    def test_overflow_emits_buffer(self):
+        """Test that a frame larger than the buffer is emitted rather than lost."""
+        assembler = FrameAssembler(buffer_size=8)
+
+        frames = assembler.feed(b"0123456789\r", now=0)
+
+        self.assertEqual(frames, [b"01234567", b"89"])
+
+    def test_single_buffer_reused(self):
+        """Test that the ring buffer is never reallocated while framing."""
+        assembler = FrameAssembler(buffer_size=32)
+        buffer = assembler._buffer
+
+        for i in range(100):
+            assembler.feed(f"SCAN-{i}\r".encode(), now=i)
+
+        self.assertIs(assembler._buffer, buffer)
+        self.assertEqual(len(buffer), 32)
+
+    def test_from_config(self):
+        """Test creating an assembler from a config section."""
+        assembler = FrameAssembler.from_config({"mode": "length", "length_bytes": 1})
+
+        self.assertEqual(assembler.mode, "length")
+        self.assertEqual(assembler.feed(b"\x02hi", now=0), [b"hi"])
+
+    def test_invalid_mode(self):
+        """Test that an unknown framing mode is rejected."""
+        with self.assertRaises(ValueError):
+            FrameAssembler(mode="magic")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+"""
+Unit tests and benchmark for QR2Key GS1 and GTIN parsing
+"""
+
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from config import Config
+from gs1 import AI_LENGTHS, AIS, GS, check_digit, parse_code
+from keyboard_mac import Key, KeyboardController, RecordingBackend
+from metrics import MetricsRegistry
+from transforms import TransformPipeline
+from helpers import benchmark
+
+GTIN = "04912345678904"
+SSCC = "34912345" + "000000001" + check_digit("34912345000000001")
+
+class TestParseCode(unittest.TestCase):
+    """Test cases for parse_code()."""
+
+    def test_check_digit(self):
+        """Test the mod 10 check digit on EAN-8, EAN-13 and GTIN-14 data."""
+        self.assertEqual(check_digit("1234567"), "0")
+        self.assertEqual(check_digit("490123456789"), "4")
+        self.assertEqual(check_digit(GTIN[:-1]), GTIN[-1])
+
+    def test_element_string(self):
+        """Test splitting fixed and variable length elements at FNC1."""
+        code = parse_code(f"]C101{GTIN}17251231" + f"10LOT-7{GS}21SN0001{GS}3103001250")
+
+        self.assertTrue(code.valid, code.errors)
+        self.assertEqual(code.kind, "gs1")
+        self.assertEqual(code.identifier, "]C1")
+        self.assertEqual(code.elements, {"01": GTIN, "17": "251231", "10": "LOT-7", "21": "SN0001",
+                                         "3103": "001250"})
+        self.assertEqual(parse_code(f"{GS}00{SSCC}").get("00"), SSCC)
+        self.assertEqual(parse_code(f"]d201{GTIN}{GS}10A").get("10"), "A")
+
+    def test_itip_check_digit(self):
+        """Test that an ITIP's check digit is the last digit of its GTIN, before the piece numbers."""
+        self.assertEqual(parse_code("]C18006040123451111180102").errors, [])
+        self.assertEqual(parse_code("]C18006040123451111190102").errors, ["(8006) ITIP: wrong check digit"])
+
+    def test_bracketed_form(self):
+        """Test the human-readable form with AIs in brackets, including brackets inside values."""
+        code = parse_code(f"(01){GTIN}(17)250100(10)ABC")
+
+        self.assertTrue(code.valid, code.errors)
+        self.assertEqual(list(code.elements), ["01", "17", "10"])
+
+        code = parse_code(f"(10)LOT(A)(01){GTIN}(21)(7)")
+        self.assertTrue(code.valid, code.errors)
+        self.assertEqual(code.elements, {"10": "LOT(A)", "01": GTIN, "21": "(7)"})
+        self.assertEqual(parse_code(f"(01){GTIN}(B)").errors, ["unparsed text at position 18"])
+
+    def test_dates(self):
+        """Test that dates must exist, with DD 00 for the end of the month and 29 February in leap years."""
+        for date, valid in (("251231", True), ("250200", True), ("240229", True), ("250229", False),
+                            ("310231", False), ("250431", False), ("251301", False), ("250001", False)):
+            with self.subTest(date=date):
+                self.assertEqual(parse_code(f"]C117{date}").valid, valid)
+
+    def test_gtins(self):
+        """Test EAN-8, UPC-A, JAN/EAN-13 and GTIN-14 numbers after ]E0, or bare when enabled."""
+        for text, kind in (("12345670", "ean8"), ("036000291452", "upca"), ("4901234567894", "ean13"),
+                           (GTIN, "gtin14")):
+            with self.subTest(text=text):
+                for code in (parse_code(f"]E0{text}"), parse_code(text, bare_gtins=True)):
+                    self.assertEqual(code.kind, kind)
+                    self.assertTrue(code.valid, code.errors)
+                    self.assertEqual(code.get("01"), text.zfill(14))
+                self.assertEqual(parse_code(f"]E0{text}").identifier, "]E0")
+                self.assertIsNone(parse_code(text))
+        self.assertEqual(parse_code("]E04901234567895").errors, ["ean13: wrong check digit"])
+
+    def test_invalid_elements(self):
+        """Test that check digits, lengths, characters, dates and AIs are validated."""
+        cases = {
+            f"]C101{GTIN[:-1]}5": "(01) GTIN: wrong check digit",
+            f"]C101{GTIN[:-2]}{GS}10A": "(01) GTIN: bad length or characters",
+            f"]C110{'A' * 21}": "(10) BATCH/LOT: bad length or characters",
+            "]C110ロット": "(10) BATCH/LOT: bad length or characters",
+            "]C117251301": "(17) USE BY: invalid date",
+            f"]C101{GTIN}2312": "unknown AI at position 16",
+            "(01)０４９１２３４５６７８９０４": "(01) GTIN: bad length or characters",
+            f"]C110A{GS}10B": "(10) BATCH/LOT: repeated with a different value",
+            "]C1": "no elements",
+        }
+        for text, error in cases.items():
+            with self.subTest(text=text):
+                code = parse_code(text)
+                self.assertFalse(code.valid)
+                self.assertIn(error, code.errors)
+
+    def test_other_payloads(self):
+        """Test that payloads that are not GS1 or GTIN codes are not parsed."""
+        for text in ("https://example.com/?a=1", "ORDER-1|42", "1234567890", "(03)1234-5678",
+                     "４９０１２３４５６７８９４", "]Q1AB", "ｽｷｬﾝ"):
+            with self.subTest(text=text):
+                self.assertIsNone(parse_code(text))
+
+    def test_ai_table(self):
+        """Test that every AI of a two-digit prefix has the same length."""
+        for ai in AIS:
+            self.assertEqual(AI_LENGTHS[ai[:2]], len(ai))
+
+class TestGS1Transforms(unittest.TestCase):
+    """Test the transform rules that read a scan's GS1 code."""
+
+    def test_format_and_conditions(self):
+        """Test rebuilding GS1 scans as fields while other scans pass through."""
+        pipeline = TransformPipeline([
+            {"valid": False, "prepend": "CHECK:", "stop": True},
+            {"gs1": "gs1", "ai": ["01", "17"], "format": "{01}{tab}{17}{tab}{10}{enter}", "stop": True},
+            {"gs1": ["ean13", "ean8"], "format": "JAN {01}"},
+            {"gs1": False, "append": "!"},
+        ])
+
+        def apply(text):
+            return pipeline.apply(text, parse_code(text, bare_gtins=True))
+
+        self.assertEqual(apply(f"]C101{GTIN}17251231{GS}10L1"),
+                         ((GTIN, Key.tab), ("251231", Key.tab), ("L1", Key.enter)))
+        self.assertEqual(apply(f"]C101{GTIN}17251231"), ((GTIN, Key.tab), ("251231", Key.tab), ("", Key.enter)))
+        self.assertEqual(apply("4901234567894"), (("JAN 04901234567894", None),))
+        self.assertEqual(apply("4901234567895"), (("CHECK:4901234567895", None),))
+        self.assertEqual(apply("hello"), (("hello!", None),))
+
+    def test_format_text_field(self):
+        """Test {text} and that scans without a parsed code are left unchanged."""
+        pipeline = TransformPipeline([{"match": "^]C1", "format": "{21} ({text})"}])
+
+        self.assertEqual(pipeline.apply("]C121SN1", parse_code("]C121SN1")), (("SN1 (]C121SN1)", None),))
+        self.assertEqual(pipeline.apply("]C121SN1"), (("]C121SN1", None),))
+
+    def test_invalid_rules(self):
+        """Test that unknown fields and AIs are rejected when the rules are compiled."""
+        for rule in ({"format": "{01}{lot}"}, {"format": ""}, {"ai": "05", "append": "x"}, {"ai": [], "stop": True}):
+            with self.subTest(rule=rule):
+                with self.assertRaisesRegex(ValueError, r"transforms\.rules\[0\]"):
+                    TransformPipeline([rule])
+
+class TestGS1Validation(unittest.TestCase):
+    """Test gs1.mode in process_qr_data()."""
+
+    def setUp(self):
+        import main
+        self.main = main
+        self.test_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.test_dir, "config.json")
+        self.saved = (main.config, main.keyboard, main.clipboard, main.metrics,
+                      main.chars_injected, main.scans_pasted, main.gs1_invalid)
+        for module in ("config", "main", "keyboard_mac"):
+            logger.disable(module)
+        self.backend = RecordingBackend()
+        main.keyboard = KeyboardController(backend=self.backend)
+        main.clipboard = None
+        main.metrics = MetricsRegistry()
+        main.register_scan_metrics()
+
+    def tearDown(self):
+        (self.main.config, self.main.keyboard, self.main.clipboard, self.main.metrics,
+         self.main.chars_injected, self.main.scans_pasted, self.main.gs1_invalid) = self.saved
+        for module in ("config", "main", "keyboard_mac"):
+            logger.enable(module)
+        shutil.rmtree(self.test_dir)
+
+    def load(self, mode, bare_gtins=True):
+        """Load a config with the given gs1.mode."""
+        with open(self.config_path, "w") as f:
+            json.dump({"keyboard": {"type_delay": 0}, "gs1": {"mode": mode, "bare_gtins": bare_gtins}}, f)
+        self.main.config = Config(self.config_path)
+
+    def test_reject(self):
+        """Test that invalid codes are not typed in reject mode."""
+        self.load("reject")
+        results = [self.main.process_qr_data(text) for text in ("4901234567895", "4901234567894", "hello")]
+
+        self.assertEqual(results, ["rejected", "typed", "typed"])
+        self.assertEqual(self.backend.text(), "4901234567894hello")
+        self.assertIn("qr2key_gs1_invalid_total 1", self.main.metrics.render_prometheus())
+
+    def test_flag_and_off(self):
+        """Test that flag mode types invalid codes and counts them, and off skips parsing."""
+        self.load("flag")
+        self.assertEqual(self.main.process_qr_data("4901234567895"), "typed")
+        self.load("off")
+        self.assertEqual(self.main.process_qr_data("4901234567895"), "typed")
+
+        self.assertEqual(self.backend.text(), "4901234567895" * 2)
+        self.assertIn("qr2key_gs1_invalid_total 1", self.main.metrics.render_prometheus())
+
+    def test_bare_digits_pass_by_default(self):
+        """Test that digits without a symbology identifier are typed unchecked unless bare_gtins is set."""
+        self.load("reject", bare_gtins=False)
+        results = [self.main.process_qr_data(text) for text in ("4901234567895", "]E04901234567895")]
+
+        self.assertEqual(results, ["typed", "rejected"])
+        self.assertEqual(self.backend.text(), "4901234567895")
+
+    def test_unknown_mode_keeps_previous_config(self):
+        """Test that a reload with an unknown mode keeps the mode in effect."""
+        self.load("reject")
+        with open(self.config_path, "w") as f:
+            json.dump({"gs1": {"mode": "strict"}}, f)
+
+        self.assertFalse(self.main.config.load_config())
+        self.assertEqual(self.main.config.snapshot.gs1_mode, "reject")
+
+class TestGS1Benchmark(unittest.TestCase):
+    """Measure parsing cost on a corpus of typical warehouse codes."""
+
+    CODES = 100000
+
+    def corpus(self):
+        """Return CODES GS1 element strings, JANs and other payloads, some of them invalid."""
+        codes = []
+        for i in range(self.CODES):
+            gtin = f"0490123{i % 1000000:06d}"
+            gtin += check_digit(gtin)
+            kind = i % 5
+            if kind == 0:
+                codes.append(f"]C101{gtin}17{26 + i % 3}{1 + i % 12:02d}28{GS}10LOT{i % 997}{GS}21{i:08d}")
+            elif kind == 1:
+                codes.append(f"]d201{gtin}3103{i % 1000000:06d}{GS}37{i % 50}")
+            elif kind == 2:
+                codes.append("]E0" + (gtin[1:] if i % 100 != 2 else gtin[1:-1] + str((int(gtin[-1]) + 1) % 10)))
+            elif kind == 3:
+                codes.append(f"(00){SSCC}(400)PO-{i}")
+            else:
+                codes.append(f"https://example.com/items/{i}")
+        return codes
+
+    def test_corpus(self):
+        """Test that the corpus parses into the expected numbers of codes and invalid codes."""
+        parsed = [code for code in map(parse_code, self.corpus()) if code is not None]
+        invalid = sum(1 for code in parsed if not code.valid)
+
+        self.assertEqual(len(parsed), self.CODES * 4 // 5)
+        self.assertEqual(invalid, self.CODES // 100)
+
+    @benchmark
+    def test_parse_cost(self):
+        """Test that parsing and validating costs microseconds per scan."""
+        codes = self.corpus()
+
+        started = time.perf_counter()
+        for text in codes:
+            parse_code(text)
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed / self.CODES, 0.0001)
+
+if __name__ == '__main__':
+    unittest.main()
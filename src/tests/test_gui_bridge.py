@@ -0,0 +1,140 @@
+"""
+Unit tests for the QR2Key GUI update bridge
+"""
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+from importlib.util import find_spec
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from gui_bridge import MAX_SCANS, UpdateCoalescer
+
+class TestUpdateCoalescer(unittest.TestCase):
+    """Test cases for the UpdateCoalescer class."""
+
+    def test_wakes_once_per_drain(self):
+        """Test that only the first post after a drain asks for a wake-up."""
+        updates = UpdateCoalescer()
+
+        self.assertTrue(updates.post_status("/dev/ttyUSB0"))
+        self.assertFalse(updates.post_scan("/dev/ttyUSB0", "A", "typed"))
+        self.assertFalse(updates.post_status("/dev/ttyUSB0 (lost)"))
+        update = updates.drain()
+
+        self.assertEqual(update.status, "/dev/ttyUSB0 (lost)")
+        self.assertEqual([(s.port, s.text, s.result) for s in update.scans], [("/dev/ttyUSB0", "A", "typed")])
+        self.assertEqual(update.dropped, 0)
+        self.assertFalse(updates.pending)
+        self.assertTrue(updates.post_scan(None, "B", "paused"))
+
+    def test_empty_drain(self):
+        """Test that a drain without posts changes nothing."""
+        update = UpdateCoalescer().drain()
+
+        self.assertIsNone(update.status)
+        self.assertEqual(update.scans, [])
+        self.assertEqual(update.dropped, 0)
+
+    def test_keeps_newest_scans(self):
+        """Test that a burst keeps the newest max_scans scans and counts the rest."""
+        updates = UpdateCoalescer(max_scans=10)
+        for i in range(25):
+            updates.post_scan("port", str(i), "typed", timestamp=i)
+
+        update = updates.drain()
+
+        self.assertEqual([s.text for s in update.scans], [str(i) for i in range(15, 25)])
+        self.assertEqual(update.dropped, 15)
+
+    def test_concurrent_posts(self):
+        """Test posts from several threads against a 20 Hz drain."""
+        updates = UpdateCoalescer()
+        stop = threading.Event()
+        seen = []
+
+        def drain():
+            while not stop.wait(0.05):
+                update = updates.drain()
+                seen.append(len(update.scans) + update.dropped)
+
+        def post(thread):
+            for i in range(5000):
+                updates.post_scan(f"port-{thread}", "4901234567894", "typed")
+
+        drainer = threading.Thread(target=drain)
+        drainer.start()
+        posters = [threading.Thread(target=post, args=(i,)) for i in range(4)]
+        for thread in posters:
+            thread.start()
+        for thread in posters:
+            thread.join()
+        stop.set()
+        drainer.join()
+        update = updates.drain()
+        seen.append(len(update.scans) + update.dropped)
+
+        self.assertEqual(sum(seen), 20000)
+        self.assertLessEqual(updates.wakeups, updates.drains)
+
+@unittest.skipUnless(find_spec("PyQt5") is not None, "PyQt5 required")
+class TestWindowRefresh(unittest.TestCase):
+    """Test that the window applies posted updates in coalesced refreshes."""
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        cls.app = QApplication.instance() or QApplication([])
+        logger.disable("gui")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("gui")
+
+    def setUp(self):
+        from config import Config
+        from gui import QR2KeyGUI
+        self.test_dir = tempfile.mkdtemp()
+        logger.disable("config")
+        self.window = QR2KeyGUI(Config(os.path.join(self.test_dir, "config.json")))
+        self.window.show()
+
+    def tearDown(self):
+        self.window.tray_icon.hide()
+        self.window.deleteLater()
+        logger.enable("config")
+        shutil.rmtree(self.test_dir)
+
+    def process_events(self, seconds):
+        """Run the Qt event loop for a while."""
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            self.app.processEvents()
+            time.sleep(0.005)
+
+    def test_background_posts_are_coalesced(self):
+        """Test that thousands of scans from a thread cause a handful of refreshes."""
+        def post():
+            for i in range(2000):
+                self.window.post_scan("/dev/ttyUSB0", f"code-{i}", "typed")
+            self.window.post_port_status("/dev/ttyUSB0")
+
+        thread = threading.Thread(target=post)
+        thread.start()
+        thread.join()
+        self.process_events(0.3)
+
+        self.assertEqual(self.window.scan_count, 2000)
+        self.assertEqual(self.window.scan_list.count(), MAX_SCANS)
+        self.assertTrue(self.window.scan_list.item(MAX_SCANS - 1).text().endswith("code-1999"))
+        self.assertEqual(self.window.port_label.text(), "Port: /dev/ttyUSB0")
+        self.assertLessEqual(self.window.updates.drains, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+Tests for the QR2Key headless command line
+"""
+
+import unittest
+import sys
+import os
+import io
+import json
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+
+import main
+from config import Config
+from keyboard_mac import Key, StdoutBackend
+from helpers import benchmark
+
+MAIN_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'main.py'))
+
+class TestCommandLine(unittest.TestCase):
+    """Test that command line options override the configuration file."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.test_dir, "config.json")
+        self.saved = main.config
+        logger.disable("config")
+
+    def tearDown(self):
+        main.config = self.saved
+        logger.enable("config")
+        shutil.rmtree(self.test_dir)
+
+    def test_options_survive_reload(self):
+        """Test that port, baud, framing and output options apply and survive a reload."""
+        with open(self.config_path, "w") as f:
+            json.dump({"serial": {"baud_rate": 115200, "framing": {"mode": "terminator", "idle_timeout": 0.3}},
+                       "keyboard": {"press_enter_after": False}}, f)
+        args = main.parse_args(["--headless", "--config", self.config_path, "--port", "/dev/ttyUSB3",
+                                "--framing", "idle", "--output", "stdout"])
+        main.config = Config(args.config)
+
+        main.apply_args(args)
+        main.config.load_config()
+
+        self.assertTrue(args.headless)
+        self.assertEqual(main.config.get("serial", "port"), "/dev/ttyUSB3")
+        self.assertFalse(main.config.get("serial", "auto_detect"))
+        self.assertEqual(main.config.get("serial", "baud_rate"), 115200)
+        self.assertEqual(main.config.get("serial", "framing")["mode"], "idle")
+        self.assertEqual(main.config.get("serial", "framing")["idle_timeout"], 0.3)
+        self.assertEqual(main.config.get("keyboard", "backend"), "stdout")
+        self.assertTrue(main.config.snapshot.press_enter_after)
+        self.assertEqual(main.config.snapshot.type_rate, 0)
+
+    def test_stdout_backend(self):
+        """Test that the stdout backend prints one scan per line."""
+        stream = io.StringIO()
+        backend = StdoutBackend(stream)
+        backend.type("4901234567894")
+        backend.press(Key.tab)
+        backend.press(Key.cmd)
+        backend.press(Key.enter)
+
+        self.assertEqual(stream.getvalue(), "4901234567894\t\n")
+
+@unittest.skipUnless(hasattr(os, "openpty") and hasattr(signal, "SIGHUP"), "pty and POSIX signals required")
+class TestHeadlessDaemon(unittest.TestCase):
+    """Run main.py --headless against a pty scanner."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.master, self.slave = os.openpty()
+        self.port = os.ttyname(self.slave)
+        self.config_path = os.path.join(self.test_dir, "config.json")
+        with open(self.config_path, "w") as f:
+            json.dump({"app": {"watch_config": False}, "journal": {"hash_buckets": 4096}}, f)
+        self.process = None
+        self.log = []
+
+    def tearDown(self):
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.kill()
+                self.process.wait()
+            self.collector.join(2)
+            self.process.stdout.close()
+            self.process.stderr.close()
+        os.close(self.master)
+        os.close(self.slave)
+        shutil.rmtree(self.test_dir)
+
+    def start(self, *args, headless=True, env=None):
+        """Start the daemon and collect its log lines in the background."""
+        self.process = subprocess.Popen(
+            [sys.executable, MAIN_PATH, *(["--headless"] if headless else []), "--config", self.config_path,
+             "--port", self.port, "--output", "stdout", *args],
+            cwd=self.test_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+        def collect():
+            for line in self.process.stderr:
+                self.log.append(line)
+
+        self.collector = threading.Thread(target=collect, daemon=True)
+        self.collector.start()
+
+    def wait_for_log(self, text, timeout=10):
+        """Wait until a log line contains text."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if any(text in line for line in self.log):
+                return
+            time.sleep(0.01)
+        self.fail(f"{text!r} not logged:\n{''.join(self.log)}")
+
+    def proc_stat(self):
+        """Return (CPU seconds, resident kB) of the daemon from /proc."""
+        with open(f"/proc/{self.process.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{self.process.pid}/status") as f:
+            rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        return cpu, rss
+
+    def test_scans_reload_and_shutdown(self):
+        """Test printing scans, SIGHUP reload and a clean SIGTERM shutdown."""
+        self.start()
+        self.wait_for_log("Running headless")
+        self.wait_for_log(f"Connected to {self.port}")
+
+        os.write(self.master, b"4901234567894\rABC-123\r")
+        self.assertEqual(self.process.stdout.readline(), "4901234567894\n")
+        self.assertEqual(self.process.stdout.readline(), "ABC-123\n")
+
+        self.process.send_signal(signal.SIGHUP)
+        self.wait_for_log("Configuration reloaded")
+
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(self.process.wait(10), 0)
+        self.wait_for_log("QR2Key exiting")
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "journal", "clean")))
+
+    def test_broken_pyqt_falls_back_to_headless(self):
+        """Test that a PyQt5 that is installed but fails to import leaves the daemon scanning headless."""
+        package = os.path.join(self.test_dir, "broken", "PyQt5")
+        os.makedirs(package)
+        with open(os.path.join(package, "__init__.py"), "w") as f:
+            f.write('raise ImportError("libGL.so.1: cannot open shared object file")\n')
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(package))
+
+        self.start(headless=False, env=env)
+        self.wait_for_log("Could not load the GUI")
+        self.wait_for_log(f"Connected to {self.port}")
+
+        os.write(self.master, b"4901234567894\r")
+        self.assertEqual(self.process.stdout.readline(), "4901234567894\n")
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(self.process.wait(10), 0)
+
+    @benchmark
+    @unittest.skipUnless(os.path.exists("/proc/self/stat"), "/proc required")
+    def test_idle_footprint(self):
+        """Test idle CPU and memory; an idle daemon should barely wake up."""
+        self.start()
+        self.wait_for_log(f"Connected to {self.port}")
+        time.sleep(0.5)
+
+        cpu_before, _ = self.proc_stat()
+        time.sleep(2)
+        cpu_after, rss = self.proc_stat()
+
+        idle_cpu = (cpu_after - cpu_before) / 2
+        self.assertLess(idle_cpu, 0.02, f"{idle_cpu * 100:.1f}% CPU while idle")
+        self.assertLess(rss, 64 * 1024, f"{rss / 1024:.1f} MB resident")
+
+if __name__ == '__main__':
+    unittest.main()
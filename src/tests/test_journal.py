@@ -0,0 +1,286 @@
+"""
+Unit tests and lookup benchmark for the QR2Key scan journal
+"""
+
+import unittest
+import sys
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from config import Config
+from dedup import DedupCache
+from keyboard_mac import KeyboardController, NullBackend
+from pipeline import Scan
+from journal import DATA_FILE, HASH_INDEX_FILE, TIME_INDEX_FILE, JournalError, ScanJournal
+from helpers import benchmark
+
+class TestScanJournal(unittest.TestCase):
+    """Test cases for the ScanJournal class."""
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("journal")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("journal")
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.directory = os.path.join(self.test_dir, "journal")
+        self.journal = None
+
+    def tearDown(self):
+        if self.journal is not None:
+            self.journal.close()
+        shutil.rmtree(self.test_dir)
+
+    def open(self, **kwargs):
+        """Open the journal under test with fsync off and small tables."""
+        kwargs.setdefault("hash_buckets", 64)
+        kwargs.setdefault("commit_interval", 0.01)
+        self.journal = ScanJournal(self.directory, fsync=False, **kwargs)
+        return self.journal
+
+    def reopen(self, **kwargs):
+        """Close and reopen the journal."""
+        self.journal.close()
+        return self.open(**kwargs)
+
+    def test_round_trip(self):
+        """Test that every field of a scan is read back."""
+        journal = self.open()
+        journal.append("ABC", "/dev/cu.usbserial-1", b"AB\x82C\r", "pasted", timestamp=100.5)
+        journal.append("DEF", timestamp=101.0)
+        self.assertTrue(journal.flush(2))
+
+        first, second = journal.between(0, 200)
+
+        self.assertEqual((first.text, first.port, first.raw, first.result, first.timestamp),
+                         ("ABC", "/dev/cu.usbserial-1", b"AB\x82C\r", "pasted", 100.5))
+        self.assertEqual((second.text, second.port, second.raw, second.result), ("DEF", None, b"", "typed"))
+        self.assertEqual(second.seq, first.seq + 1)
+        self.assertEqual(len(journal), 2)
+        with self.assertRaises(ValueError):
+            journal.append("X", result="lost")
+
+    def test_find_and_between(self):
+        """Test payload and time range lookups, including colliding buckets."""
+        journal = self.open(hash_buckets=4)
+        for i in range(200):
+            journal.append(f"code-{i % 10}", "port", result="typed", timestamp=1000 + i)
+        journal.flush(2)
+
+        found = journal.find("code-3")
+        self.assertEqual([r.timestamp for r in found], [1000 + i for i in range(193, -1, -10) if i % 10 == 3])
+        self.assertEqual(journal.find("missing"), [])
+
+        self.assertEqual([r.timestamp for r in journal.between(1050, 1052.5)], [1050, 1051, 1052])
+        self.assertEqual(journal.between(2000, 3000), [])
+
+    def test_time_index_stays_sorted(self):
+        """Test that a wall clock stepping back does not break range queries."""
+        journal = self.open()
+        for timestamp in (10.0, 12.0, 11.0, 13.0):
+            journal.append("A", timestamp=timestamp)
+        journal.flush(2)
+
+        self.assertEqual([r.timestamp for r in journal.between(0, 100)], [10.0, 12.0, 12.0, 13.0])
+
+    def test_group_commit(self):
+        """Test that a burst of scans is committed in a few groups."""
+        journal = self.open(commit_interval=0.05)
+        for i in range(500):
+            journal.append(f"scan-{i}")
+        journal.flush(2)
+
+        self.assertEqual(len(journal), 500)
+        self.assertLessEqual(journal.commits, 3)
+        self.assertEqual(journal.stats()["queued"], 0)
+
+    def test_appends_from_several_threads(self):
+        """Test that concurrent appends are all counted, so flush() waits for every one."""
+        journal = self.open()
+
+        def append(thread):
+            for i in range(1000):
+                journal.append(f"scan-{thread}-{i}")
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=append, args=(i,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertTrue(journal.flush(5))
+        self.assertEqual(len(journal), 4000)
+        self.assertEqual(journal.stats()["queued"], 0)
+
+    def test_files_are_owner_only(self):
+        """Test that the journal directory and files, which hold raw payloads, are private."""
+        self.open()
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.directory).st_mode), 0o700)
+        for name in os.listdir(self.directory):
+            with self.subTest(name=name):
+                self.assertEqual(stat.S_IMODE(os.stat(os.path.join(self.directory, name)).st_mode), 0o600)
+
+    def test_reopen_keeps_records(self):
+        """Test that records, lookups and sequence numbers survive a restart."""
+        journal = self.open()
+        journal.append("A", timestamp=1.0)
+        journal.append("B", timestamp=2.0)
+        journal = self.reopen()
+        journal.append("A", timestamp=3.0)
+        journal.flush(2)
+
+        self.assertEqual([r.timestamp for r in journal.find("A")], [3.0, 1.0])
+        self.assertEqual([r.seq for r in journal.between(0, 10)], [1, 2, 3])
+
+    def test_recovers_torn_record(self):
+        """Test that a record cut off by a crash is dropped on the next open."""
+        journal = self.open()
+        journal.append("A", timestamp=1.0)
+        journal.append("B", timestamp=2.0)
+        journal.close()
+        self.journal = None
+        path = os.path.join(self.directory, DATA_FILE)
+        size = os.path.getsize(path)
+        os.truncate(path, size - 3)
+
+        journal = self.open()
+
+        self.assertEqual([r.text for r in journal.between(0, 10)], ["A"])
+        self.assertEqual(journal.find("B"), [])
+        journal.append("C", timestamp=3.0)
+        journal.flush(2)
+        self.assertEqual([r.text for r in journal.between(0, 10)], ["A", "C"])
+
+    def test_rebuilds_missing_index_entries(self):
+        """Test that records on disk without index entries are indexed on open."""
+        journal = self.open()
+        for i in range(5):
+            journal.append(f"code-{i}", timestamp=float(i))
+        journal.close()
+        self.journal = None
+        # As if the app stopped after the data was written but before indexing
+        os.truncate(os.path.join(self.directory, TIME_INDEX_FILE), 2 * 16)
+        os.truncate(os.path.join(self.directory, HASH_INDEX_FILE), 3 * 24 + 5)
+        os.remove(os.path.join(self.directory, "clean"))
+
+        journal = self.open()
+
+        self.assertEqual(len(journal), 5)
+        self.assertEqual([r.text for r in journal.between(0, 10)], [f"code-{i}" for i in range(5)])
+        self.assertEqual([r.timestamp for r in journal.find("code-4")], [4.0])
+        self.assertEqual([r.timestamp for r in journal.find("code-0")], [0.0])
+
+    def test_not_a_journal(self):
+        """Test that other files are rejected."""
+        os.makedirs(self.directory)
+        with open(os.path.join(self.directory, DATA_FILE), "wb") as f:
+            f.write(b"hello")
+
+        with self.assertRaises(JournalError):
+            ScanJournal(self.directory)
+
+class TestMainJournal(unittest.TestCase):
+    """Test that main records what happened to every scan."""
+
+    def test_results_are_journaled(self):
+        """Test typed, paused, duplicate and dropped scans."""
+        import main
+        test_dir = tempfile.mkdtemp()
+        accepted = iter((True, False))
+
+        class FakePipeline:
+            def submit(self, scan):
+                return next(accepted)
+
+        for module in ("journal", "config", "dedup"):
+            logger.disable(module)
+        journal = ScanJournal(os.path.join(test_dir, "journal"), hash_buckets=64, fsync=False)
+        try:
+            with patch.object(main, 'journal', journal), \
+                 patch.object(main, 'config', Config(os.path.join(test_dir, "config.json"))), \
+                 patch.object(main, 'keyboard', KeyboardController(backend=NullBackend())), \
+                 patch.object(main, 'clipboard', None), \
+                 patch.object(main, 'scan_pipeline', FakePipeline()), \
+                 patch.object(main, 'dedup', DedupCache()):
+                main.config.set("keyboard", "type_delay", 0)
+                main.handle_scan(Scan("A", port="/dev/ttyUSB0", raw=b"A\r"))
+                with patch.object(main, 'is_paused', True):
+                    main.handle_scan(Scan("B", port="/dev/ttyUSB0"))
+                main.submit_scan(Scan("C", port="/dev/ttyUSB0"))
+                main.submit_scan(Scan("C", port="/dev/ttyUSB0"))
+                main.submit_scan(Scan("D", port="/dev/ttyUSB0"))
+            journal.flush(2)
+            records = journal.between(0, time.time() + 1)
+        finally:
+            journal.close()
+            shutil.rmtree(test_dir)
+            for module in ("journal", "config", "dedup"):
+                logger.enable(module)
+
+        self.assertEqual([(r.text, r.result) for r in records],
+                         [("A", "typed"), ("B", "paused"), ("C", "duplicate"), ("D", "dropped")])
+        self.assertEqual(records[0].raw, b"A\r")
+
+@benchmark
+class TestJournalBenchmark(unittest.TestCase):
+    """Measure lookups over a journal of 200,000 scans."""
+
+    RECORDS = 200000
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("journal")
+        cls.test_dir = tempfile.mkdtemp()
+        cls.journal = ScanJournal(os.path.join(cls.test_dir, "journal"), fsync=False, max_batch=8192)
+        for i in range(cls.RECORDS):
+            cls.journal.append(f"4901234{i % 50000:06d}", "/dev/cu.usbserial-1", result="typed",
+                               timestamp=1_700_000_000 + i * 0.1)
+        cls.journal.flush(60)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.journal.close()
+        shutil.rmtree(cls.test_dir)
+        logger.enable("journal")
+
+    def best_of(self, function, runs=5):
+        """Return the result and the fastest of several runs of function."""
+        best = float("inf")
+        for _ in range(runs):
+            started = time.perf_counter()
+            result = function()
+            best = min(best, time.perf_counter() - started)
+        return result, best
+
+    def test_lookups(self):
+        """Test that payload and time range queries take milliseconds."""
+        self.assertEqual(len(self.journal), self.RECORDS)
+
+        found, find_time = self.best_of(lambda: self.journal.find("4901234012345"))
+        start = 1_700_000_000 + 100000 * 0.1
+        scans, range_time = self.best_of(lambda: self.journal.between(start, start + 9.95))
+
+        self.assertEqual(len(found), 4)
+        self.assertEqual(len(scans), 100)
+        self.assertLess(find_time, 0.005, f"find took {find_time * 1000:.3f} ms")
+        self.assertLess(range_time, 0.005, f"between took {range_time * 1000:.3f} ms")
+
+if __name__ == '__main__':
+    unittest.main()
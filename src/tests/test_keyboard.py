@@ -5,10 +5,31 @@ Unit tests for QR2Key keyboard functionality
 import unittest
 import sys
 import os
+import shutil
+import tempfile
 from unittest.mock import MagicMock, patch
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from keyboard_mac import KeyboardController
+from loguru import logger
+from keyboard_mac import KeyboardBackend, KeyboardController, NullBackend, RecordingBackend, Key, create_backend
+
+class TypingClock:
+    """Monotonic clock stand-in whose sleep() advances time instantly."""
+    
+    def __init__(self, type_cost=0.0):
+        self.now = 100.0
+        self.type_cost = type_cost
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+    
+    def type(self, text):
+        self.now += self.type_cost * len(text)
 
 class TestKeyboard(unittest.TestCase):
     """Test cases for the KeyboardController class."""
@@ -75,5 +96,176 @@ class TestKeyboard(unittest.TestCase):
             for call in mock_sleep.call_args_list:
                 self.assertEqual(call[0][0], test_delay)
 
+    def make_paced_keyboard(self, mock_controller_class, clock, **kwargs):
+        """Create a keyboard whose controller advances the fake clock when typing."""
+        mock_controller = MagicMock()
+        mock_controller.type.side_effect = clock.type
+        mock_controller_class.return_value = mock_controller
+        return KeyboardController(**kwargs), mock_controller
+    
+    def test_type_paced_holds_rate_without_trailing_sleep(self):
+        """Test that paced typing holds the target rate and skips the final sleep."""
+        clock = TypingClock()
+        with patch('keyboard_mac.Controller') as mock_controller_class, \
+             patch('keyboard_mac.time', clock):
+            keyboard, mock_controller = self.make_paced_keyboard(mock_controller_class, clock)
+            
+            stats = keyboard.type_paced("Hello", rate=10)
+        
+        self.assertEqual([c[0][0] for c in mock_controller.type.call_args_list], list("Hello"))
+        self.assertEqual(len(clock.sleeps), 4)
+        self.assertAlmostEqual(stats["elapsed"], 0.4)
+        self.assertEqual(stats["chars"], 5)
+        self.assertEqual(stats["jitter"], 0.0)
+    
+    def test_type_paced_deadlines_absorb_injection_time(self):
+        """Test that time spent injecting is deducted from the following sleep."""
+        clock = TypingClock(type_cost=0.02)
+        with patch('keyboard_mac.Controller') as mock_controller_class, \
+             patch('keyboard_mac.time', clock):
+            keyboard, _ = self.make_paced_keyboard(mock_controller_class, clock)
+            
+            stats = keyboard.type_paced("x" * 100, rate=20)
+        
+        for delay in clock.sleeps:
+            self.assertAlmostEqual(delay, 0.03)
+        self.assertAlmostEqual(stats["elapsed"], 99 * 0.05 + 0.02)
+        self.assertAlmostEqual(stats["rate"], 100 / stats["elapsed"])
+    
+    def test_type_paced_bursts(self):
+        """Test that characters are sent in bursts of burst_size."""
+        clock = TypingClock()
+        with patch('keyboard_mac.Controller') as mock_controller_class, \
+             patch('keyboard_mac.time', clock):
+            keyboard, mock_controller = self.make_paced_keyboard(mock_controller_class, clock, burst_size=4)
+            
+            stats = keyboard.type_paced("abcdefghij", rate=100)
+        
+        chunks = [c[0][0] for c in mock_controller.type.call_args_list]
+        self.assertEqual(chunks, ["abcd", "efgh", "ij"])
+        self.assertEqual(stats["bursts"], 3)
+        self.assertAlmostEqual(sum(clock.sleeps), 0.08)
+    
+    def test_type_paced_burst_grows_when_ahead(self):
+        """Test that the burst size grows while injection keeps well ahead of schedule."""
+        clock = TypingClock(type_cost=0.0001)
+        with patch('keyboard_mac.Controller') as mock_controller_class, \
+             patch('keyboard_mac.time', clock):
+            keyboard, _ = self.make_paced_keyboard(mock_controller_class, clock, max_burst=6)
+            
+            stats = keyboard.type_paced("x" * 100, rate=20)
+        
+        self.assertEqual(stats["burst_size"], 6)
+        self.assertEqual(keyboard.burst_size, 6)
+        self.assertAlmostEqual(stats["rate"], 20, delta=1)
+    
+    def test_type_paced_burst_shrinks_when_behind(self):
+        """Test that the burst size halves when injection overruns its slot."""
+        clock = TypingClock(type_cost=0.1)
+        with patch('keyboard_mac.Controller') as mock_controller_class, \
+             patch('keyboard_mac.time', clock):
+            keyboard, _ = self.make_paced_keyboard(mock_controller_class, clock, burst_size=8, max_burst=8)
+            
+            stats = keyboard.type_paced("x" * 40, rate=20)
+        
+        self.assertEqual(stats["burst_size"], 1)
+        self.assertEqual(clock.sleeps, [])
+
+class TestKeyboardBackends(unittest.TestCase):
+    """Test cases for the keystroke backends."""
+    
+    def test_null_backend_counts_output(self):
+        """Test that the null backend discards output but counts it."""
+        backend = NullBackend()
+        keyboard = KeyboardController(backend=backend)
+        
+        keyboard.type_string("12345")
+        keyboard.press_enter()
+        
+        self.assertEqual(backend.chars, 5)
+        self.assertEqual(backend.keys, 1)
+    
+    def test_backend_must_implement_every_method(self):
+        """Test that a backend missing one of type(), press() or release() cannot be created."""
+        class TypeOnlyBackend(KeyboardBackend):
+            def type(self, text):
+                pass
+        
+        with self.assertRaises(TypeError):
+            TypeOnlyBackend()
+    
+    def test_recording_backend_records_events(self):
+        """Test that the recording backend timestamps every key event."""
+        ticks = iter(range(100))
+        backend = RecordingBackend(capacity=10, clock=lambda: float(next(ticks)))
+        keyboard = KeyboardController(backend=backend)
+        
+        keyboard.type_string("ab")
+        keyboard.press_enter()
+        
+        events = list(backend.events())
+        self.assertEqual(events, [
+            (0.0, RecordingBackend.TYPE, "a"),
+            (0.0, RecordingBackend.TYPE, "b"),
+            (1.0, RecordingBackend.PRESS, Key.enter),
+            (2.0, RecordingBackend.RELEASE, Key.enter),
+        ])
+        self.assertEqual(backend.text(), "ab")
+    
+    def test_recording_backend_is_preallocated(self):
+        """Test that recording past capacity drops events instead of growing."""
+        backend = RecordingBackend(capacity=4)
+        timestamps = backend.timestamps
+        
+        backend.type("abcdef")
+        
+        self.assertIs(backend.timestamps, timestamps)
+        self.assertEqual(len(timestamps), 4)
+        self.assertEqual(backend.count, 4)
+        self.assertEqual(backend.dropped, 2)
+        self.assertEqual(backend.text(), "abcd")
+    
+    def test_create_backend(self):
+        """Test creating backends by name."""
+        self.assertIsInstance(create_backend("null"), NullBackend)
+        self.assertIsInstance(create_backend("recording"), RecordingBackend)
+        with self.assertRaises(ValueError):
+            create_backend("carrier-pigeon")
+
+class TestProcessThroughput(unittest.TestCase):
+    """Run many scans through process_qr_data() against the recording backend."""
+    
+    SCANS = 5000
+    
+    def setUp(self):
+        import main
+        self.main = main
+        self.test_dir = tempfile.mkdtemp()
+        self.saved = (main.config, main.keyboard)
+        logger.disable("main")
+        logger.disable("config")
+        
+        main.config = main.Config(os.path.join(self.test_dir, "config.json"))
+        main.config.set("keyboard", "type_delay", 0)
+        main.config.set("keyboard", "press_enter_after", True)
+        self.backend = RecordingBackend(capacity=self.SCANS * 20)
+        main.keyboard = KeyboardController(backend=self.backend)
+    
+    def tearDown(self):
+        self.main.config, self.main.keyboard = self.saved
+        logger.enable("main")
+        logger.enable("config")
+        shutil.rmtree(self.test_dir)
+    
+    def test_process_qr_data_throughput(self):
+        """Test that thousands of scans reach the backend without losing keystrokes."""
+        payload = "4901234567894"
+        
+        for _ in range(self.SCANS):
+            self.main.process_qr_data(payload)
+        
+        self.assertEqual(self.backend.dropped, 0)
+        self.assertEqual(self.backend.count, self.SCANS * (len(payload) + 2))
+
 if __name__ == '__main__':
     unittest.main()
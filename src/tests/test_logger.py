@@ -0,0 +1,185 @@
+"""
+Unit tests and scan-path latency test for QR2Key logging
+"""
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+
+import logger as log_module
+import main
+from config import Config
+from connection_manager import ConnectionManager
+from keyboard_mac import KeyboardController, NullBackend
+from logger import PayloadFormatter, RateLimiter, setup_logger
+from pipeline import Scan, ScanPipeline
+from helpers import FakeClock, benchmark, percentile
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for the RateLimiter class."""
+
+    def test_burst_then_steady_rate(self):
+        """Test that a kind may log a burst of rate messages, then rate per second."""
+        clock = FakeClock(10.0)
+        limiter = RateLimiter({"scan": 5}, clock=clock)
+
+        self.assertEqual(sum(limiter.allow("scan") for _ in range(20)), 5)
+        self.assertEqual(limiter.take_suppressed("scan"), 15)
+        self.assertEqual(limiter.take_suppressed("scan"), 0)
+
+        clock.now += 0.4
+        self.assertEqual(sum(limiter.allow("scan") for _ in range(20)), 2)
+
+    def test_unlimited_and_silenced_kinds(self):
+        """Test that kinds without a limit always log and a limit of 0 never does."""
+        limiter = RateLimiter({"queue_full": 0})
+
+        self.assertTrue(all(limiter.allow("other") for _ in range(100)))
+        self.assertFalse(limiter.allow("queue_full"))
+        self.assertEqual(limiter.suppressed["queue_full"], 1)
+
+class TestSuppressedCounts(unittest.TestCase):
+    """Test that rate-limited messages report how many were skipped."""
+
+    def setUp(self):
+        self.clock = FakeClock(10.0)
+        self.messages = []
+        limiter = RateLimiter({"queue_full": 1, "read_error": 1}, clock=self.clock)
+        patcher = patch.object(log_module, "_limiter", limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        sink = logger.add(lambda message: self.messages.append(message.record["message"]), level="ERROR")
+        self.addCleanup(logger.remove, sink)
+
+    def test_queue_full(self):
+        """Test that the next queue full message counts the drops not logged."""
+        pipeline = ScanPipeline(lambda scan: None, maxsize=1)
+        for _ in range(4):
+            pipeline.submit(Scan("A", port="scanner"))
+        self.clock.now += 1
+        pipeline.submit(Scan("A", port="scanner"))
+
+        self.assertEqual(self.messages, [
+            "Scan queue full (1), dropping scan from scanner (1 dropped so far)",
+            "Scan queue full (1), dropping scan from scanner (4 dropped so far) (2 more not logged)",
+        ])
+
+    def test_read_error(self):
+        """Test that the next read error message counts the errors not logged."""
+        manager = ConnectionManager(lambda scan: None)
+        conn = SimpleNamespace(port="scanner", serial=None, state=SimpleNamespace(state=None))
+        for _ in range(3):
+            manager._lose(conn, OSError("device gone"))
+        self.clock.now += 1
+        manager._lose(conn, OSError("device gone"))
+
+        self.assertEqual(self.messages, [
+            "Error reading scanner: device gone",
+            "Error reading scanner: device gone (2 more errors not logged)",
+        ])
+
+class TestPayloadFormatter(unittest.TestCase):
+    """Test cases for the PayloadFormatter class."""
+
+    def test_modes(self):
+        """Test full (the default), truncated, hashed and hidden payloads."""
+        text = "https://example.com/" + "x" * 100
+
+        self.assertEqual(PayloadFormatter("full")(text), text)
+        self.assertEqual(PayloadFormatter()(text), text)
+        self.assertEqual(PayloadFormatter("truncate", 8)(text), "https://... <120 chars>")
+        self.assertEqual(PayloadFormatter("truncate", 8)("short"), "short")
+        self.assertEqual(PayloadFormatter("none")(text), "<120 chars>")
+
+        hashed = PayloadFormatter("hash")(text)
+        self.assertRegex(hashed, r"^<120 chars #[0-9a-f]{12}>$")
+        self.assertEqual(hashed, PayloadFormatter("hash")(text))
+        self.assertNotIn("example", hashed)
+
+        with self.assertRaises(ValueError):
+            PayloadFormatter("everything")
+
+@benchmark
+class TestScanPathLogging(unittest.TestCase):
+    """Measure what logging adds to process_qr_data() at 100 scans/s."""
+
+    SCANS = 100
+    INTERVAL = 0.01
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.saved = (main.config, main.keyboard, main.clipboard, main.metrics)
+        logger.disable("config")
+        main.config = Config(os.path.join(self.test_dir, "config.json"))
+        logger.enable("config")
+        main.config.set("keyboard", "type_delay", 0)
+        main.config.set("keyboard", "press_enter_after", True)
+        main.keyboard = KeyboardController(backend=NullBackend())
+        main.clipboard = None
+        main.metrics = None
+        main.is_paused = False
+        for module in ("main", "keyboard_mac"):
+            logger.enable(module)
+
+    def tearDown(self):
+        main.config, main.keyboard, main.clipboard, main.metrics = self.saved
+        logger.remove()
+        logger.add(sys.stderr)
+        shutil.rmtree(self.test_dir)
+
+    def run_scans(self):
+        """Call process_qr_data() SCANS times at 100 scans/s; returns per-call durations."""
+        durations = []
+        next_scan = time.perf_counter()
+        for i in range(self.SCANS):
+            next_scan += self.INTERVAL
+            started = time.perf_counter()
+            main.process_qr_data(f"4901234{i:06d}")
+            durations.append(time.perf_counter() - started)
+            time.sleep(max(0.0, next_scan - time.perf_counter()))
+        return durations
+
+    def add_sinks(self, level):
+        """Configure logging as the app does, plus a sink that takes 2 ms per line."""
+        written = []
+
+        def slow_sink(message):
+            time.sleep(0.002)
+            written.append(message)
+
+        setup_logger(log_level=level, log_dir=os.path.join(self.test_dir, "logs"), enqueue=True)
+        logger.add(slow_sink, level=level, enqueue=True)
+        return written
+
+    def test_logging_adds_no_measurable_latency(self):
+        """Test that INFO logging to slow enqueued sinks adds nothing to process_qr_data()."""
+        logger.remove()
+        baseline = self.run_scans()
+
+        self.add_sinks("INFO")
+        logged = self.run_scans()
+
+        base_p50, log_p50 = percentile(baseline, 50), percentile(logged, 50)
+        self.assertLess(log_p50 - base_p50, 0.0001,
+                        f"p50 {base_p50 * 1e6:.0f} us without logging, {log_p50 * 1e6:.0f} us with INFO logging")
+
+    def test_debug_logging_does_not_wait_for_sinks(self):
+        """Test that DEBUG lines are handed off instead of waiting for a slow sink."""
+        written = self.add_sinks("DEBUG")
+        logged = self.run_scans()
+        logger.complete()
+
+        self.assertGreaterEqual(len(written), 2 * self.SCANS)
+        # Writing the two lines of a scan takes the sink 4 ms
+        self.assertLess(percentile(logged, 50), 0.004)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Unit tests for QR2Key metrics
+"""
+
+import unittest
+import sys
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from metrics import Histogram, MetricsRegistry, MetricsServer
+from pipeline import Scan, ScanPipeline
+from helpers import benchmark
+
+class TestHistogram(unittest.TestCase):
+    """Test cases for the Histogram class."""
+
+    def test_observations_land_in_buckets(self):
+        """Test that values are counted in the first bucket whose bound they do not exceed."""
+        histogram = Histogram("test", buckets=(0.001, 0.01, 0.1))
+        for value in (0.0005, 0.001, 0.005, 0.05, 0.5):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertAlmostEqual(histogram.sum, 0.5565)
+
+    def test_quantiles(self):
+        """Test bucket-resolution quantile estimates."""
+        histogram = Histogram("test", buckets=(0.001, 0.01, 0.1))
+        for _ in range(98):
+            histogram.observe(0.0005)
+        histogram.observe(0.05)
+        histogram.observe(0.05)
+
+        self.assertEqual(histogram.quantile(0.5), 0.001)
+        self.assertEqual(histogram.quantile(0.99), 0.1)
+        self.assertIsNone(Histogram("empty").quantile(0.5))
+
+    @benchmark
+    def test_stage_overhead_under_one_microsecond(self):
+        """Test that timing a stage and recording it costs less than 1 µs."""
+        histogram = Histogram("test")
+        counter = MetricsRegistry().counter("test")
+        n = 20000
+
+        # Best of several short batches, so other threads do not skew the result
+        best = float("inf")
+        for _ in range(10):
+            started = time.perf_counter()
+            for _ in range(n):
+                t0 = time.perf_counter()
+                histogram.observe(time.perf_counter() - t0)
+                counter.inc()
+            best = min(best, (time.perf_counter() - started) / n)
+
+        self.assertLess(best, 1e-6, f"{best * 1e9:.0f} ns per stage")
+
+class TestMetricsRegistry(unittest.TestCase):
+    """Test cases for the MetricsRegistry class."""
+
+    def setUp(self):
+        self.registry = MetricsRegistry()
+
+    def test_metrics_are_shared_by_name(self):
+        """Test that asking for a metric twice returns the same object."""
+        self.assertIs(self.registry.counter("scans_total"), self.registry.counter("scans_total"))
+        with self.assertRaises(ValueError):
+            self.registry.histogram("scans_total")
+
+    def test_snapshot(self):
+        """Test the snapshot API."""
+        self.registry.counter("scans_total").inc(3)
+        self.registry.gauge("queue_depth", function=lambda: 7)
+        self.registry.histogram("read_seconds").observe(0.002)
+
+        snapshot = self.registry.snapshot()
+
+        self.assertEqual(snapshot["scans_total"], 3)
+        self.assertEqual(snapshot["queue_depth"], 7)
+        self.assertEqual(snapshot["read_seconds"]["count"], 1)
+        self.assertEqual(snapshot["read_seconds"]["p50"], 0.0025)
+
+    def test_prometheus_format(self):
+        """Test the Prometheus text exposition."""
+        self.registry.counter("bytes_read_total", "Bytes read").inc(42)
+        histogram = self.registry.histogram("decode_seconds", buckets=(0.001, 0.01))
+        histogram.observe(0.0005)
+        histogram.observe(0.5)
+
+        lines = self.registry.render_prometheus().splitlines()
+
+        self.assertIn("# HELP qr2key_bytes_read_total Bytes read", lines)
+        self.assertIn("# TYPE qr2key_bytes_read_total counter", lines)
+        self.assertIn("qr2key_bytes_read_total 42", lines)
+        self.assertIn("# TYPE qr2key_decode_seconds histogram", lines)
+        self.assertIn('qr2key_decode_seconds_bucket{le="0.001"} 1', lines)
+        self.assertIn('qr2key_decode_seconds_bucket{le="0.01"} 1', lines)
+        self.assertIn('qr2key_decode_seconds_bucket{le="+Inf"} 2', lines)
+        self.assertIn("qr2key_decode_seconds_count 2", lines)
+
+    def test_pipeline_records_stages(self):
+        """Test that the scan pipeline fills its histograms and counters."""
+        logger.disable("pipeline")
+        try:
+            done = threading.Event()
+            pipeline = ScanPipeline(lambda scan: done.set(), maxsize=4, metrics=self.registry)
+            pipeline.start()
+            pipeline.submit(Scan("ABC"))
+            self.assertTrue(done.wait(1))
+            pipeline.stop(1)
+        finally:
+            logger.enable("pipeline")
+
+        snapshot = self.registry.snapshot()
+        for name in ("queue_wait_seconds", "inject_seconds", "scan_latency_seconds"):
+            self.assertEqual(snapshot[name]["count"], 1, name)
+        self.assertEqual(snapshot["queue_depth"], 0)
+
+class TestMetricsServer(unittest.TestCase):
+    """Test cases for the MetricsServer class."""
+
+    def test_serves_metrics_on_localhost(self):
+        """Test that /metrics is served in the text format and other paths are not."""
+        registry = MetricsRegistry()
+        registry.counter("scans_total").inc()
+        server = MetricsServer(registry, port=0)
+        logger.disable("metrics")
+        server.start()
+        try:
+            self.assertEqual(server._server.server_address[0], "127.0.0.1")
+            url = f"http://127.0.0.1:{server.port}"
+            with urllib.request.urlopen(f"{url}/metrics", timeout=2) as response:
+                body = response.read().decode()
+                content_type = response.headers["Content-Type"]
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(f"{url}/", timeout=2)
+        finally:
+            server.stop()
+            logger.enable("metrics")
+
+        self.assertIn("qr2key_scans_total 1", body)
+        self.assertTrue(content_type.startswith("text/plain"))
+
+if __name__ == '__main__':
+    unittest.main()
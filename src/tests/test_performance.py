@@ -0,0 +1,148 @@
+"""
+Unit tests for the QR2Key performance history and dashboard
+"""
+
+import unittest
+import sys
+import os
+import math
+import shutil
+import tempfile
+import time
+from importlib.util import find_spec
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from metrics import MetricsRegistry
+from performance import SERIES, PerformanceHistory, RingBuffer
+
+class TestRingBuffer(unittest.TestCase):
+    """Test cases for the RingBuffer class."""
+
+    def test_fills_then_overwrites_oldest(self):
+        """Test that values come back oldest first, keeping the newest capacity values."""
+        buffer = RingBuffer(3)
+        self.assertEqual(buffer.values(), [])
+        self.assertTrue(math.isnan(buffer.last()))
+
+        buffer.append(1)
+        buffer.append(2)
+        self.assertEqual(buffer.values(), [1, 2])
+        for value in (3, 4, 5):
+            buffer.append(value)
+
+        self.assertEqual(buffer.values(), [3, 4, 5])
+        self.assertEqual(buffer.last(), 5)
+        self.assertEqual(len(buffer), 3)
+
+    def test_none_is_a_gap(self):
+        """Test that a missing value is stored as NaN."""
+        buffer = RingBuffer(2)
+        buffer.append(None)
+
+        self.assertTrue(math.isnan(buffer.values()[0]))
+
+class TestPerformanceHistory(unittest.TestCase):
+    """Test cases for the PerformanceHistory class."""
+
+    def setUp(self):
+        self.metrics = MetricsRegistry()
+        self.depth = 0
+        self.metrics.gauge("queue_depth", function=lambda: self.depth)
+        self.history = PerformanceHistory(self.metrics, capacity=10)
+
+    def test_first_sample_is_the_baseline(self):
+        """Test that the first sample appends nothing."""
+        self.history.sample(now=100.0)
+
+        self.assertEqual([len(self.history.series[name]) for name, _ in SERIES], [0] * len(SERIES))
+
+    def test_interval_rates_and_percentiles(self):
+        """Test that rates and percentiles describe the last interval only."""
+        scans = self.metrics.counter("scans_read_total")
+        read = self.metrics.counter("bytes_read_total")
+        latency = self.metrics.histogram("scan_latency_seconds")
+        self.metrics.counter("reconnects_total").inc(2)
+        for _ in range(50):
+            latency.observe(0.5)  # Before the baseline, so not part of any interval
+        self.history.sample(now=100.0)
+
+        scans.inc(30)
+        read.inc(420)
+        for _ in range(90):
+            latency.observe(0.004)
+        for _ in range(10):
+            latency.observe(0.04)
+        self.depth = 3
+        self.history.sample(now=102.0)
+        self.history.sample(now=103.0)
+
+        series = {name: self.history.series[name].values() for name, _ in SERIES}
+        self.assertEqual(series["scans_per_min"], [900.0, 0.0])
+        self.assertEqual(series["bytes_per_sec"], [210.0, 0.0])
+        self.assertEqual(series["latency_p50"][0], 0.005)
+        self.assertEqual(series["latency_p95"][0], 0.05)
+        self.assertEqual(series["latency_p99"][0], 0.05)
+        self.assertTrue(math.isnan(series["latency_p99"][1]))
+        self.assertEqual(series["queue_depth"], [3, 3])
+        self.assertEqual(series["reconnects"], [2, 2])
+
+@unittest.skipUnless(find_spec("PyQt5") is not None, "PyQt5 required")
+class TestPerformanceTab(unittest.TestCase):
+    """Test that the Performance tab redraws only while it is visible."""
+
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PyQt5.QtWidgets import QApplication
+        cls.app = QApplication.instance() or QApplication([])
+        logger.disable("gui")
+        logger.disable("config")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("gui")
+        logger.enable("config")
+
+    def setUp(self):
+        from config import Config
+        from gui import QR2KeyGUI
+        self.test_dir = tempfile.mkdtemp()
+        self.history = PerformanceHistory(MetricsRegistry())
+        self.window = QR2KeyGUI(Config(os.path.join(self.test_dir, "config.json")), history=self.history)
+
+    def tearDown(self):
+        self.window.tray_icon.hide()
+        self.window.deleteLater()
+        shutil.rmtree(self.test_dir)
+
+    def test_timer_follows_visibility(self):
+        """Test that the redraw timer runs only with the tab selected and the window shown."""
+        self.window.show()
+        self.assertFalse(self.window.performance_timer.isActive())
+
+        self.window.tab_widget.setCurrentIndex(self.window.performance_tab)
+        self.assertTrue(self.window.performance_timer.isActive())
+        self.assertEqual(len(self.window.performance_rows), len(SERIES))
+
+        self.window.hide()
+        self.assertFalse(self.window.performance_timer.isActive())
+        self.window.show()
+        self.assertTrue(self.window.performance_timer.isActive())
+
+        self.window.tab_widget.setCurrentIndex(0)
+        self.assertFalse(self.window.performance_timer.isActive())
+
+    def test_sparklines_paint(self):
+        """Test that sparklines paint with gaps and a full buffer."""
+        for i in range(200):
+            self.history.sample(now=float(i))
+        self.window.show()
+        self.window.tab_widget.setCurrentIndex(self.window.performance_tab)
+
+        for _, _, sparkline, _ in self.window.performance_rows:
+            sparkline.repaint()
+        self.app.processEvents()
+
+if __name__ == '__main__':
+    unittest.main()
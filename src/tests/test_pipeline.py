@@ -0,0 +1,108 @@
+"""
+Unit tests for the QR2Key scan pipeline
+"""
+
+import unittest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from pipeline import Scan, ScanPipeline
+
+class TestScanPipeline(unittest.TestCase):
+    """Test cases for the ScanPipeline class."""
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("pipeline")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("pipeline")
+
+    def test_scans_injected_in_order(self):
+        """Test that the worker injects scans in submission order."""
+        injected = []
+        pipeline = ScanPipeline(lambda scan: injected.append(scan.text))
+        pipeline.start()
+
+        for i in range(20):
+            self.assertTrue(pipeline.submit(Scan(f"scan-{i}", port="test")))
+        pipeline.stop(2)
+
+        self.assertEqual(injected, [f"scan-{i}" for i in range(20)])
+        self.assertEqual(pipeline.processed, 20)
+
+    def test_submit_does_not_wait_for_slow_injection(self):
+        """Test that submitting never waits for the injection worker."""
+        release = threading.Event()
+        pipeline = ScanPipeline(lambda scan: release.wait(5), maxsize=100)
+        pipeline.start()
+
+        started = time.monotonic()
+        for i in range(50):
+            pipeline.submit(Scan(str(i)))
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.1)
+        self.assertGreaterEqual(pipeline.max_depth, 49)
+        release.set()
+        pipeline.stop(2)
+
+    def test_full_queue_drops_scan(self):
+        """Test that a full queue drops and counts new scans."""
+        release = threading.Event()
+        pipeline = ScanPipeline(lambda scan: release.wait(5), maxsize=2)
+        pipeline.start()
+
+        results = [pipeline.submit(Scan(str(i))) for i in range(5)]
+        time.sleep(0.05)
+
+        self.assertIn(False, results)
+        self.assertGreaterEqual(pipeline.dropped, 1)
+        release.set()
+        pipeline.stop(2)
+
+    def test_wait_time_recorded(self):
+        """Test that each scan records how long it waited in the queue."""
+        scans = []
+
+        def handler(scan):
+            scans.append(scan)
+            time.sleep(0.02)
+
+        pipeline = ScanPipeline(handler)
+        pipeline.start()
+        for i in range(3):
+            pipeline.submit(Scan(str(i)))
+        pipeline.stop(2)
+
+        self.assertGreaterEqual(scans[-1].waited, 0.03)
+        stats = pipeline.stats()
+        self.assertEqual(stats["processed"], 3)
+        self.assertGreater(stats["avg_wait"], 0)
+        self.assertEqual(stats["depth"], 0)
+
+    def test_handler_errors_are_isolated(self):
+        """Test that a failing injection does not stop the worker."""
+        injected = []
+
+        def handler(scan):
+            if scan.text == "bad":
+                raise RuntimeError("injection failed")
+            injected.append(scan.text)
+
+        pipeline = ScanPipeline(handler)
+        pipeline.start()
+        for text in ("one", "bad", "two"):
+            pipeline.submit(Scan(text))
+        pipeline.stop(2)
+
+        self.assertEqual(injected, ["one", "two"])
+        self.assertEqual(pipeline.errors, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+"""
+Unit tests for QR2Key serial port detection
+"""
+
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from port_detector import PortDetector
+
+class FakePort:
+    """Stand-in for a serial.tools.list_ports port info object."""
+
+    def __init__(self, device, vid=None, description="n/a"):
+        self.device = device
+        self.vid = vid
+        self.description = description
+
+class FakePorts:
+    """Callable port list that counts enumerations."""
+
+    def __init__(self, *ports):
+        self.ports = list(ports)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return list(self.ports)
+
+class TestPortDetector(unittest.TestCase):
+    """Test cases for the PortDetector class."""
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("port_detector")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("port_detector")
+
+    def setUp(self):
+        self.device_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.device_dir)
+
+    def test_auto_detect_prefers_known_usb_serial(self):
+        """Test that known USB-serial bridges rank before other USB ports."""
+        ports = FakePorts(
+            FakePort("/dev/cu.Bluetooth-Incoming-Port"),
+            FakePort("/dev/cu.usbmodem1101", vid=0x05E0),
+            FakePort("/dev/cu.usbserial-1140", vid=0x0403),
+        )
+        detector = PortDetector(list_ports=ports)
+
+        self.assertEqual(detector.scanner_ports(), ["/dev/cu.usbserial-1140", "/dev/cu.usbmodem1101"])
+        self.assertEqual(detector.auto_detect_port(), "/dev/cu.usbserial-1140")
+
+    def test_auto_detect_none(self):
+        """Test that built-in ports are not auto-detected."""
+        detector = PortDetector(list_ports=FakePorts(FakePort("/dev/ttyS0")))
+
+        self.assertIsNone(detector.auto_detect_port())
+
+    def test_snapshot_is_cached(self):
+        """Test that the port list is enumerated once and then served from cache."""
+        ports = FakePorts(FakePort("/dev/ttyUSB0", vid=0x10C4))
+        detector = PortDetector(list_ports=ports)
+
+        for _ in range(10):
+            detector.snapshot()
+            detector.auto_detect_port()
+
+        self.assertEqual(ports.calls, 1)
+
+    def test_refresh_diffs_snapshot(self):
+        """Test that refresh reports added and removed devices."""
+        ports = FakePorts(FakePort("/dev/ttyUSB0", vid=0x10C4))
+        detector = PortDetector(list_ports=ports, min_scan_interval=0)
+        detector.snapshot()
+
+        ports.ports = [FakePort("/dev/ttyUSB1", vid=0x0403)]
+
+        self.assertEqual(detector.refresh(), (["/dev/ttyUSB1"], ["/dev/ttyUSB0"]))
+        self.assertEqual(detector.refresh(), ([], []))
+
+    def test_refresh_is_rate_limited(self):
+        """Test that back-to-back enumerations are spaced by min_scan_interval."""
+        detector = PortDetector(list_ports=FakePorts(), min_scan_interval=0.05)
+
+        started = time.monotonic()
+        for _ in range(3):
+            detector.refresh()
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    def test_monitor_detects_hotplug_quickly_and_idles_cheaply(self):
+        """Test that a new device is reported within 250 ms without enumerating while idle."""
+        ports = FakePorts()
+        detector = PortDetector(list_ports=ports, device_dir=self.device_dir)
+        added = []
+        removed = []
+        seen = threading.Event()
+        gone = threading.Event()
+
+        def on_added(port):
+            added.append((port, time.monotonic()))
+            seen.set()
+
+        def on_removed(port):
+            removed.append(port)
+            gone.set()
+
+        monitor = threading.Thread(target=detector.monitor_ports, args=(on_added, on_removed), daemon=True)
+        monitor.start()
+        time.sleep(0.5)
+        self.assertEqual(ports.calls, 1)
+
+        ports.ports = [FakePort("/dev/ttyUSB0", vid=0x1A86), FakePort("/dev/ttyS9")]
+        plugged = time.monotonic()
+        open(os.path.join(self.device_dir, "ttyUSB0"), "w").close()
+
+        self.assertTrue(seen.wait(1))
+        self.assertEqual([port for port, _ in added], ["/dev/ttyUSB0"])
+        self.assertLess(added[0][1] - plugged, 0.25)
+
+        ports.ports = []
+        os.remove(os.path.join(self.device_dir, "ttyUSB0"))
+        self.assertTrue(gone.wait(1))
+        self.assertEqual(sorted(removed), ["/dev/ttyS9", "/dev/ttyUSB0"])
+
+        detector.stop()
+        monitor.join(1)
+        self.assertFalse(monitor.is_alive())
+
+if __name__ == '__main__':
+    unittest.main()
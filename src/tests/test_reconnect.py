@@ -0,0 +1,114 @@
+"""
+Unit tests for the QR2Key reconnect state machine
+"""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from reconnect import CLOSED, CONNECTED, LOST, RECONNECTING, PortState, ReconnectPolicy
+from helpers import FakeClock
+
+class TestReconnectPolicy(unittest.TestCase):
+    """Test cases for the ReconnectPolicy class."""
+
+    def test_exponential_backoff_is_capped(self):
+        """Test that delays grow by the multiplier up to max_delay."""
+        policy = ReconnectPolicy(initial_delay=0.5, max_delay=4, multiplier=2, jitter=0)
+
+        self.assertEqual([policy.delay(n) for n in range(6)], [0.5, 1, 2, 4, 4, 4])
+
+    def test_jitter_bounds(self):
+        """Test that jitter spreads delays by at most the configured fraction."""
+        low = ReconnectPolicy(initial_delay=1, jitter=0.2, rng=lambda: 0.0)
+        high = ReconnectPolicy(initial_delay=1, jitter=0.2, rng=lambda: 1.0)
+
+        self.assertAlmostEqual(low.delay(0), 0.8)
+        self.assertAlmostEqual(high.delay(0), 1.2)
+
+    def test_from_config(self):
+        """Test creating a policy from a config section."""
+        policy = ReconnectPolicy.from_config({"initial_delay": 2, "jitter": 0})
+
+        self.assertEqual(policy.delay(1), 4)
+        self.assertEqual(policy.keep_buffer_for, 5.0)
+
+class TestPortState(unittest.TestCase):
+    """Test cases for the PortState class."""
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("reconnect")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("reconnect")
+
+    def setUp(self):
+        self.clock = FakeClock(50.0)
+        self.changes = []
+        policy = ReconnectPolicy(initial_delay=1, multiplier=2, jitter=0)
+        self.state = PortState("/dev/ttyUSB0", policy, lambda *change: self.changes.append(change), self.clock)
+
+    def test_full_cycle_is_counted_and_timed(self):
+        """Test connected -> lost -> reconnecting -> connected with counters and timings."""
+        self.clock.now += 10
+        self.state.lose("unplugged")
+        self.assertEqual(self.state.state, RECONNECTING)
+        self.assertEqual(self.state.next_attempt_at, self.clock.now + 1)
+
+        self.clock.now += 1
+        self.assertTrue(self.state.due())
+        self.state.attempt_failed("busy")
+        self.assertEqual(self.state.next_attempt_at, self.clock.now + 2)
+
+        self.clock.now += 2
+        outage = self.state.reconnected()
+
+        self.assertEqual(outage, 3)
+        self.assertEqual(self.state.state, CONNECTED)
+        self.assertFalse(self.state.due())
+        self.assertEqual(self.changes, [
+            ("/dev/ttyUSB0", CONNECTED, LOST),
+            ("/dev/ttyUSB0", LOST, RECONNECTING),
+            ("/dev/ttyUSB0", RECONNECTING, CONNECTED),
+        ])
+
+        stats = self.state.stats()
+        self.assertEqual(stats["transitions"], {
+            "connected->lost": 1,
+            "lost->reconnecting": 1,
+            "reconnecting->reconnecting": 1,
+            "reconnecting->connected": 1,
+        })
+        self.assertEqual(stats["durations"][CONNECTED], 10)
+        self.assertEqual(stats["durations"][RECONNECTING], 3)
+
+    def test_retry_now(self):
+        """Test that a reappearing device is retried without waiting for the backoff."""
+        self.state.lose()
+        for _ in range(4):
+            self.state.attempt_failed()
+        self.assertFalse(self.state.due())
+
+        self.state.retry_now()
+
+        self.assertTrue(self.state.due())
+
+    def test_invalid_transition(self):
+        """Test that impossible transitions are rejected."""
+        with self.assertRaises(ValueError):
+            self.state.reconnected()
+
+    def test_close(self):
+        """Test that a closed port schedules no more attempts."""
+        self.state.lose()
+        self.state.close()
+
+        self.assertEqual(self.state.state, CLOSED)
+        self.assertFalse(self.state.due(now=self.clock.now + 1000))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Unit tests and latency benchmark for the QR2Key serial reader
+"""
+
+import unittest
+import sys
+import os
+import threading
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import serial
+from loguru import logger
+
+import main
+from connection_manager import ConnectionManager
+from pipeline import ScanPipeline
+from helpers import benchmark, percentile
+
+@unittest.skipUnless(hasattr(os, "openpty"), "pty support required")
+class TestSerialReaderLatency(unittest.TestCase):
+    """Benchmark byte-arrival to process_qr_data() latency against a pty scanner."""
+
+    SCANS = 200
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("connection_manager")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("connection_manager")
+
+    def setUp(self):
+        """Open a pty pair and connect the reader to its slave side."""
+        self.master, self.slave = os.openpty()
+        main.scan_pipeline = ScanPipeline(main.handle_scan)
+        main.scan_pipeline.start()
+        main.connection_manager = ConnectionManager(main.scan_pipeline.submit)
+        self.conn = main.connection_manager.connect(os.ttyname(self.slave), 9600, timeout=0.2)
+        main.is_running = True
+        main.is_paused = False
+
+    def tearDown(self):
+        """Stop the reader thread and close the pty."""
+        main.connection_manager.stop()
+        main.scan_pipeline.stop(2)
+        main.connection_manager = None
+        main.scan_pipeline = None
+        os.close(self.master)
+        os.close(self.slave)
+
+    @benchmark
+    def test_scan_latency(self):
+        """Scans reach process_qr_data() well within the old 100 ms poll interval."""
+        received = threading.Event()
+        arrival = []
+
+        def record(data, port=None):
+            arrival.append(time.perf_counter())
+            received.set()
+
+        with patch('main.process_qr_data', side_effect=record):
+            main.connection_manager.start()
+
+            latencies = []
+            for i in range(self.SCANS):
+                received.clear()
+                sent = time.perf_counter()
+                os.write(self.master, f"SCAN{i:04d}\r".encode())
+                self.assertTrue(received.wait(1), "scan was not delivered")
+                latencies.append(arrival[-1] - sent)
+                time.sleep(0.002)
+
+        p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+        logger.info("Scan latency over {} scans: p50 {:.3f} ms, p99 {:.3f} ms", self.SCANS, p50 * 1000, p99 * 1000)
+        self.assertLess(p99, 0.05, f"p50 {p50 * 1000:.3f} ms, p99 {p99 * 1000:.3f} ms")
+
+    def test_reader_not_blocked_by_typing(self):
+        """The port is drained at line rate while the worker types slowly."""
+        typing = threading.Event()
+
+        def slow_typing(data, port=None):
+            typing.wait(5)
+
+        with patch('main.process_qr_data', side_effect=slow_typing):
+            main.connection_manager.start()
+
+            for i in range(50):
+                os.write(self.master, f"SCAN{i:04d}\r".encode())
+
+            deadline = time.monotonic() + 2
+            while main.scan_pipeline.submitted < 50 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            self.assertEqual(main.scan_pipeline.submitted, 50)
+            self.assertEqual(self.conn.serial.in_waiting, 0)
+            self.assertGreaterEqual(main.scan_pipeline.max_depth, 48)
+            self.assertEqual(main.scan_pipeline.errors, 0)
+            typing.set()
+            main.scan_pipeline.stop(2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,271 @@
+"""
+Unit tests and replay benchmark for QR2Key serial traces
+"""
+
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+
+import main
+from config import Config
+from connection_manager import ConnectionManager
+from keyboard_mac import Key, KeyboardController, RecordingBackend
+from metrics import MetricsRegistry
+from pipeline import ScanPipeline
+from serial_trace import MAX_CHUNK, MAX_DELTA_US, TraceError, TraceRecorder, TraceReplayer, read_trace
+from helpers import FakeClock, benchmark, percentile
+
+QUIET_MODULES = ("connection_manager", "decoder", "pipeline", "keyboard_mac", "main", "config", "serial_trace")
+
+class TestTraceFormat(unittest.TestCase):
+    """Test cases for TraceRecorder and read_trace."""
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("serial_trace")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("serial_trace")
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "scanner.qrtrace")
+        self.clock = FakeClock(1000.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_round_trip_keeps_bytes_and_timing(self):
+        """Test that reads and their microsecond offsets survive a round trip."""
+        with TraceRecorder(self.path, "/dev/cu.usbserial-1140", clock=self.clock) as recorder:
+            self.clock.now += 0.25
+            recorder.record(b"4901234")
+            self.clock.now += 0.000125
+            recorder.record(b"567894\r")
+            recorder.record(b"\x82\xa0\r", now=self.clock.now + 1.5)
+
+        header, events = read_trace(self.path)
+
+        self.assertEqual(header["port"], "/dev/cu.usbserial-1140")
+        self.assertEqual([data for _, data in events], [b"4901234", b"567894\r", b"\x82\xa0\r"])
+        self.assertEqual([round(offset, 6) for offset, _ in events], [0.25, 0.250125, 1.750125])
+        self.assertEqual(os.path.getsize(self.path), 8 + 10 + len("/dev/cu.usbserial-1140") + 3 * 6 + 17)
+
+    def test_long_gaps_and_large_reads(self):
+        """Test that gaps beyond the 32-bit delta and reads beyond 64 KiB are split."""
+        payload = bytes(range(256)) * 300
+        with TraceRecorder(self.path, clock=self.clock) as recorder:
+            recorder.record(b"A", now=self.clock.now + MAX_DELTA_US / 1e6 * 2 + 1)
+            recorder.record(payload, now=self.clock.now + MAX_DELTA_US / 1e6 * 2 + 2)
+
+        _, events = read_trace(self.path)
+
+        self.assertAlmostEqual(events[0][0], MAX_DELTA_US / 1e6 * 2 + 1, places=5)
+        self.assertEqual(events[0][1], b"A")
+        self.assertEqual(b"".join(data for _, data in events[1:]), payload)
+        self.assertEqual(len(events[1][1]), MAX_CHUNK)
+
+    def test_flush_is_deferred(self):
+        """Test that reads stay buffered until flush_interval after the first unflushed one."""
+        recorder = TraceRecorder(self.path, clock=self.clock, flush_interval=0.5)
+        header_size = os.path.getsize(self.path)
+        try:
+            self.assertIsNone(recorder.time_until_flush(self.clock.now))
+            recorder.record(b"4901234567894\r", now=self.clock.now)
+            recorder.record(b"ABC\r", now=self.clock.now + 0.2)
+
+            self.assertEqual(os.path.getsize(self.path), header_size)
+            self.assertAlmostEqual(recorder.time_until_flush(self.clock.now + 0.2), 0.3)
+            self.assertEqual(recorder.time_until_flush(self.clock.now + 0.7), 0.0)
+            recorder.flush()
+            self.assertEqual(os.path.getsize(self.path), header_size + 2 * 6 + 18)
+            self.assertIsNone(recorder.time_until_flush(self.clock.now + 0.7))
+        finally:
+            recorder.close()
+
+    def test_not_a_trace(self):
+        """Test that other files are rejected."""
+        with open(self.path, "wb") as f:
+            f.write(b"hello")
+
+        with self.assertRaises(TraceError):
+            read_trace(self.path)
+
+@unittest.skipUnless(hasattr(os, "openpty"), "pty support required")
+class TestTraceReplay(unittest.TestCase):
+    """Test replaying traces into a pty and recording what the app reads."""
+
+    @classmethod
+    def setUpClass(cls):
+        for module in QUIET_MODULES:
+            logger.disable(module)
+
+    @classmethod
+    def tearDownClass(cls):
+        for module in QUIET_MODULES:
+            logger.enable(module)
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.replayer = None
+        self.manager = None
+
+    def tearDown(self):
+        if self.manager is not None:
+            self.manager.stop()
+        if self.replayer:
+            self.replayer.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_replay_speed(self):
+        """Test that replay follows the recorded timing, scaled by speed."""
+        events = [(i * 0.02, b"x") for i in range(11)]
+
+        for speed, expected in ((1, 0.2), (4, 0.05), (0, 0.0)):
+            replayer = TraceReplayer(events, speed)
+            try:
+                elapsed = replayer.play()
+            finally:
+                replayer.close()
+            self.assertGreaterEqual(elapsed, expected)
+            self.assertLess(elapsed, expected + 0.05)
+
+    def test_manager_records_what_it_reads(self):
+        """Test that trace_dir records a port's raw reads and they replay to the same scans."""
+        self.replayer = TraceReplayer([(0.0, b"ABC"), (0.03, b"DEF\rGHI\r")], speed=1)
+        scans = []
+        self.manager = ConnectionManager(scans.append, trace_dir=self.test_dir)
+        self.manager.connect(self.replayer.port, timeout=0)
+        self.manager.start()
+
+        self.replayer.play()
+        deadline = time.monotonic() + 2
+        while len(scans) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # The manager flushes the trace within a second of the reads, while still running
+        trace = os.path.join(self.test_dir, os.listdir(self.test_dir)[0])
+        deadline = time.monotonic() + 3
+        while len(read_trace(trace)[1]) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(b"".join(data for _, data in read_trace(trace)[1]), b"ABCDEF\rGHI\r")
+        self.manager.stop()
+        self.manager = None
+
+        self.assertEqual([scan.text for scan in scans], ["ABCDEF", "GHI"])
+        traces = os.listdir(self.test_dir)
+        self.assertEqual(len(traces), 1)
+        header, events = read_trace(os.path.join(self.test_dir, traces[0]))
+        self.assertEqual(header["port"], self.replayer.port)
+        self.assertEqual(b"".join(data for _, data in events), b"ABCDEF\rGHI\r")
+        self.assertGreaterEqual(events[-1][0] - events[0][0], 0.02)
+
+@unittest.skipUnless(hasattr(os, "openpty"), "pty support required")
+class TestReplayPipeline(unittest.TestCase):
+    """Replay a trace through the whole main.py pipeline."""
+
+    SCANS = 1000
+
+    @classmethod
+    def setUpClass(cls):
+        for module in QUIET_MODULES:
+            logger.disable(module)
+
+    @classmethod
+    def tearDownClass(cls):
+        for module in QUIET_MODULES:
+            logger.enable(module)
+
+    def setUp(self):
+        """Record a synthetic trace and wire main's globals to a recording keyboard."""
+        self.test_dir = tempfile.mkdtemp()
+        self.trace = os.path.join(self.test_dir, "bench.qrtrace")
+        clock = FakeClock(1000.0)
+        with TraceRecorder(self.trace, "bench", clock=clock) as recorder:
+            for i in range(self.SCANS):
+                clock.now += 0.005
+                recorder.record(f"4901234{i:06d}\r".encode())
+
+        config_path = os.path.join(self.test_dir, "config.json")
+        with open(config_path, "w") as f:
+            json.dump({"keyboard": {"type_delay": 0, "type_rate": 0, "press_enter_after": True}}, f)
+
+        self.saved = {name: getattr(main, name) for name in
+                      ("config", "keyboard", "clipboard", "dedup", "metrics", "scan_pipeline", "connection_manager")}
+        self.backend = RecordingBackend(capacity=self.SCANS * 20, clock=time.monotonic)
+        main.config = Config(config_path)
+        main.keyboard = KeyboardController(backend=self.backend)
+        main.clipboard = None
+        main.dedup = None
+        main.metrics = MetricsRegistry()
+        main.scan_pipeline = ScanPipeline(main.handle_scan, self.SCANS, metrics=main.metrics)
+        main.connection_manager = ConnectionManager(main.submit_scan, metrics=main.metrics)
+        main.is_paused = False
+
+    def tearDown(self):
+        main.connection_manager.stop()
+        main.scan_pipeline.stop(2)
+        for name, value in self.saved.items():
+            setattr(main, name, value)
+        shutil.rmtree(self.test_dir)
+
+    def replay(self, speed):
+        """Replay the trace through main and return (scans/s, latencies)."""
+        replayer = TraceReplayer.from_file(self.trace, speed)
+        try:
+            main.connect_to_serial(replayer.port, timeout=0)
+            main.scan_pipeline.start()
+            main.connection_manager.start()
+
+            started = time.monotonic()
+            replayer.play()
+            deadline = time.monotonic() + 10
+            while main.scan_pipeline.processed < self.SCANS and time.monotonic() < deadline:
+                time.sleep(0.005)
+            elapsed = time.monotonic() - started
+        finally:
+            main.connection_manager.stop()
+            replayer.close()
+
+        self.assertEqual(main.scan_pipeline.processed, self.SCANS)
+        enters = [t for t, kind, key in self.backend.events()
+                  if kind == RecordingBackend.PRESS and key == Key.enter]
+        self.assertEqual(len(enters), self.SCANS)
+        latencies = [done - sent for done, sent in zip(enters, replayer.sent_at)]
+        return self.SCANS / elapsed, latencies
+
+    def test_as_fast_as_possible(self):
+        """Test that a trace replayed without delays is typed completely and in order."""
+        self.replay(speed=0)
+        histogram = main.metrics.snapshot()["scan_latency_seconds"]
+
+        self.assertEqual(histogram["count"], self.SCANS)
+        self.assertEqual(self.backend.text(), "".join(f"4901234{i:06d}" for i in range(self.SCANS)))
+
+    @benchmark
+    def test_throughput(self):
+        """Test the scan rate with the trace replayed without delays."""
+        rate, latencies = self.replay(speed=0)
+
+        p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+        logger.info("Replay at full speed: {:.0f} scans/s, p50 {:.3f} ms, p99 {:.3f} ms", rate, p50 * 1000, p99 * 1000)
+        self.assertGreater(rate, 200, f"{rate:.0f} scans/s")
+
+    @benchmark
+    def test_real_time(self):
+        """Test end-to-end latency with the trace replayed at 1x (5 ms between scans)."""
+        rate, latencies = self.replay(speed=1)
+
+        p50, p99 = percentile(latencies, 50), percentile(latencies, 99)
+        logger.info("Replay at 1x: {:.0f} scans/s, p50 {:.3f} ms, p99 {:.3f} ms", rate, p50 * 1000, p99 * 1000)
+        self.assertLess(p50, 0.01, f"{rate:.0f} scans/s, p50 {p50 * 1000:.3f} ms, p99 {p99 * 1000:.3f} ms")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+"""
+Unit tests for QR2Key output sinks
+"""
+
+import unittest
+import sys
+import os
+import io
+import json
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from config import Config
+from keyboard_mac import KeyboardController, RecordingBackend
+from sinks import BufferedSink, FileSink, OutputSink, SinkFanout, SocketSink, StdoutSink, create_sink
+
+class BlockingSink(OutputSink):
+    """Sink whose writes wait until released, like a stalled consumer."""
+
+    name = "blocking"
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def write(self, data):
+        self.release.wait()
+        self.batches.append(data)
+
+class FailingSink(OutputSink):
+    """Sink that fails its first writes."""
+
+    name = "failing"
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.batches = []
+
+    def write(self, data):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("consumer went away")
+        self.batches.append(data)
+
+class TestBufferedSink(unittest.TestCase):
+    """Test cases for BufferedSink and the sink types."""
+
+    @classmethod
+    def setUpClass(cls):
+        logger.disable("sinks")
+
+    @classmethod
+    def tearDownClass(cls):
+        logger.enable("sinks")
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.sinks = []
+
+    def tearDown(self):
+        for sink in self.sinks:
+            if isinstance(sink.sink, BlockingSink):
+                sink.sink.release.set()
+            sink.close()
+        shutil.rmtree(self.test_dir)
+
+    def buffered(self, sink, **kwargs):
+        """Create a BufferedSink that is closed after the test."""
+        buffered = BufferedSink(sink, **kwargs)
+        self.sinks.append(buffered)
+        return buffered
+
+    def test_file_sink_batches(self):
+        """Test that a burst of scans is appended in a few writes, one line each."""
+        path = os.path.join(self.test_dir, "out", "scans.log")
+        sink = self.buffered(FileSink(path), flush_interval=0.05)
+        for i in range(100):
+            sink.publish(f"code-{i}", "/dev/ttyUSB0")
+
+        self.assertTrue(sink.flush(2))
+
+        with open(path) as f:
+            self.assertEqual(f.read().splitlines(), [f"code-{i}" for i in range(100)])
+        self.assertLessEqual(sink.batches, 3)
+
+    def test_json_format(self):
+        """Test that the json format carries the port, result and time."""
+        stream = io.BytesIO()
+        sink = self.buffered(StdoutSink(stream), format="json", flush_interval=0)
+        sink.publish("ＡＢＣ\n1", "/dev/ttyUSB0", "pasted", timestamp=100.5)
+        sink.flush(2)
+
+        self.assertEqual(json.loads(stream.getvalue()),
+                         {"time": 100.5, "port": "/dev/ttyUSB0", "text": "ＡＢＣ\n1", "result": "pasted"})
+
+    def test_full_buffer_drops_without_blocking(self):
+        """Test that a stalled sink fills its buffer and publish() still returns at once."""
+        sink = self.buffered(BlockingSink(), buffer_size=10, batch_size=1, flush_interval=0)
+
+        started = time.perf_counter()
+        accepted = [sink.publish(f"code-{i}") for i in range(1000)]
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(sum(accepted), sink.published)
+        self.assertLessEqual(sink.published, 11)
+        self.assertEqual(sink.dropped, 1000 - sink.published)
+        self.assertLess(elapsed, 0.1)
+        sink.sink.release.set()
+        self.assertTrue(sink.flush(2))
+        self.assertEqual(len(sink.sink.batches), sink.published)
+
+    def test_failed_write_is_retried_later(self):
+        """Test that a failing write drops its batch, pauses and then recovers."""
+        sink = self.buffered(FailingSink(1), flush_interval=0, retry_delay=0.05)
+        sink.publish("lost")
+        self.assertTrue(sink.flush(2))
+        sink.publish("kept")
+        self.assertTrue(sink.flush(2))
+
+        self.assertEqual(sink.errors, 1)
+        self.assertEqual(sink.sink.batches, [b"kept\n"])
+
+    def test_socket_sink_reconnects(self):
+        """Test sending to a listening socket, including after the consumer restarts."""
+        path = os.path.join(self.test_dir, "scans.sock")
+        sink = self.buffered(SocketSink(path), flush_interval=0, retry_delay=0.01)
+
+        sink.publish("before listener")
+        self.assertTrue(sink.flush(2))
+        self.assertEqual(sink.errors, 1)
+
+        for consumer in range(2):
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(path)
+            server.listen(1)
+            server.settimeout(0.05)
+            conn = None
+            deadline = time.monotonic() + 2
+            while conn is None:
+                self.assertLess(time.monotonic(), deadline, "sink did not reconnect")
+                # Writes into the previous consumer's closed socket fail, then it reconnects
+                sink.publish(f"consumer {consumer}")
+                sink.flush(2)
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    pass
+            conn.settimeout(2)
+            self.assertTrue(conn.recv(100).startswith(f"consumer {consumer}\n".encode()))
+            conn.close()
+            server.close()
+            os.unlink(path)
+
+    def test_create_sink(self):
+        """Test creating sinks from config entries."""
+        sink = create_sink({"type": "file", "path": os.path.join(self.test_dir, "a.log"), "format": "json"})
+        self.sinks.append(sink)
+
+        self.assertEqual(sink.name, "file")
+        self.assertEqual(sink.format, "json")
+        for options in ({"type": "printer"}, {"type": "socket"}, {"type": "stdout", "format": "xml"}):
+            with self.assertRaises(ValueError):
+                create_sink(options)
+
+class TestOutputFanout(unittest.TestCase):
+    """Test process_qr_data() with output sinks next to the keyboard."""
+
+    def setUp(self):
+        import main
+        self.main = main
+        self.test_dir = tempfile.mkdtemp()
+        self.saved = (main.config, main.keyboard, main.clipboard, main.sinks)
+        for module in ("config", "main", "sinks", "keyboard_mac"):
+            logger.disable(module)
+        main.config = Config(os.path.join(self.test_dir, "config.json"))
+        main.config.set("keyboard", "type_delay", 0)
+        self.backend = RecordingBackend()
+        main.keyboard = KeyboardController(backend=self.backend)
+        main.clipboard = None
+
+    def tearDown(self):
+        if self.main.sinks is not None:
+            self.main.sinks.close()
+        self.main.config, self.main.keyboard, self.main.clipboard, self.main.sinks = self.saved
+        for module in ("config", "main", "sinks", "keyboard_mac"):
+            logger.enable(module)
+        shutil.rmtree(self.test_dir)
+
+    def test_slow_sink_does_not_delay_typing(self):
+        """Test that a stalled sink next to a file sink leaves typing and the file unaffected."""
+        path = os.path.join(self.test_dir, "scans.log")
+        stalled = BufferedSink(BlockingSink(), buffer_size=4)
+        self.main.sinks = SinkFanout([BufferedSink(FileSink(path), format="json"), stalled])
+
+        started = time.perf_counter()
+        results = [self.main.process_qr_data(f"code-{i}", "/dev/ttyUSB0") for i in range(200)]
+        elapsed = time.perf_counter() - started
+        stalled.sink.release.set()
+        self.assertTrue(self.main.sinks.flush(2))
+
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(results, ["typed"] * 200)
+        self.assertEqual(self.backend.text(), "".join(f"code-{i}" for i in range(200)))
+        self.assertEqual([(r["text"], r["port"], r["result"]) for r in records],
+                         [(f"code-{i}", "/dev/ttyUSB0", "typed") for i in range(200)])
+        self.assertGreater(stalled.dropped, 0)
+        self.assertLess(elapsed, 1.0)
+
+    def test_sinks_instead_of_keyboard(self):
+        """Test that with output.keyboard off scans only go to the sinks."""
+        stream = io.BytesIO()
+        self.main.config.set("output", "keyboard", False)
+        self.main.sinks = SinkFanout([BufferedSink(StdoutSink(stream), flush_interval=0)])
+
+        self.assertEqual(self.main.process_qr_data("4901234567894"), "sent")
+        self.main.sinks.flush(2)
+
+        self.assertEqual(self.backend.count, 0)
+        self.assertEqual(stream.getvalue(), b"4901234567894\n")
+
+    def test_from_config_skips_bad_entries(self):
+        """Test that an invalid sink entry is logged and skipped."""
+        fanout = SinkFanout.from_config([{"type": "stdout"}, {"type": "fax"}, "file"])
+        self.main.sinks = fanout
+
+        self.assertEqual([sink.name for sink in fanout.sinks], ["stdout"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Cold-start budget for QR2Key
+"""
+
+import unittest
+import sys
+import os
+import json
+import shutil
+import subprocess
+import tempfile
+
+from helpers import BENCHMARKS
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs in a fresh interpreter: import main, open a pty as the scanner port,
+# then type one scan, reporting how long each step took
+STARTUP_SCRIPT = r"""
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, SRC_DIR)
+
+import main
+from config import Config
+from loguru import logger
+imported = time.perf_counter()
+
+logger.remove()
+master, slave = os.openpty()
+with open("config.json", "w") as f:
+    json.dump({
+        "serial": {"port": os.ttyname(slave), "auto_detect": False, "monitor_ports": False},
+        "keyboard": {"backend": "null", "type_delay": 0},
+        "journal": {"enabled": False},
+        "app": {"watch_config": False},
+    }, f)
+main.config = Config("config.json")
+main.start_reading()
+main.connection_manager.start()
+ready = time.perf_counter()
+loaded_before_ready = sorted(m for m in HEAVY_MODULES if m in sys.modules)
+
+os.write(master, b"4901234567894\r")
+main.start_services()
+deadline = time.monotonic() + 5
+while main.keyboard.keyboard.chars < 13 and time.monotonic() < deadline:
+    time.sleep(0.001)
+typed = time.perf_counter()
+main.connection_manager.stop()
+main.scan_pipeline.stop(1)
+
+print(json.dumps({
+    "import": imported - started,
+    "ready": ready - started,
+    "first_scan": typed - started,
+    "chars": main.keyboard.keyboard.chars,
+    "loaded_before_ready": loaded_before_ready,
+}))
+"""
+
+@unittest.skipUnless(hasattr(os, "openpty"), "pty support required")
+class TestColdStart(unittest.TestCase):
+    """Start main in a fresh interpreter and check what it loads before scanning."""
+
+    # Seconds from the first line of the script to the port being read; the
+    # unit suite allows shared CI machines four times as long, which still
+    # fails if the GUI or keyboard imports move back in front of the port
+    READY_BUDGET = 0.5
+    CI_READY_BUDGET = 2.0
+    # Slow imports that must not be paid before scanning starts
+    HEAVY_MODULES = ("PyQt5", "gui", "auto_start", "pynput", "http.server", "serial.tools.list_ports")
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def run_startup(self):
+        """Run the startup script with -X importtime; returns (timings, imports)."""
+        script = f"SRC_DIR = {SRC_DIR!r}\nHEAVY_MODULES = {self.HEAVY_MODULES!r}\n" + STARTUP_SCRIPT
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=self.test_dir,
+                                capture_output=True, text=True, timeout=30)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+        imports = []
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, name = line.split("|")
+                # Modules imported directly by the script or by main
+                if not name.startswith("    ") and cumulative.strip().isdigit():
+                    imports.append((int(cumulative) / 1e6, name.strip()))
+        return json.loads(result.stdout.splitlines()[-1]), sorted(imports, reverse=True)
+
+    def test_scanning_starts_within_budget(self):
+        """Test that the port is read before the slow modules load, within the startup budget."""
+        timings, imports = self.run_startup()
+        budget = self.READY_BUDGET if BENCHMARKS else self.CI_READY_BUDGET
+
+        slowest = ", ".join(f"{name} {seconds * 1000:.0f} ms" for seconds, name in imports[:6])
+        self.assertEqual(timings["chars"], 13)
+        self.assertEqual(timings["loaded_before_ready"], [])
+        self.assertLess(timings["ready"], budget,
+                        f"reading after {timings['ready'] * 1000:.0f} ms; slowest imports: {slowest}")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Unit tests and benchmark for QR2Key payload transformation rules
+"""
+
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from loguru import logger
+from config import Config
+from keyboard_mac import Key, KeyboardController, RecordingBackend
+from transforms import TransformPipeline
+from helpers import benchmark
+
+class TestTransformPipeline(unittest.TestCase):
+    """Test cases for the TransformPipeline class."""
+
+    def test_no_rules(self):
+        """Test that without rules a scan passes through unchanged."""
+        self.assertEqual(TransformPipeline().apply("ABC"), (("ABC", None),))
+
+    def test_strip_replace_and_map(self):
+        """Test prefix and suffix stripping, regex replacement and character mapping."""
+        pipeline = TransformPipeline([
+            {"strip_prefix": ["]Q1", "]Q"]},
+            {"strip_suffix": "\x04"},
+            {"replace": "\\s+", "with": " "},
+            {"map": {"ー": "-", "＃": "#"}},
+        ])
+
+        self.assertEqual(pipeline.apply("]Q1AB  C\tー＃\x04"), (("AB C -#", None),))
+        self.assertEqual(pipeline.apply("x]Q1"), (("x]Q1", None),))
+
+    def test_split_fields_with_keys(self):
+        """Test splitting fields with Tab and a trailing Enter."""
+        pipeline = TransformPipeline([
+            {"split": "|"},
+            {"append_key": "enter"},
+        ])
+
+        self.assertEqual(pipeline.apply("ORDER-1|42|A"),
+                         (("ORDER-1", Key.tab), ("42", Key.tab), ("A", Key.enter)))
+
+    def test_conditional_rules(self):
+        """Test that match limits a rule to some scans and stop ends the chain."""
+        pipeline = TransformPipeline([
+            {"match": "^\\d{13}$", "append_key": "enter", "stop": True},
+            {"match": "^https?://", "stop": True},
+            {"prepend": "LOT:"},
+        ])
+
+        self.assertEqual(pipeline.apply("4901234567894"), (("4901234567894", Key.enter),))
+        self.assertEqual(pipeline.apply("https://example.com"), (("https://example.com", None),))
+        self.assertEqual(pipeline.apply("A12"), (("LOT:A12", None),))
+
+    def test_scanned_markers_are_not_keys(self):
+        """Test that marker characters in a scan are dropped, not pressed."""
+        pipeline = TransformPipeline([{"append": "!"}])
+
+        self.assertEqual(pipeline.apply("A\ufdd0B"), (("AB!", None),))
+
+    def test_invalid_rules(self):
+        """Test that bad rules are rejected with their position."""
+        for rule in ({"split": "|", "key": "f13"}, {"replace": "("}, {"prepend": "a", "append": "b"},
+                     {"match": "x"}, {"strip_prefix": ""}, {"swap": 1}, "strip"):
+            with self.subTest(rule=rule):
+                with self.assertRaisesRegex(ValueError, r"transforms\.rules\[1\]"):
+                    TransformPipeline([{"append": "ok"}, rule])
+
+class TestConfiguredTransforms(unittest.TestCase):
+    """Test transform rules loaded from config.json and applied by process_qr_data()."""
+
+    def setUp(self):
+        import main
+        self.main = main
+        self.test_dir = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.test_dir, "config.json")
+        self.saved = (main.config, main.keyboard, main.clipboard)
+        logger.disable("config")
+        logger.disable("main")
+
+    def tearDown(self):
+        self.main.config, self.main.keyboard, self.main.clipboard = self.saved
+        logger.enable("config")
+        logger.enable("main")
+        shutil.rmtree(self.test_dir)
+
+    def write_rules(self, rules):
+        """Write a config file with the given rules."""
+        with open(self.config_path, "w") as f:
+            json.dump({"keyboard": {"type_delay": 0}, "transforms": {"rules": rules}}, f)
+
+    def test_process_qr_data_types_segments(self):
+        """Test that fields are typed with keys in between."""
+        self.write_rules([{"strip_prefix": "]C1"}, {"split": "\x1d"}, {"append_key": "enter"}])
+        backend = RecordingBackend()
+        self.main.config = Config(self.config_path)
+        self.main.keyboard = KeyboardController(backend=backend)
+        self.main.clipboard = None
+
+        result = self.main.process_qr_data("]C10104912345678904\x1d10ABC")
+
+        presses = [value for _, kind, value in backend.events()
+                   if kind == RecordingBackend.PRESS and len(value) > 1]
+        self.assertEqual(result, "typed")
+        self.assertEqual(backend.text(), "0104912345678904" + "10ABC")
+        self.assertEqual(presses, [Key.tab, Key.enter])
+
+    def test_invalid_rules_keep_previous_config(self):
+        """Test that a reload with a bad rule keeps the rules already in effect."""
+        self.write_rules([{"append": "!"}])
+        config = Config(self.config_path)
+        self.write_rules([{"replace": "["}])
+
+        self.assertFalse(config.load_config())
+        self.assertEqual(config.snapshot.transforms.apply("A"), (("A!", None),))
+
+class TestTransformBenchmark(unittest.TestCase):
+    """Run a typical warehouse rule set over many scans."""
+
+    SCANS = 50000
+    RULES = [
+        {"strip_prefix": ["]C1", "]E0", "]Q1"]},
+        {"strip_suffix": "\r"},
+        {"map": {"ー": "-", "　": " "}},
+        {"replace": "\\s+$"},
+        {"match": "^\\d{13}$", "append_key": "enter", "stop": True},
+        {"split": "|"},
+        {"append_key": "enter"},
+    ]
+
+    def scans(self):
+        """Return 1000 JAN and order scans."""
+        return [f"]E0490123456{i:04d}" if i % 2 else f"ORDER-{i}|{i % 7}|ＬＯＴ ー{i}" for i in range(1000)]
+
+    def test_rule_set(self):
+        """Test the rule set on a JAN and an order scan."""
+        pipeline = TransformPipeline(self.RULES)
+        scans = self.scans()
+
+        self.assertEqual(pipeline.apply(scans[1]), (("4901234560001", Key.enter),))
+        self.assertEqual(pipeline.apply(scans[2]),
+                         (("ORDER-2", Key.tab), ("2", Key.tab), ("ＬＯＴ -2", Key.enter)))
+
+    @benchmark
+    def test_rules_per_second(self):
+        """Test that a seven-rule chain costs microseconds per scan."""
+        pipeline = TransformPipeline(self.RULES)
+        scans = self.scans()
+
+        started = time.perf_counter()
+        for i in range(self.SCANS):
+            pipeline.apply(scans[i % 1000])
+        elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed / self.SCANS, 0.0001)
+
+if __name__ == '__main__':
+    unittest.main()
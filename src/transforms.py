@@ -0,0 +1,218 @@
+"""
+QR2Key - Precompiled payload transformation rules
+"""
+
+import re
+from functools import partial
+from operator import methodcaller
+
+from gs1 import AIS
+from keyboard_mac import Key
+
+# Keys a rule can press; inside the pipeline each one is a Unicode
+# noncharacter, which decoders never produce and scanners never send
+RULE_KEYS = {Key.enter: "\ufdd0", Key.tab: "\ufdd1"}
+_KEY_OF_MARKER = {marker: key for key, marker in RULE_KEYS.items()}
+_STRIP_MARKERS = {ord(marker): None for marker in RULE_KEYS.values()}
+_MARKERS = re.compile("([" + "".join(RULE_KEYS.values()) + "])")
+_FIELDS = re.compile(r"\{([^{}]*)\}")
+
+RULE_ACTIONS = ("strip_prefix", "strip_suffix", "replace", "map", "split", "prepend", "append", "append_key",
+                "format")
+RULE_OPTIONS = ("match", "stop", "with", "key", "gs1", "valid", "ai")
+# Conditions and actions that read the scan's GS1 parse result
+CODE_FIELDS = ("gs1", "valid", "ai", "format")
+
+def _marker(key):
+    """Return the marker of a key name, rejecting keys rules cannot press."""
+    try:
+        return RULE_KEYS[key]
+    except KeyError:
+        raise ValueError(f"Unknown key in transform rule: {key!r}") from None
+
+def _literals(value):
+    """Return a regex alternation of one literal string or a list of them, longest first."""
+    values = [value] if isinstance(value, str) else list(value)
+    if not values or not all(isinstance(v, str) and v for v in values):
+        raise ValueError(f"Expected a non-empty string or list of strings, got {value!r}")
+    return "|".join(re.escape(v) for v in sorted(values, key=len, reverse=True))
+
+def _format(template):
+    """Compile a format template into a function of (text, code).
+
+    {AI} is replaced by that element of the scan's GS1 code (empty if it
+    is missing), {text} by the text so far, and {tab} / {enter} press the
+    key. Scans that are not GS1 or GTIN codes are left unchanged.
+    """
+    if not isinstance(template, str) or not template:
+        raise ValueError(f"format needs a non-empty template, got {template!r}")
+    parts = []
+    literal = ""
+    pos = 0
+    for match in _FIELDS.finditer(template):
+        literal += template[pos:match.start()]
+        name = match.group(1)
+        pos = match.end()
+        if name in RULE_KEYS:
+            literal += RULE_KEYS[name]
+        elif name == "text" or name in AIS:
+            parts.append((literal, name))
+            literal = ""
+        else:
+            raise ValueError(f"Unknown field {{{name}}} in format")
+    tail = literal + template[pos:]
+
+    def format_code(text, code):
+        if code is None:
+            return text
+        elements = code.elements
+        return "".join([literal + (text if name == "text" else elements.get(name, ""))
+                        for literal, name in parts]) + tail
+    return format_code
+
+def _code_condition(rule):
+    """Compile the gs1, valid and ai conditions of a rule into one predicate on the GS1 code."""
+    checks = []
+    if "gs1" in rule:
+        kinds = rule["gs1"]
+        if kinds is True:
+            checks.append(lambda code: code is not None)
+        elif kinds is False:
+            checks.append(lambda code: code is None)
+        else:
+            kinds = frozenset([kinds] if isinstance(kinds, str) else kinds)
+            checks.append(lambda code: code is not None and code.kind in kinds)
+    if "valid" in rule:
+        valid = bool(rule["valid"])
+        checks.append(lambda code: code is not None and code.valid is valid)
+    if "ai" in rule:
+        ais = [rule["ai"]] if isinstance(rule["ai"], str) else list(rule["ai"])
+        unknown = [ai for ai in ais if ai not in AIS]
+        if unknown or not ais:
+            raise ValueError(f"Unknown application identifier in transform rule: {rule['ai']!r}")
+        checks.append(lambda code: code is not None and all(ai in code.elements for ai in ais))
+    return lambda code: all(check(code) for check in checks)
+
+def compile_rule(rule):
+    """Compile one rule dictionary into a (condition, action, stop, uses_code) step.
+
+    condition is a compiled regex search (or None to always apply) and
+    action a function from text to text (or None for a bare stop rule).
+    When the rule reads the scan's GS1 code, uses_code is True and both
+    take (text, code) instead, the condition returning a bool.
+    """
+    if not isinstance(rule, dict):
+        raise ValueError(f"Transform rule must be an object, got {rule!r}")
+    unknown = set(rule) - set(RULE_ACTIONS) - set(RULE_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown transform rule fields: {', '.join(sorted(unknown))}")
+    actions = [name for name in RULE_ACTIONS if name in rule]
+    if len(actions) > 1:
+        raise ValueError(f"Transform rule has more than one action: {', '.join(actions)}")
+    stop = bool(rule.get("stop", False))
+    if not actions and not stop:
+        raise ValueError(f"Transform rule has no action: {rule!r}")
+
+    condition = re.compile(rule["match"]).search if "match" in rule else None
+    action = None
+    if actions:
+        name = actions[0]
+        value = rule[name]
+        if name == "strip_prefix":
+            action = partial(re.compile(f"\\A(?:{_literals(value)})").sub, "", count=1)
+        elif name == "strip_suffix":
+            action = partial(re.compile(f"(?:{_literals(value)})\\Z").sub, "", count=1)
+        elif name == "replace":
+            action = partial(re.compile(value).sub, rule.get("with", ""))
+        elif name == "map":
+            if not isinstance(value, dict):
+                raise ValueError(f"map must be an object of characters, got {value!r}")
+            action = methodcaller("translate", str.maketrans(value))
+        elif name == "split":
+            if not isinstance(value, str) or not value:
+                raise ValueError(f"split needs a non-empty separator, got {value!r}")
+            action = methodcaller("replace", value, _marker(rule.get("key", Key.tab)))
+        elif name == "prepend":
+            action = partial(str.__add__, str(value))
+        elif name == "append":
+            action = methodcaller("__add__", str(value))
+        elif name == "append_key":
+            keys = [value] if isinstance(value, str) else value
+            action = methodcaller("__add__", "".join(_marker(key) for key in keys))
+        elif name == "format":
+            action = _format(value)
+
+    if not any(field in rule for field in CODE_FIELDS):
+        return condition, action, stop, False
+    code_condition = _code_condition(rule)
+    search = condition
+    if search is not None:
+        condition = lambda text, code: code_condition(code) and search(text) is not None
+    else:
+        condition = lambda text, code: code_condition(code)
+    if action is not None and name != "format":
+        text_action = action
+        action = lambda text, code: text_action(text)
+    return condition, action, stop, True
+
+class TransformPipeline:
+    """Chain of rules that reshape a scan before it is typed.
+
+    Rules run in order on the scan text: strip a prefix or suffix,
+    replace a regex, map characters, split fields with a key between
+    them, add text or keys, or rebuild the text from the scan's GS1
+    elements. A rule with "match" only applies when its regex is found in
+    the text at that point, "gs1", "valid" and "ai" test the scan's GS1
+    parse result, and "stop" ends the chain once a rule applies. Everything is compiled when the configuration is
+    loaded, so applying the rules costs a few C-level string operations
+    per scan.
+    """
+
+    def __init__(self, rules=()):
+        """Compile a list of rule dictionaries; raises ValueError for an invalid rule."""
+        self.rules = list(rules or ())
+        steps = []
+        for i, rule in enumerate(self.rules):
+            try:
+                steps.append(compile_rule(rule))
+            except (re.error, TypeError, ValueError) as e:
+                raise ValueError(f"transforms.rules[{i}]: {e}") from None
+        self._steps = tuple(steps)
+
+    def __len__(self):
+        return len(self._steps)
+
+    def __repr__(self):
+        return f"TransformPipeline({len(self._steps)} rules)"
+
+    def apply(self, text, code=None):
+        """Run the rules on a scan; returns (text, key) segments to inject in order.
+
+        code is the scan's GS1Code, or None if it is not a GS1 or GTIN
+        code or was not parsed. Each segment's text is typed and then its
+        key, if not None, is pressed. Without rules the scan is a single
+        (text, None) segment.
+        """
+        if not self._steps:
+            return ((text, None),)
+        text = text.translate(_STRIP_MARKERS)
+        for condition, action, stop, uses_code in self._steps:
+            if uses_code:
+                if not condition(text, code):
+                    continue
+                if action is not None:
+                    text = action(text, code)
+            else:
+                if condition is not None and condition(text) is None:
+                    continue
+                if action is not None:
+                    text = action(text)
+            if stop:
+                break
+        parts = _MARKERS.split(text)
+        if len(parts) == 1:
+            return ((text, None),)
+        segments = [(parts[i], _KEY_OF_MARKER[parts[i + 1]]) for i in range(0, len(parts) - 1, 2)]
+        if parts[-1]:
+            segments.append((parts[-1], None))
+        return tuple(segments)